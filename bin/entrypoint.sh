@@ -3,6 +3,8 @@ set -euo pipefail
 
 echo "[entrypoint] Applying migrations..."
 python manage.py migrate --noinput
+echo "[entrypoint] Building missing progress snapshots..."
+python manage.py rebuild_progress --missing --verbosity 0
 echo "[entrypoint] Seeding templates (idempotent)..."
 python manage.py seed_templates --verbosity 0 || true
 
@@ -56,13 +56,16 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'tracker.middleware.RequestLogMiddleware',
+    'tracker.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'dissertation_lifecycle.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, with render time reported by RequestLogMiddleware
+        'BACKEND': 'tracker.instrumentation.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -129,6 +132,9 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.getenv('STATIC_ROOT', str(BASE_DIR / 'staticfiles'))
 # Use Django 4.2+ STORAGES setting to configure staticfiles backend (silences deprecation warnings)
 STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
     'staticfiles': {
         'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
     },
@@ -147,6 +153,18 @@ _default_types = ','.join([
 ])
 UPLOAD_ALLOWED_TYPES = [t.strip() for t in os.getenv('UPLOAD_ALLOWED_TYPES', _default_types).split(',') if t.strip()]
 
+# Advisor CSV imports above this many rows run as background ImportJobs, either
+# via `manage.py run_import_jobs` ('worker', the Procfile's importer process) or
+# on an in-process thread ('thread', for single-process setups without one)
+IMPORT_INLINE_MAX_ROWS = int(os.getenv('IMPORT_INLINE_MAX_ROWS', '200'))
+IMPORT_JOB_EXECUTOR = os.getenv('IMPORT_JOB_EXECUTOR', 'worker')
+# A running import job whose heartbeat (renewed per chunk) is older than this is
+# handed back to run_import_jobs, which resumes it after the last saved chunk
+IMPORT_JOB_LEASE_SECONDS = int(os.getenv('IMPORT_JOB_LEASE_SECONDS', '300'))
+
+# Cohort export jobs: archives are built in memory up to this size, then spill to a temp file
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv('EXPORT_SPOOL_MAX_BYTES', str(32 * 1024 * 1024)))
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
@@ -169,8 +187,82 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@example.com')
 # Optional webhooks for advisor digests/alerts
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL', '')
 TEAMS_WEBHOOK_URL = os.getenv('TEAMS_WEBHOOK_URL', '')
-# Optional: limit lines posted to webhooks
+# Lines per webhook message; longer digests are split into numbered parts
 WEBHOOK_MAX_LINES = int(os.getenv('WEBHOOK_MAX_LINES', '80'))
+# Per-request timeout, retries on timeouts/429/5xx, and base of the jittered backoff
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '5'))
+WEBHOOK_RETRIES = int(os.getenv('WEBHOOK_RETRIES', '3'))
+WEBHOOK_BACKOFF_SECONDS = float(os.getenv('WEBHOOK_BACKOFF_SECONDS', '0.5'))
+
+# Seconds a process may reuse cached AppSettings weights outside a request
+# (scheduler, management commands) before re-checking the row; requests always
+# check it once, so saves reach every web worker on its next request
+APP_SETTINGS_CACHE_TTL = int(os.getenv('APP_SETTINGS_CACHE_TTL', '60'))
+
+# Delta export (/advisor/changes.ndjson, export_changes): rows changed in the last
+# N seconds wait for the next sync so late-committing transactions are not skipped.
+# updated_at is stamped when a row is written, not when it commits, so this must
+# exceed the longest transaction that writes exported rows (web requests are cut
+# off by gunicorn's --timeout 60; import chunks stamp their rows just before commit)
+DELTA_EXPORT_LAG_SECONDS = int(os.getenv('DELTA_EXPORT_LAG_SECONDS', '120'))
+
+# Seconds a rendered ICS feed body stays cached. Bodies are keyed by the feed's
+# FeedVersion row, which edits to tasks, milestones or projects bump, so this
+# only bounds memory use, not staleness
+ICS_FEED_CACHE_SECONDS = int(os.getenv('ICS_FEED_CACHE_SECONDS', '3600'))
+# Advisor feeds stream on a cache miss and are only cached when smaller than this
+ICS_FEED_CACHE_MAX_BYTES = int(os.getenv('ICS_FEED_CACHE_MAX_BYTES', str(1024 * 1024)))
+# Largest ?days= window an advisor feed accepts; bigger values are clamped to it
+ICS_FEED_MAX_DAYS = int(os.getenv('ICS_FEED_MAX_DAYS', '365'))
+
+# Notification outbox (notify enqueues, dispatch_notifications sends): failed
+# sends retry after NOTIFY_RETRY_BASE_SECONDS, doubling up to NOTIFY_RETRY_MAX_SECONDS,
+# and are marked failed after NOTIFY_MAX_ATTEMPTS. A claimed row is leased to one
+# dispatcher for NOTIFY_CLAIM_LEASE_SECONDS.
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', '5'))
+NOTIFY_RETRY_BASE_SECONDS = int(os.getenv('NOTIFY_RETRY_BASE_SECONDS', '60'))
+NOTIFY_RETRY_MAX_SECONDS = int(os.getenv('NOTIFY_RETRY_MAX_SECONDS', str(6 * 3600)))
+NOTIFY_CLAIM_LEASE_SECONDS = int(os.getenv('NOTIFY_CLAIM_LEASE_SECONDS', '300'))
+
+# Resident scheduler (manage.py scheduler). Schedules are "every N" (seconds),
+# "daily HH:MM", "weekly DOW HH:MM" or "monthly D HH:MM" in TIME_ZONE; an empty
+# value disables a job. A running job is leased for SCHEDULER_LEASE_SECONDS and a
+# failed one is retried after SCHEDULER_RETRY_SECONDS.
+NOTIFY_SCHEDULE = {
+    name: os.environ[f'NOTIFY_SCHEDULE_{name.upper()}']
+    for name in ('due_soon', 'inactivity', 'backup', 'digest', 'dispatch')
+    if f'NOTIFY_SCHEDULE_{name.upper()}' in os.environ
+}
+NOTIFY_DUE_DAYS = int(os.getenv('NOTIFY_DUE_DAYS', '3'))
+NOTIFY_INACTIVITY_DAYS = int(os.getenv('NOTIFY_INACTIVITY_DAYS', '5'))
+NOTIFY_DIGEST_WINDOW_DAYS = int(os.getenv('NOTIFY_DIGEST_WINDOW_DAYS', '7'))
+SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', '1800'))
+SCHEDULER_RETRY_SECONDS = int(os.getenv('SCHEDULER_RETRY_SECONDS', '300'))
+
+# /metrics (Prometheus text format). Scrapers authenticate with
+# "Authorization: Bearer $METRICS_TOKEN"; without a token only staff can read it.
+# Under gunicorn with several workers (or with notify/scheduler processes), set
+# METRICS_MULTIPROC_DIR to a directory shared by all processes and empty it on deploy;
+# each process writes its values there at most every METRICS_FLUSH_SECONDS.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '1'))
+
+# Staff request profiling (?_profile=1 or ?_profile=cprofile): stack sampling
+# interval and how many stored profiles to keep.
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '200'))
+
+# Slow-query log: queries taking SLOW_QUERY_MS or longer (0 = off) are written, with
+# parameters, view, stack and EXPLAIN plan (SQLite/Postgres SELECTs), as JSON lines to
+# a rotating SLOW_QUERY_LOG_FILE. Read it with `python manage.py slow_queries`.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '1') == '1'
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE') or (
+    '/data/slow_queries.log' if os.path.isdir('/data') else str(BASE_DIR / 'slow_queries.log')
+)
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '3'))
 
 # Optional MkDocs site serving (built docs under /site)
 MKDOCS_SITE_DIR = os.getenv('MKDOCS_SITE_DIR', str(BASE_DIR / 'site'))
@@ -221,7 +313,7 @@ LOGGING = {
 
 # Optional S3 storage for media uploads (instead of local volume)
 if os.getenv('S3_ENABLED', '0') == '1':
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    STORAGES['default'] = {'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage'}
     AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', '')
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', '')
     AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME', '')
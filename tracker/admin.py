@@ -14,6 +14,11 @@ class AppSettingsAdmin(admin.ModelAdmin):
         return super().has_add_permission(request)
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 from . import models
 
 
@@ -99,10 +104,105 @@ admin.site.register(models.WordLog)
 admin.site.register(models.FeedbackRequest)
 admin.site.register(models.FeedbackComment)
 admin.site.register(models.Document)
-admin.site.register(models.Notification)
+@admin.register(models.Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'user', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('idempotency_key', 'user__username')
+    readonly_fields = ('created_at', 'sent_at')
 admin.site.register(models.ProjectNote)
 
 
+@admin.register(models.ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'requested_by', 'status', 'done_projects', 'total_projects', 'size', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+@admin.register(models.ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'requested_by', 'filename', 'status', 'processed_rows', 'total_rows', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+    actions = ('retry_jobs', 'discard_uploads')
+
+    @admin.action(description='Retry failed import jobs')
+    def retry_jobs(self, request, queryset):  # type: ignore[no-untyped-def]
+        from .imports import retry_import_job
+        n = sum(1 for job in queryset if retry_import_job(job))
+        self.message_user(request, f"Queued {n} import job(s) again.")
+
+    @admin.action(description='Delete uploads of failed import jobs')
+    def discard_uploads(self, request, queryset):  # type: ignore[no-untyped-def]
+        from .imports import discard_import_upload
+        n = 0
+        for job in queryset.filter(status='failed').exclude(file=''):
+            discard_import_upload(job)
+            job.save(update_fields=['file'])
+            n += 1
+        self.message_user(request, f"Deleted uploads for {n} import job(s).")
+
+
+@admin.register(models.ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'schedule', 'last_status', 'last_slot', 'last_finished_at', 'last_duration_ms', 'run_count')
+    list_filter = ('last_status',)
+    readonly_fields = ('last_started_at', 'last_finished_at', 'last_duration_ms', 'last_error', 'run_count')
+
+
+@admin.register(models.RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'user', 'method', 'path', 'status', 'duration_ms', 'query_count', 'db_ms', 'engine')
+    list_filter = ('engine', 'view_name')
+    search_fields = ('path', 'view_name', 'user__username')
+    fields = ('created_at', 'user', 'method', 'path', 'view_name', 'status', 'engine', 'duration_ms', 'query_count',
+              'db_ms', 'samples', 'flame_graph', 'summary_text', 'queries')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/collapsed.txt', self.admin_site.admin_view(self.collapsed_view),
+                 name='tracker_requestprofile_collapsed'),
+        ]
+        return urls + super().get_urls()
+
+    def collapsed_view(self, request, pk: int):
+        profile = get_object_or_404(models.RequestProfile, pk=pk)
+        if not self.has_view_permission(request, profile):
+            raise PermissionDenied
+        resp = HttpResponse(profile.collapsed + '\n', content_type='text/plain; charset=utf-8')
+        resp['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.collapsed.txt"'
+        return resp
+
+    @admin.display(description='Flame graph')
+    def flame_graph(self, obj):
+        if not obj.collapsed:
+            return 'No sampled stacks (cProfile run, or the request finished before the first sample).'
+        return format_html(
+            '<a href="{}">Download collapsed stacks</a> ({} samples); open in speedscope.app or flamegraph.pl',
+            reverse('admin:tracker_requestprofile_collapsed', args=[obj.pk]), obj.samples,
+        )
+
+    @admin.display(description='Summary')
+    def summary_text(self, obj):
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>', obj.summary)
+
+    @admin.display(description='SQL')
+    def queries(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+            ((q.get('ms'), q.get('origin'), q.get('sql')) for q in obj.sql or []),
+        )
+        return format_html('<table><tr><th>ms</th><th>from</th><th>query</th></tr>{}</table>', rows)
+
+
 # Inline Profile on the built-in User admin for convenient role edits
 class ProfileInline(admin.StackedInline):
     model = models.Profile
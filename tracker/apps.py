@@ -6,5 +6,8 @@ class TrackerConfig(AppConfig):
     name = 'tracker'
 
     def ready(self):  # type: ignore[override]
-        # Hook up signals (auto-create Profile for new Users)
+        # Hook up signals (auto-create Profile, maintain progress snapshots)
         from . import signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+        from .slow_queries import install_slow_query_log
+        connection_created.connect(install_slow_query_log, dispatch_uid='tracker.slow_query_log')
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterator
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ChangeTombstone, Document, FeedbackRequest, Project, Task, WordLog
+
+# kind -> (model, exported fields). Every model here carries an indexed
+# ``updated_at`` (see ChangeTracked) and records a ChangeTombstone on delete.
+DELTA_SOURCES: dict[str, tuple[type[Model], tuple[str, ...]]] = {
+    'project': (Project, (
+        'id', 'student_id', 'title', 'field_of_study', 'expected_defense_date', 'status', 'created_at', 'updated_at',
+    )),
+    'task': (Task, (
+        'id', 'project_id', 'milestone_id', 'template_id', 'title', 'description', 'word_target', 'order',
+        'due_date', 'priority', 'status', 'completed_at', 'progress_percent', 'updated_at',
+    )),
+    'wordlog': (WordLog, ('id', 'project_id', 'task_id', 'date', 'words', 'note', 'updated_at')),
+    'feedbackrequest': (FeedbackRequest, (
+        'id', 'project_id', 'task_id', 'document_id', 'section', 'note', 'status', 'created_at', 'updated_at',
+    )),
+    'document': (Document, (
+        'id', 'project_id', 'task_id', 'file', 'filename', 'size', 'content_type', 'uploaded_by_id',
+        'uploaded_at', 'notes', 'updated_at',
+    )),
+}
+DELETED = 'deleted'
+DEFAULT_LIMIT = 5000
+
+
+def delta_kind(model: type[Model]) -> str | None:
+    for kind, (m, _) in DELTA_SOURCES.items():
+        if m is model:
+            return kind
+    return None
+
+
+def encode_watermark(state: dict) -> str:
+    raw = json.dumps(state, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_watermark(cursor: str | None) -> dict:
+    """Return the per-kind ``[updated_at, id]`` positions; raises ValueError if garbled."""
+    if not cursor:
+        return {}
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except Exception as exc:
+        raise ValueError('Invalid cursor') from exc
+    if not isinstance(state, dict):
+        raise ValueError('Invalid cursor')
+    for pos in state.values():
+        if not (isinstance(pos, list) and len(pos) == 2 and parse_datetime(str(pos[0])) and isinstance(pos[1], int)):
+            raise ValueError('Invalid cursor')
+    return state
+
+
+def watermark_since(since: datetime) -> dict:
+    """Starting state that skips everything changed at or before ``since``."""
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    pos = [since.isoformat(), 2 ** 62]
+    return {kind: list(pos) for kind in (*DELTA_SOURCES, DELETED)}
+
+
+def _after(field: str, pos: list | None) -> Q:
+    if not pos:
+        return Q()
+    ts = parse_datetime(pos[0])
+    return Q(**{f'{field}__gt': ts}) | Q(**{field: ts, 'pk__gt': pos[1]})
+
+
+def default_until() -> datetime:
+    """Upper bound for a sync: now minus ``DELTA_EXPORT_LAG_SECONDS``.
+
+    ``updated_at`` is set when a row is written, so a row from a transaction
+    that stays open longer than the lag commits below a watermark already
+    handed out and is never exported. Long writers must stamp their rows
+    just before commit (as the importer does) or the lag must be raised.
+    """
+    lag = int(getattr(settings, 'DELTA_EXPORT_LAG_SECONDS', 120))
+    return timezone.now() - timedelta(seconds=lag)
+
+
+def iter_changes(state: dict, limit: int = DEFAULT_LIMIT, until: datetime | None = None) -> Iterator[dict]:
+    """Yield change records after the watermark ``state``, then one cursor record.
+
+    Each kind is read in ``(updated_at, id)`` order with a keyset filter and
+    at most ``limit`` rows, so cost scales with churn. Rows touched in the
+    last ``DELTA_EXPORT_LAG_SECONDS`` are left for the next call, so a
+    transaction that commits within the lag cannot slip in behind the
+    watermark (see default_until).
+    The cursor record's ``complete`` is False while any kind hit the limit.
+    """
+    state = dict(state)
+    if until is None:
+        until = default_until()
+    complete = True
+    for kind, (model, fields) in DELTA_SOURCES.items():
+        qs = (
+            model.objects.filter(_after('updated_at', state.get(kind)), updated_at__lte=until)
+            .order_by('updated_at', 'pk')
+            .values(*fields)[:limit]
+        )
+        n = 0
+        for row in qs.iterator(chunk_size=1000):
+            n += 1
+            state[kind] = [row['updated_at'].isoformat(), row['id']]
+            yield {'type': kind, 'op': 'upsert', 'id': row['id'], 'data': row}
+        complete = complete and n < limit
+    qs = ChangeTombstone.objects.filter(_after('deleted_at', state.get(DELETED)), deleted_at__lte=until)
+    n = 0
+    for t in qs.order_by('deleted_at', 'pk')[:limit].iterator(chunk_size=1000):
+        n += 1
+        state[DELETED] = [t.deleted_at.isoformat(), t.pk]
+        yield {'type': t.model, 'op': 'delete', 'id': t.object_id, 'deleted_at': t.deleted_at}
+    complete = complete and n < limit
+    yield {'type': 'cursor', 'cursor': encode_watermark(state), 'complete': complete}
+
+
+def iter_ndjson(state: dict, limit: int = DEFAULT_LIMIT, until: datetime | None = None) -> Iterator[str]:
+    for record in iter_changes(state, limit=limit, until=until):
+        yield json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import QuerySet
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .metrics import EXPORT_BYTES
+from .models import ExportJob, Project
+from .services import ProgressCalculator, get_progress_weights
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+# Projects fetched (and summarised) per round trip in cohort-wide exports
+EXPORT_BATCH_SIZE = 200
+
+
+class _ZipSink:
+    """Write-only, unseekable target for ZipFile.
+
+    ZipFile falls back to data descriptors when it cannot seek, so each
+    member can be emitted as soon as it is written; ``drain`` hands the
+    buffered bytes to the response and empties the buffer.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def write(self, data) -> int:  # type: ignore[no-untyped-def]
+        self._buf += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _csv_text(header: list, rows) -> str:  # type: ignore[no-untyped-def]
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(header)
+    w.writerows(rows)
+    return buf.getvalue()
+
+
+class _Echo:
+    """csv.writer target that returns each formatted row instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(header: list, rows: Iterable[list], rows_per_chunk: int = 100) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    chunk = [writer.writerow(header)]
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream_json_array(items: Iterable[dict]) -> Iterator[str]:
+    """Yield ``json.dumps(list(items), indent=2)`` without building the list."""
+    first = True
+    for item in items:
+        body = json.dumps(item, indent=2).replace('\n', '\n  ')
+        yield ('[\n  ' if first else ',\n  ') + body
+        first = False
+    yield '[]' if first else '\n]'
+
+
+def iter_project_summaries(projects: QuerySet, batch_size: int | None = None) -> Iterator[tuple[Project, dict]]:
+    """Yield ``(project, summary)`` for every project in ``projects``.
+
+    Projects are read with a server-side iterator and summarised one batch at
+    a time (one task query plus one grouped word-log aggregate per batch), so
+    memory stays flat however large the cohort is.
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    weights = get_progress_weights()
+    batch: list[Project] = []
+
+    def flush() -> Iterator[tuple[Project, dict]]:
+        calc = ProgressCalculator.for_projects(batch, weights)
+        for p in batch:
+            yield p, calc.project_summary(p.pk)
+
+    for project in projects.iterator(chunk_size=batch_size):
+        batch.append(project)
+        if len(batch) >= batch_size:
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+
+def project_data_files(project: Project) -> list[tuple[str, str]]:
+    """Return the (name, text) task and word-log files of a project export."""
+    tasks = list(project.tasks.select_related('milestone').all())
+    tasks_json = [
+        {
+            'id': t.id,
+            'milestone': t.milestone.name if t.milestone else None,
+            'title': t.title,
+            'status': t.status,
+            'priority': t.priority,
+            'word_target': t.word_target,
+            'due_date': t.due_date.isoformat() if t.due_date else None,
+        }
+        for t in tasks
+    ]
+    logs = list(project.word_logs.order_by('date').all())
+    logs_json = [{'date': wl.date.isoformat(), 'words': wl.words, 'note': wl.note} for wl in logs]
+    return [
+        ('tasks.json', json.dumps(tasks_json, indent=2)),
+        ('tasks.csv', _csv_text(
+            ['task_id', 'milestone', 'title', 'status', 'priority', 'word_target', 'due_date'],
+            ([t.id, t.milestone.name if t.milestone else '', t.title, t.status, t.priority, t.word_target,
+              t.due_date.isoformat() if t.due_date else ''] for t in tasks),
+        )),
+        ('logs.json', json.dumps(logs_json, indent=2)),
+        ('logs.csv', _csv_text(['date', 'words', 'note'], ([wl.date.isoformat(), wl.words, wl.note] for wl in logs))),
+    ]
+
+
+def _project_members(zf: zipfile.ZipFile, project: Project, prefix: str = '',
+                     chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[None]:
+    """Write one project's export into ``zf``, yielding after every member or chunk.
+
+    Attachments are copied from storage ``chunk_size`` bytes at a time;
+    attachments that cannot be opened are skipped.
+    """
+    for name, text in project_data_files(project):
+        zf.writestr(prefix + name, text)
+        yield
+    for d in project.documents.order_by('id').iterator():
+        if not d.file:
+            continue
+        try:
+            fp = d.file.open('rb')
+        except Exception:
+            continue
+        try:
+            arcname = f"{prefix}attachments/{d.id}_{os.path.basename(d.filename)}"
+            big = (d.size or 0) > zipfile.ZIP64_LIMIT * 0.9
+            with zf.open(arcname, 'w', force_zip64=big) as dest:
+                for chunk in fp.chunks(chunk_size):
+                    dest.write(chunk)
+                    yield
+        finally:
+            fp.close()
+        yield
+
+
+def stream_project_zip(project: Project, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a project export ZIP piece by piece.
+
+    Memory stays roughly constant however large the uploads are.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for _ in _project_members(zf, project, chunk_size=chunk_size):
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def project_zip_response(project: Project, filename: str) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(
+        (chunk for chunk in stream_project_zip(project) if chunk),
+        content_type='application/zip',
+    )
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
+
+
+def build_cohort_export(job: ExportJob) -> ExportJob:
+    """Build the archive for ``job``: every active project under ``<username>_<id>/``.
+
+    The archive is written to a spooled temp file (in memory up to
+    ``EXPORT_SPOOL_MAX_BYTES``) and then saved to default storage.
+    ``done_projects`` is updated after each project so the UI can poll.
+    """
+    projects = Project.objects.filter(status='active').select_related('student').order_by('id')
+    job.total_projects = projects.count()
+    job.done_projects = 0
+    job.save(update_fields=['total_projects', 'done_projects'])
+    max_size = int(getattr(settings, 'EXPORT_SPOOL_MAX_BYTES', 32 * 1024 * 1024))
+    with tempfile.SpooledTemporaryFile(max_size=max_size) as spool:
+        with zipfile.ZipFile(spool, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for i, project in enumerate(projects.iterator(), start=1):
+                prefix = f"{get_valid_filename(project.student.get_username())}_{project.id}/"
+                for _ in _project_members(zf, project, prefix):
+                    pass
+                ExportJob.objects.filter(pk=job.pk).update(done_projects=i)
+        job.size = spool.tell()
+        EXPORT_BYTES.inc(job.size, kind='cohort_zip')
+        spool.seek(0)
+        job.file.save(job.filename, File(spool, name=job.filename), save=False)
+    job.done_projects = job.total_projects
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'size', 'done_projects', 'status', 'finished_at'])
+    return job
+
+
+def run_export_job(job: ExportJob) -> bool:
+    """Claim and build a pending job; returns False if another worker has it."""
+    claimed = ExportJob.objects.filter(pk=job.pk, status='pending').update(
+        status='running', started_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+    job.refresh_from_db()
+    try:
+        build_cohort_export(job)
+    except Exception as exc:
+        logger.exception('Cohort export %s failed', job.pk)
+        ExportJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(exc)[:2000], finished_at=timezone.now(),
+        )
+    return True
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` Range header into inclusive (start, end).
+
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range) and raises RangeNotSatisfiable when it cannot be served.
+    """
+    unit, _, spec = (header or '').strip().partition('=')
+    if unit.strip().lower() != 'bytes' or not spec or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable
+            start, end = max(0, size - suffix), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _read_range(fp, start: int, length: int, chunk_size: int) -> Iterator[bytes]:  # type: ignore[no-untyped-def]
+    try:
+        fp.seek(start)
+        while length > 0:
+            data = fp.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fp.close()
+
+
+def ranged_file_response(request, fieldfile, size: int, filename: str, etag: str,  # type: ignore[no-untyped-def]
+                         content_type: str = 'application/zip',
+                         chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> HttpResponse:
+    """Serve a stored file with single-range support so downloads can resume.
+
+    ``If-Range`` must match ``etag`` for a range to be honoured; otherwise the
+    whole file is sent, as a resumed download would be corrupt if the file changed.
+    """
+    start, end, status = 0, size - 1, 200
+    if_range = request.headers.get('If-Range')
+    if size and (not if_range or if_range == etag):
+        try:
+            parsed = parse_byte_range(request.headers.get('Range', ''), size)
+        except RangeNotSatisfiable:
+            resp = HttpResponse(status=416)
+            resp['Content-Range'] = f'bytes */{size}'
+            return resp
+        if parsed:
+            start, end = parsed
+            status = 206
+    fp = fieldfile.open('rb')
+    resp = StreamingHttpResponse(_read_range(fp, start, end - start + 1, chunk_size), status=status,
+                                 content_type=content_type)
+    resp['Content-Length'] = str(max(0, end - start + 1))
+    resp['Accept-Ranges'] = 'bytes'
+    resp['ETag'] = etag
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if status == 206:
+        resp['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return resp
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Iterable, Iterator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse, HttpResponseBase, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .metrics import cache_lookup
+from .models import FeedVersion, Project, Task, new_feed_token
+
+CRLF = '\r\n'
+EMPTY_CALENDAR = CRLF.join(['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//dissertation-lifecycle//EN', 'END:VCALENDAR']) + CRLF
+FEED_BODY_KEY = 'tracker:ics:feed:{etag}'
+# Every advisor/admin feed shows the same cohort, so they share one scope
+COHORT_SCOPE = 'cohort'
+# RFC 5545 3.1: content lines are folded at 75 octets
+FOLD_OCTETS = 75
+EVENTS_PER_CHUNK = 100
+
+
+def student_scope(user_id: int) -> str:
+    return f'student:{user_id}'
+
+
+def escape_text(value: str) -> str:
+    """Escape a TEXT property value (RFC 5545 3.3.11)."""
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold_line(line: str) -> str:
+    """Return ``line`` folded at 75 octets and CRLF-terminated.
+
+    Continuation lines start with a space, which counts towards their 75
+    octets; multi-byte UTF-8 characters are never split.
+    """
+    if line.isascii():
+        if len(line) <= FOLD_OCTETS:
+            return line + CRLF
+        parts = [line[:FOLD_OCTETS]]
+        parts += [line[i:i + FOLD_OCTETS - 1] for i in range(FOLD_OCTETS, len(line), FOLD_OCTETS - 1)]
+        return (CRLF + ' ').join(parts) + CRLF
+    parts, current, size, limit = [], [], 0, FOLD_OCTETS
+    for ch in line:
+        n = len(ch.encode('utf-8'))
+        if size + n > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, FOLD_OCTETS - 1
+        current.append(ch)
+        size += n
+    parts.append(''.join(current))
+    return (CRLF + ' ').join(parts) + CRLF
+
+
+def _stamp(value: datetime | None) -> str:
+    """DTSTAMP from a task's modification time, so unchanged events keep their stamp."""
+    value = value or datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _single_line(value: str) -> str:
+    return value.replace('\n', ' ').strip()
+
+
+def iter_calendar(tasks: Iterable[Task], uid_prefix: str, summary: Callable[[Task], str],
+                  description: Callable[[Task], str]) -> Iterator[str]:
+    """Yield a VCALENDAR for ``tasks`` (all-day events) a few events at a time.
+
+    ``summary`` and ``description`` return plain text; escaping and line
+    folding happen here, event by event.
+    """
+    yield ''.join(fold_line(x) for x in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//dissertation-lifecycle//EN',
+        'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+    ))
+    chunk: list[str] = []
+    for t in tasks:
+        dt = t.due_date.strftime('%Y%m%d')
+        chunk += [
+            'BEGIN:VEVENT' + CRLF,
+            f'UID:{uid_prefix}-{t.pk}@dissertation-lifecycle' + CRLF,
+            f'DTSTAMP:{_stamp(t.updated_at)}' + CRLF,
+            f'DTSTART;VALUE=DATE:{dt}' + CRLF,
+            f'DTEND;VALUE=DATE:{dt}' + CRLF,
+            fold_line('SUMMARY:' + escape_text(summary(t))),
+            fold_line('DESCRIPTION:' + escape_text(description(t))),
+            'END:VEVENT' + CRLF,
+        ]
+        if len(chunk) >= EVENTS_PER_CHUNK * 8:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('END:VCALENDAR' + CRLF)
+    yield ''.join(chunk)
+
+
+def render_student_feed(user_id: int) -> Iterator[str]:
+    """TODO/DOING tasks with a due date in the student's active project."""
+    project = Project.objects.filter(student_id=user_id, status='active').first()
+    if not project:
+        yield EMPTY_CALENDAR
+        return
+    tasks = project.tasks.select_related('milestone').filter(
+        due_date__isnull=False, status__in=['todo', 'doing'],
+    ).order_by('due_date', 'milestone__order', 'order')
+    yield from iter_calendar(
+        tasks, 'task',
+        lambda t: _single_line(t.title),
+        lambda t: f"Milestone: {t.milestone.name if t.milestone else ''}",
+    )
+
+
+def render_advisor_feed(days: int) -> Iterator[str]:
+    """Upcoming TODO/DOING tasks across active projects, ``days`` ahead of today.
+
+    Rows come from a server-side iterator, so an institution-wide window
+    never sits in memory at once.
+    """
+    today = date.today()
+    tasks = Task.objects.select_related('project__student', 'milestone').filter(
+        due_date__gte=today,
+        due_date__lte=today + timedelta(days=days),
+        status__in=['todo', 'doing'],
+        project__status='active',
+    ).order_by('due_date', 'project__student__username', 'milestone__order', 'order')
+
+    def summary(t: Task) -> str:
+        student = t.project.student.get_username() if t.project and t.project.student else 'student'
+        return f"{student}: {_single_line(t.title)}"
+
+    yield from iter_calendar(
+        tasks.iterator(chunk_size=EVENTS_PER_CHUNK * 5), 'adv-task', summary,
+        lambda t: f"Project: {t.project.title if t.project else ''}\nMilestone: {t.milestone.name if t.milestone else ''}",
+    )
+
+
+def feed_version(scope: str) -> str:
+    """Current ``<token>.<unix time>`` version of a feed scope.
+
+    Read from the FeedVersion row, so a bump in any worker is seen by all of
+    them on the next poll. A scope without a row starts a new version.
+    """
+    row, _ = FeedVersion.objects.get_or_create(scope=scope)
+    return f'{row.token}.{int(row.updated_at.timestamp())}'
+
+
+def _version_time(version: str) -> int:
+    try:
+        return int(version.rsplit('.', 1)[1])
+    except (IndexError, ValueError):
+        return int(time.time())
+
+
+def bump_feed_versions(student_ids) -> None:  # type: ignore[no-untyped-def]
+    """Invalidate the feeds of ``student_ids`` and the shared advisor feed.
+
+    Scopes without a row are skipped; their first poll creates one.
+    """
+    scopes = [student_scope(uid) for uid in student_ids if uid]
+    scopes.append(COHORT_SCOPE)
+    FeedVersion.objects.filter(scope__in=scopes).update(token=new_feed_token(), updated_at=timezone.now())
+
+
+_pending_feeds = threading.local()
+
+
+def _flush_feed_invalidation() -> None:
+    ids = getattr(_pending_feeds, 'ids', None)
+    students = getattr(_pending_feeds, 'students', None) or set()
+    if not ids and not students:
+        return
+    _pending_feeds.ids = set()
+    _pending_feeds.students = set()
+    if ids:
+        students |= set(Project.objects.filter(pk__in=ids).values_list('student_id', flat=True))
+    bump_feed_versions(students)
+
+
+def schedule_feed_invalidation(project_id: int | None, student_id: int | None = None) -> None:
+    """Invalidate the calendar feeds showing ``project_id`` once the transaction commits.
+
+    Bumping after commit keeps a concurrent poll from caching pre-commit rows
+    under the new version. Pass ``student_id`` when the project row may be
+    gone by then (deletes).
+    """
+    if not project_id and not student_id:
+        return
+    if not hasattr(_pending_feeds, 'ids'):
+        _pending_feeds.ids = set()
+        _pending_feeds.students = set()
+    if student_id:
+        _pending_feeds.students.add(student_id)
+    elif project_id:
+        _pending_feeds.ids.add(project_id)
+    transaction.on_commit(_flush_feed_invalidation)
+
+
+def _caching_stream(key: str, chunks: Iterator[str]) -> Iterator[str]:
+    """Pass ``chunks`` through, caching the body if it ends under ``ICS_FEED_CACHE_MAX_BYTES``."""
+    limit = int(getattr(settings, 'ICS_FEED_CACHE_MAX_BYTES', 1024 * 1024))
+    kept: list[str] | None = []
+    size = 0
+    for chunk in chunks:
+        if kept is not None:
+            size += len(chunk)
+            if size <= limit:
+                kept.append(chunk)
+            else:
+                kept = None
+        yield chunk
+    if kept is not None:
+        cache.set(key, ''.join(kept), int(getattr(settings, 'ICS_FEED_CACHE_SECONDS', 3600)))
+
+
+def feed_response(request: HttpRequest, scope: str, variant: str, render: Callable[[], Iterator[str]],
+                  stream: bool = False) -> HttpResponseBase:
+    """Serve a calendar feed with ETag/Last-Modified and a rendered-feed cache.
+
+    The ETag is derived from the scope's FeedVersion, ``variant`` (e.g. the
+    advisor window) and today's date, so a poll that matches costs one
+    indexed read and a 304. Last-Modified is when the version was created (or
+    midnight, for the date-dependent window), never the newest task change:
+    a task leaving the feed must still make it look newer.
+
+    Rendered bodies are cached under the ETag for ``ICS_FEED_CACHE_SECONDS``;
+    a bump changes the ETag, so a per-process cache never serves a stale body.
+    With ``stream`` a cache miss is sent as it is generated and only cached
+    if it fits in ``ICS_FEED_CACHE_MAX_BYTES``.
+    """
+    version = feed_version(scope)
+    today = date.today()
+    digest = hashlib.sha1(f'{scope}|{variant}|{version}|{today.isoformat()}'.encode('utf-8')).hexdigest()[:24]
+    etag = f'"{digest}"'
+    last_modified = max(_version_time(version), int(datetime.combine(today, datetime.min.time()).timestamp()))
+    resp = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if resp is None:
+        key = FEED_BODY_KEY.format(etag=digest)
+        body = cache.get(key)
+        cache_lookup('ics_feed', body is not None)
+        if body is not None:
+            resp = HttpResponse(body, content_type='text/calendar')
+        elif stream:
+            resp = StreamingHttpResponse(_caching_stream(key, render()), content_type='text/calendar')
+        else:
+            body = ''.join(render())
+            cache.set(key, body, int(getattr(settings, 'ICS_FEED_CACHE_SECONDS', 3600)))
+            resp = HttpResponse(body, content_type='text/calendar')
+    resp['ETag'] = etag
+    resp['Last-Modified'] = http_date(last_modified)
+    # Clients may keep the feed but must revalidate each poll
+    resp['Cache-Control'] = 'private, no-cache'
+    return resp
@@ -0,0 +1,429 @@
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ImportJob, Profile, Project, Task
+from .ics import schedule_feed_invalidation
+from .services import apply_templates_to_projects, schedule_progress_refresh
+
+logger = logging.getLogger(__name__)
+
+# Rows resolved and written per transaction
+IMPORT_CHUNK_ROWS = 1000
+# Smaller chunks for background jobs so progress moves visibly
+IMPORT_JOB_CHUNK_ROWS = 200
+
+TRUTHY = ('1', 'true', 'yes', 'y')
+
+
+@dataclass
+class ImportOptions:
+    update_only: bool = False
+    dry_run: bool = False
+    create_missing_users: bool = False
+    create_missing_projects: bool = False
+
+
+@dataclass
+class ImportReport:
+    results: list[tuple[str, str]] = field(default_factory=list)
+    created_users: int = 0
+    updated_users: int = 0
+    created_projects: int = 0
+    updated_projects: int = 0
+
+    @property
+    def message(self) -> str:
+        return (
+            f"Import complete. Users: +{self.created_users}/{self.updated_users} updated. "
+            f"Projects: +{self.created_projects}/{self.updated_projects} updated."
+        )
+
+
+@dataclass
+class _ChunkPlan:
+    new_users: list = field(default_factory=list)
+    passwords: dict = field(default_factory=dict)  # username -> raw password
+    email_updates: dict = field(default_factory=dict)  # username -> user
+    new_profiles: list = field(default_factory=list)
+    profile_updates: dict = field(default_factory=dict)  # user pk -> profile
+    new_projects: list = field(default_factory=list)
+    project_updates: dict = field(default_factory=dict)  # id(project) -> project
+    template_projects: list = field(default_factory=list)
+
+
+def iter_csv_rows(uploaded) -> Iterator[dict]:  # type: ignore[no-untyped-def]
+    """Stream dict rows from an uploaded CSV, decoding line by line (UTF-8, else Latin-1)."""
+    def lines() -> Iterator[str]:
+        for raw in uploaded:
+            try:
+                yield raw.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                yield raw.decode('latin-1', errors='ignore')
+    return csv.DictReader(lines())
+
+
+def count_csv_rows(uploaded) -> int:  # type: ignore[no-untyped-def]
+    """Data rows in an upload (lines after the header; quoted newlines may over-count)."""
+    n = sum(1 for raw in uploaded if raw.strip())
+    uploaded.seek(0)
+    return max(0, n - 1)
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class AdvisorImporter:
+    """Set-based importer behind ``advisor_import``.
+
+    Rows are processed in chunks: every username, profile and
+    (student, title) pair in a chunk is resolved with a handful of ``IN``
+    queries, planned in memory, and written with ``bulk_create`` /
+    ``bulk_update`` in one transaction per chunk. A dry run stops after
+    planning, so its report matches what a real run would do.
+    """
+
+    def __init__(self, options: ImportOptions, chunk_rows: int | None = None) -> None:
+        self.options = options
+        self.chunk_rows = chunk_rows or IMPORT_CHUNK_ROWS
+        self.report = ImportReport()
+        # Resolved (or planned) objects carried across chunks so repeated
+        # usernames/projects see earlier rows, as they would row by row
+        self.users: dict[str, object] = {}
+        self.profiles: dict[str, Profile | None] = {}
+        self.projects: dict[tuple[str, str], Project | None] = {}
+
+    def run(self, rows: Iterable[dict], on_chunk: Callable[[int, list], None] | None = None) -> ImportReport:
+        """Import ``rows``; ``on_chunk(rows_done, new_results)`` is called after each chunk."""
+        done = 0
+        for chunk in _chunks(rows, self.chunk_rows):
+            seen = len(self.report.results)
+            plan = self._plan(chunk)
+            if not self.options.dry_run:
+                self._apply(plan)
+            done += len(chunk)
+            if on_chunk:
+                on_chunk(done, self.report.results[seen:])
+        return self.report
+
+    def _resolve(self, chunk: list[dict]) -> None:
+        User = get_user_model()
+        names = {(r.get('username') or '').strip() for r in chunk} - {''} - set(self.users)
+        if names:
+            found = {u.get_username(): u for u in User.objects.filter(username__in=names)}
+            profiles = {p.user.get_username(): p for p in Profile.objects.filter(user__in=found.values()).select_related('user')}
+            for name in names:
+                self.users[name] = found.get(name)
+                self.profiles[name] = profiles.get(name)
+        pairs = {
+            ((r.get('username') or '').strip(), (r.get('title') or '').strip() or 'Untitled Project')
+            for r in chunk
+        }
+        pairs = {p for p in pairs if p[0] and p not in self.projects}
+        students = {self.users[u].pk for u, _ in pairs if self.users.get(u) is not None and self.users[u].pk}
+        titles = {t for _, t in pairs}
+        found_projects: dict[tuple[int, str], Project] = {}
+        if students:
+            for proj in Project.objects.filter(student_id__in=students, title__in=titles).order_by('pk'):
+                found_projects.setdefault((proj.student_id, proj.title), proj)
+        for uname, title in pairs:
+            user = self.users.get(uname)
+            self.projects[(uname, title)] = found_projects.get((user.pk, title)) if user is not None and user.pk else None
+
+    def _plan(self, chunk: list[dict]) -> _ChunkPlan:
+        User = get_user_model()
+        opts = self.options
+        report = self.report
+        plan = _ChunkPlan()
+        self._resolve(chunk)
+        for row in chunk:
+            uname = (row.get('username') or '').strip()
+            email = (row.get('email') or '').strip()
+            title = (row.get('title') or '').strip() or 'Untitled Project'
+            display_name = (row.get('display_name') or '').strip()
+            new_title = (row.get('new_title') or '').strip()
+            apply_templates = (row.get('apply_templates') or '0').strip().lower() in TRUTHY
+            status = (row.get('status') or 'active').strip() or 'active'
+            pwd = (row.get('password') or '').strip()
+            if not uname:
+                report.results.append(('error', 'Missing username'))
+                continue
+            # Fetch or create user
+            user = self.users.get(uname)
+            if user is None:
+                if opts.update_only and not opts.create_missing_users:
+                    report.results.append(('error', f"User missing (update-only): {uname}"))
+                    continue
+                user = User(username=uname, email=email)
+                self.users[uname] = user
+                plan.new_users.append(user)
+                plan.passwords[uname] = pwd
+                report.created_users += 1
+                # New users get a student profile (the post_save signal does not fire for bulk_create)
+                prof = Profile(user=user, role='student', display_name=display_name)
+                self.profiles[uname] = prof
+                plan.new_profiles.append(prof)
+            else:
+                if email and user.email != email:
+                    user.email = email
+                    if user.pk:
+                        plan.email_updates[uname] = user
+                    report.updated_users += 1
+                # Ensure / update Profile and display name
+                prof = self.profiles.get(uname)
+                if prof is None:
+                    if not opts.update_only:
+                        prof = Profile(user=user, role='student', display_name=display_name)
+                        self.profiles[uname] = prof
+                        plan.new_profiles.append(prof)
+                elif display_name and prof.display_name != display_name:
+                    prof.display_name = display_name
+                    if prof.pk:
+                        plan.profile_updates[prof.pk] = prof
+            # Fetch or create project
+            proj = self.projects.get((uname, title))
+            if proj is None:
+                if opts.update_only and not opts.create_missing_projects:
+                    report.results.append(('error', f"Project missing (update-only): {uname} / {title}"))
+                    continue
+                proj = Project(student=user, title=title, status=status)
+                self.projects[(uname, title)] = proj
+                plan.new_projects.append(proj)
+                report.created_projects += 1
+                if apply_templates:
+                    plan.template_projects.append(proj)
+                report.results.append(('ok', f"{uname} / {title} (new)"))
+                continue
+            changed = False
+            if status and proj.status != status:
+                proj.status = status
+                changed = True
+            if new_title and new_title != proj.title:
+                self.projects.pop((uname, proj.title), None)
+                proj.title = new_title
+                self.projects[(uname, new_title)] = proj
+                changed = True
+            if changed:
+                if proj.pk:
+                    plan.project_updates[id(proj)] = proj
+                # Like the inline import always did, a dry run reports no project updates
+                if not opts.dry_run:
+                    report.updated_projects += 1
+            report.results.append(('ok', f"{uname} / {title} (updated)"))
+        return plan
+
+    @staticmethod
+    def _hash_passwords(plan: _ChunkPlan) -> None:
+        raw = {u.get_username(): plan.passwords.get(u.get_username()) or None for u in plan.new_users}
+        with_pwd = [name for name, pwd in raw.items() if pwd]
+        hashed: dict[str, str] = {}
+        if with_pwd:
+            # PBKDF2 releases the GIL, so hashing a large upload spreads over cores
+            workers = min(8, os.cpu_count() or 1, len(with_pwd))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                hashed = dict(zip(with_pwd, pool.map(lambda n: make_password(raw[n]), with_pwd)))
+        for user in plan.new_users:
+            user.password = hashed.get(user.get_username()) or make_password(None)
+
+    def _apply(self, plan: _ChunkPlan) -> None:
+        User = get_user_model()
+        self._hash_passwords(plan)
+        with transaction.atomic():
+            if plan.new_users:
+                User.objects.bulk_create(plan.new_users, batch_size=500)
+            if plan.email_updates:
+                User.objects.bulk_update(list(plan.email_updates.values()), ['email'], batch_size=500)
+            if plan.new_profiles:
+                for prof in plan.new_profiles:
+                    prof.user_id = prof.user.pk
+                Profile.objects.bulk_create(plan.new_profiles, batch_size=500)
+            if plan.profile_updates:
+                Profile.objects.bulk_update(list(plan.profile_updates.values()), ['display_name'], batch_size=500)
+            if plan.new_projects:
+                for proj in plan.new_projects:
+                    proj.student_id = proj.student.pk
+                Project.objects.bulk_create(plan.new_projects, batch_size=500)
+                for proj in plan.new_projects:
+                    schedule_progress_refresh(proj.pk)
+                    schedule_feed_invalidation(proj.pk, student_id=proj.student_id)
+            if plan.project_updates:
+                updates = list(plan.project_updates.values())
+                Project.objects.bulk_update(updates, ['status', 'title'], batch_size=500)
+                for proj in updates:
+                    schedule_feed_invalidation(proj.pk, student_id=proj.student_id)
+            if plan.template_projects:
+                # Best effort, as before: a template failure must not undo the import
+                try:
+                    with transaction.atomic():
+                        apply_templates_to_projects(plan.template_projects)
+                except Exception:
+                    logger.exception('Applying templates during import failed')
+            # Stamp updated_at as the chunk's last statements, so the delta export's
+            # lag only has to cover the commit rather than the whole chunk
+            now = timezone.now()
+            touched = [p.pk for p in plan.new_projects] + [p.pk for p in plan.project_updates.values()]
+            if touched:
+                Project.objects.filter(pk__in=touched).update(updated_at=now)
+            if plan.template_projects:
+                # Only new projects get templates, so all their tasks are from this chunk
+                Task.objects.filter(project_id__in=[p.pk for p in plan.template_projects]).update(updated_at=now)
+
+
+def run_advisor_import(uploaded, options: ImportOptions) -> ImportReport:  # type: ignore[no-untyped-def]
+    return AdvisorImporter(options).run(iter_csv_rows(uploaded))
+
+
+def import_options(options: ImportOptions | dict) -> ImportOptions:
+    if isinstance(options, ImportOptions):
+        return options
+    return ImportOptions(**{k: bool(v) for k, v in options.items() if k in ImportOptions.__dataclass_fields__})
+
+
+def run_import_job(job: ImportJob) -> bool:
+    """Claim and process a pending job; returns False if another worker has it.
+
+    Counts and per-row results are saved after every chunk so the advisor can
+    watch progress, and each save renews the job's heartbeat. Chunks already
+    committed stay applied if a later one fails; the job records how far it
+    got and keeps its upload. A reclaimed (see reclaim_stale_import_jobs) or
+    retried (see retry_import_job) job resumes after its last saved chunk.
+    The upload is deleted once the job is done.
+    """
+    now = timezone.now()
+    claimed = ImportJob.objects.filter(pk=job.pk, status='pending').update(
+        status='running', started_at=Coalesce('started_at', Value(now)), heartbeat_at=now,
+    )
+    if not claimed:
+        return False
+    job.refresh_from_db()
+    importer = AdvisorImporter(import_options(job.options), chunk_rows=IMPORT_JOB_CHUNK_ROWS)
+    report = importer.report
+    report.created_users, report.updated_users = job.created_users, job.updated_users
+    report.created_projects, report.updated_projects = job.created_projects, job.updated_projects
+    resume_at = job.processed_rows
+
+    def progress(done: int, new_results: list) -> None:
+        job.results.extend([list(r) for r in new_results])
+        job.processed_rows = resume_at + done
+        job.created_users, job.updated_users = report.created_users, report.updated_users
+        job.created_projects, job.updated_projects = report.created_projects, report.updated_projects
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=[
+            'results', 'processed_rows', 'created_users', 'updated_users', 'created_projects', 'updated_projects',
+            'heartbeat_at',
+        ])
+
+    try:
+        with job.file.open('rb') as fh:
+            importer.run(islice(iter_csv_rows(fh), resume_at, None), on_chunk=progress)
+        job.status = 'done'
+    except Exception as exc:
+        logger.exception('Import job %s failed', job.pk)
+        job.status = 'failed'
+        job.error = str(exc)[:2000]
+    if job.status == 'done':
+        discard_import_upload(job)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'file', 'finished_at'])
+    return True
+
+
+def discard_import_upload(job: ImportJob) -> None:
+    """Delete a job's uploaded file; the caller saves the cleared ``file`` field."""
+    try:
+        job.file.delete(save=False)
+    except Exception:
+        logger.warning('Could not remove upload for import job %s', job.pk)
+
+
+def retry_import_job(job: ImportJob) -> bool:
+    """Queue a failed job again; it resumes after its last saved chunk.
+
+    Returns False if the job has not failed or its upload is gone. The
+    failing chunk was rolled back, so no row is applied twice.
+    """
+    if not job.file:
+        return False
+    requeued = ImportJob.objects.filter(pk=job.pk, status='failed').update(
+        status='pending', error='', finished_at=None, heartbeat_at=None,
+    )
+    if requeued:
+        submit_import_job(job)
+    return bool(requeued)
+
+
+def reclaim_stale_import_jobs() -> int:
+    """Put running jobs whose worker stopped renewing the heartbeat back to pending.
+
+    A worker killed mid-job (gunicorn timeout, deploy, restart) leaves its job
+    ``running``; after ``IMPORT_JOB_LEASE_SECONDS`` without a saved chunk the
+    next ``run_import_jobs`` pass picks it up again from ``processed_rows``.
+    A chunk that committed just before the kill may be applied twice, which
+    updates the same users and projects again. Returns the number reclaimed.
+    """
+    lease = int(getattr(settings, 'IMPORT_JOB_LEASE_SECONDS', 300))
+    cutoff = timezone.now() - timedelta(seconds=lease)
+    stale = ImportJob.objects.filter(status='running').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+    )
+    reclaimed = 0
+    for pk in list(stale.values_list('pk', flat=True)):
+        # Conditional on the same stale state, so two reclaimers cannot both win
+        if stale.filter(pk=pk).update(status='pending'):
+            logger.warning('Reclaimed stale import job %s', pk)
+            reclaimed += 1
+    return reclaimed
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _run_job_in_thread(job_id: int) -> None:
+    close_old_connections()
+    try:
+        job = ImportJob.objects.filter(pk=job_id).first()
+        if job:
+            run_import_job(job)
+    finally:
+        connections.close_all()
+
+
+def submit_import_job(job: ImportJob) -> None:
+    """Hand a saved job to the in-process executor after commit.
+
+    Only with ``IMPORT_JOB_EXECUTOR = 'thread'``; by default jobs are left
+    pending for the ``run_import_jobs`` command.
+    """
+    global _executor
+    if getattr(settings, 'IMPORT_JOB_EXECUTOR', 'worker') != 'thread':
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tracker-import')
+        executor = _executor
+    transaction.on_commit(lambda: executor.submit(_run_job_in_thread, job.pk))
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import contextvars
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+# Longest SQL text kept for the slowest query
+SQL_PREVIEW_CHARS = 300
+
+
+@dataclass
+class RequestMetrics:
+    """Per-request counters filled in by ``track`` and the template backend."""
+    queries: int = 0
+    db_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_sql: str = ''
+    template_ms: float = 0.0
+    request: Any = None
+
+    @property
+    def view_name(self) -> str:
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else ''
+
+    def record_query(self, sql: str, ms: float) -> None:
+        self.queries += 1
+        self.db_ms += ms
+        if ms > self.slowest_ms:
+            self.slowest_ms = ms
+            self.slowest_sql = ' '.join(str(sql).split())[:SQL_PREVIEW_CHARS]
+
+
+_current: contextvars.ContextVar[RequestMetrics | None] = contextvars.ContextVar('request_metrics', default=None)
+
+
+def current_metrics() -> RequestMetrics | None:
+    return _current.get()
+
+
+class _QueryTimer:
+    def __init__(self, metrics: RequestMetrics):
+        self.metrics = metrics
+
+    def __call__(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict) -> Any:
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.metrics.record_query(sql, (time.perf_counter() - start) * 1000)
+
+
+@contextmanager
+def track(request: Any = None) -> Iterator[RequestMetrics]:
+    """Collect query and template timings for the enclosed block on every DB connection."""
+    metrics = RequestMetrics(request=request)
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            timer = _QueryTimer(metrics)
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timer))
+            yield metrics
+    finally:
+        _current.reset(token)
+
+
+class _TimedTemplate(Template):
+    def render(self, context: Any = None, request: Any = None) -> str:
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_ms += (time.perf_counter() - start) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing top-level renders into the current RequestMetrics.
+
+    Includes and extends render inside the top-level template, so they are
+    not counted twice. Queries run lazily while rendering count towards both
+    template and DB time.
+    """
+
+    def from_string(self, template_code: str) -> _TimedTemplate:
+        return _TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name: str) -> _TimedTemplate:
+        template = super().get_template(template_name)
+        return _TimedTemplate(template.template, self)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Sequence
+
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+# Messages sent per connection before it is closed and a fresh one opened
+DEFAULT_BATCH_SIZE = 50
+
+
+@dataclass
+class DeliveryReport:
+    sent: list[EmailMessage] = field(default_factory=list)
+    failed: list[tuple[EmailMessage, str]] = field(default_factory=list)
+
+    def merge(self, other: 'DeliveryReport') -> None:
+        self.sent += other.sent
+        self.failed += other.failed
+
+
+def _send_batch(batch: Sequence[EmailMessage]) -> DeliveryReport:
+    """Send ``batch`` over one connection, recording each message's outcome."""
+    report = DeliveryReport()
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning('Could not open mail connection: %s', exc)
+        report.failed += [(msg, f'{type(exc).__name__}: {exc}') for msg in batch]
+        return report
+    try:
+        for msg in batch:
+            try:
+                if connection.send_messages([msg]):
+                    report.sent.append(msg)
+                else:
+                    report.failed.append((msg, 'no recipients'))
+            except Exception as exc:
+                report.failed.append((msg, f'{type(exc).__name__}: {exc}'))
+                # A dropped session would fail every later message; start a new one
+                try:
+                    connection.close()
+                    connection.open()
+                except Exception:
+                    pass
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return report
+
+
+def send_messages_batched(messages: Sequence[EmailMessage], batch_size: int = DEFAULT_BATCH_SIZE,
+                          concurrency: int = 1) -> DeliveryReport:
+    """Deliver ``messages`` reusing connections, at most ``batch_size`` per connection.
+
+    With ``concurrency`` > 1 the messages are spread over that many batches
+    (still capped at ``batch_size``) and sent from a thread pool, one
+    connection per batch. Failures never raise; they are collected per
+    message in the returned report.
+    """
+    messages = list(messages)
+    report = DeliveryReport()
+    if not messages:
+        return report
+    concurrency = max(1, concurrency)
+    size = max(1, min(batch_size, math.ceil(len(messages) / concurrency)))
+    batches = [messages[i:i + size] for i in range(0, len(messages), size)]
+    if concurrency == 1 or len(batches) == 1:
+        results = [_send_batch(b) for b in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as pool:
+            results = list(pool.map(_send_batch, batches))
+    for r in results:
+        report.merge(r)
+    return report
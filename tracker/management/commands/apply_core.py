@@ -2,47 +2,28 @@ from __future__ import annotations
 
 from django.core.management.base import BaseCommand
 
-from tracker.models import Project, MilestoneTemplate, TaskTemplate, Milestone, Task
+from tracker.models import Project, MilestoneTemplate
+from tracker.services import apply_templates_to_projects
 
 
 class Command(BaseCommand):
     help = "Apply missing core milestones (Introduction, Literature Review, Methodology, Findings, Conclusion) to all projects"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Projects per transaction')
+
     def handle(self, *args, **options):
-        core_templates = list(MilestoneTemplate.objects.filter(key__startswith='core-').order_by('order', 'id'))
-        if not core_templates:
+        if not MilestoneTemplate.objects.filter(key__startswith='core-').exists():
             self.stdout.write(self.style.WARNING('No core-* milestone templates found. Run seed_templates first.'))
             return
+        batch_size = max(1, int(options.get('batch_size') or 200))
         applied = 0
-        for project in Project.objects.all():
-            existing = {m.template_id for m in project.milestones.select_related('template') if m.template_id}
-            order = project.milestones.count() + 1
-            for mt in core_templates:
-                if mt.id in existing:
-                    continue
-                milestone = Milestone.objects.create(project=project, template=mt, name=mt.name, order=order)
-                order += 1
-                t_order = 1
-                for tt in TaskTemplate.objects.filter(milestone=mt).order_by('order', 'id'):
-                    target = 0
-                    title_lower = (tt.title or '').lower()
-                    if mt.key == 'core-literature-review' and 'draft literature review' in title_lower:
-                        target = 5500
-                    if mt.key == 'core-methodology' and 'draft methodology' in title_lower:
-                        target = 2500
-                    if mt.key == 'core-findings' and 'draft findings' in title_lower:
-                        target = 2500
-                    if mt.key == 'core-conclusion' and 'draft conclusion' in title_lower:
-                        target = 1500
-                    Task.objects.create(
-                        project=project,
-                        milestone=milestone,
-                        template=tt,
-                        title=tt.title,
-                        description=tt.description,
-                        order=t_order,
-                        word_target=target,
-                    )
-                    t_order += 1
-                applied += 1
-        self.stdout.write(self.style.SUCCESS(f'Applied core milestones to {applied} project(s).'))
+        batch: list[Project] = []
+        for project in Project.objects.order_by('id').iterator(chunk_size=batch_size):
+            batch.append(project)
+            if len(batch) >= batch_size:
+                applied += apply_templates_to_projects(batch, core_only=True)
+                batch = []
+        if batch:
+            applied += apply_templates_to_projects(batch, core_only=True)
+        self.stdout.write(self.style.SUCCESS(f'Applied {applied} core milestone(s).'))
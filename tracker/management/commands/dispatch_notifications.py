@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.mailer import DEFAULT_BATCH_SIZE
+from tracker.notifications import DEFAULT_CLAIM_SIZE, dispatch_due_notifications
+
+
+class Command(BaseCommand):
+    help = "Send due notifications from the outbox (written by notify), retrying failures with backoff."
+
+    def add_arguments(self, parser):  # type: ignore[override]
+        parser.add_argument("--loop", action="store_true", help="Keep polling for due notifications instead of exiting")
+        parser.add_argument("--interval", type=float, default=10.0, help="Seconds between polls with --loop (default 10)")
+        parser.add_argument("--claim-size", type=int, default=DEFAULT_CLAIM_SIZE, help=f"Rows claimed per round (default {DEFAULT_CLAIM_SIZE})")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Emails sent per SMTP connection (default {DEFAULT_BATCH_SIZE})")
+        parser.add_argument("--concurrency", type=int, default=1, help="SMTP connections to send over in parallel (default 1)")
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        interval = max(0.5, float(opts["interval"]))
+        claim_size = max(1, int(opts["claim_size"]))
+        batch_size = max(1, int(opts["batch_size"]))
+        concurrency = max(1, int(opts["concurrency"]))
+        while True:
+            sent = failed = 0
+            while True:
+                result = dispatch_due_notifications(limit=claim_size, batch_size=batch_size, concurrency=concurrency)
+                if not result.claimed:
+                    break
+                sent += len(result.sent)
+                failed += len(result.failed)
+                for n, error in result.failed:
+                    self.stderr.write(f"Notification {n.pk} ({n.kind}) attempt {n.attempts} failed: {error}")
+            if sent or failed:
+                self.stdout.write(self.style.SUCCESS(f"Sent {sent} notification(s); {failed} failed."))
+            if not opts.get("loop"):
+                if not (sent or failed):
+                    self.stdout.write("No due notifications.")
+                return
+            time.sleep(interval)
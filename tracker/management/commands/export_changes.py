@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+from tracker.delta import DEFAULT_LIMIT, decode_watermark, default_until, iter_changes, watermark_since
+
+
+class Command(BaseCommand):
+    help = "Write Projects/Tasks/WordLogs/FeedbackRequests/Documents changed since a watermark as NDJSON."
+
+    def add_arguments(self, parser):  # type: ignore[override]
+        parser.add_argument("--state-file", help="Read the starting cursor from this file and store the new one after a full run")
+        parser.add_argument("--cursor", help="Start from this cursor (overrides --state-file)")
+        parser.add_argument("--since", help="Start from an ISO timestamp instead of a cursor")
+        parser.add_argument("--output", "-o", help="Write NDJSON here instead of stdout")
+        parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help=f"Rows per kind per page (default {DEFAULT_LIMIT})")
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        state_file = Path(opts["state_file"]) if opts.get("state_file") else None
+        try:
+            if opts.get("cursor"):
+                state = decode_watermark(opts["cursor"])
+            elif opts.get("since"):
+                ts = parse_datetime(opts["since"])
+                if ts is None:
+                    raise ValueError("Invalid --since timestamp")
+                state = watermark_since(ts)
+            elif state_file and state_file.exists():
+                state = decode_watermark(state_file.read_text().strip())
+            else:
+                state = {}
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        limit = max(1, int(opts["limit"]))
+        out = open(opts["output"], "w", encoding="utf-8") if opts.get("output") else sys.stdout
+        rows = 0
+        cursor = ""
+        # Fixed upper bound so every page of this run sees the same snapshot window
+        until = default_until()
+        try:
+            while True:
+                complete = True
+                for record in iter_changes(state, limit=limit, until=until):
+                    if record["type"] == "cursor":
+                        cursor, complete = record["cursor"], record["complete"]
+                        continue
+                    out.write(json.dumps(record, cls=DjangoJSONEncoder, separators=(",", ":")) + "\n")
+                    rows += 1
+                state = decode_watermark(cursor)
+                if complete:
+                    break
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if state_file:
+            state_file.write_text(cursor + "\n")
+        self.stderr.write(f"Exported {rows} change(s). Next cursor: {cursor}")
@@ -4,11 +4,25 @@ from datetime import date, timedelta
 from typing import Iterable
 
 from django.conf import settings
-from django.core.mail import send_mail
-from django.core.management.base import BaseCommand
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Q
 
-from tracker.models import Project, WordLog, Task, Profile
-from tracker.services import task_combined_percent
+from tracker.mailer import DEFAULT_BATCH_SIZE
+from tracker.metrics import NOTIFY_JOB_DURATION
+from tracker.models import Notification, Project, ProjectProgress, Task, Profile
+from tracker.notifications import build_notification, dispatch_due_notifications, enqueue_notifications
+from tracker.services import ProgressCalculator, ensure_project_progress, get_progress_weights, project_activity
+from tracker.webhooks import WebhookResult, post_grouped, post_text
+
+
+# kind -> (what was sent, who received it), for the summary lines
+EMAIL_KINDS = {
+    'due_soon': ('due-soon emails', 'student(s)'),
+    'inactivity': ('inactivity nudges', 'student(s)'),
+    'backup': ('backup reminders', 'student(s)'),
+    'digest': ('advisor digest', 'recipient(s)'),
+}
 
 
 class Command(BaseCommand):
@@ -21,146 +35,83 @@ class Command(BaseCommand):
         parser.add_argument("--backup-reminder", action="store_true", help="Send monthly backup/export reminders to students")
         parser.add_argument("--advisor-digest", action="store_true", help="Send weekly advisor digest of student progress")
         parser.add_argument("--digest-window-days", type=int, default=7, help="Window for advisor digest activity and due tasks (default 7)")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Emails sent per SMTP connection (default {DEFAULT_BATCH_SIZE})")
+        parser.add_argument("--concurrency", type=int, default=1, help="SMTP connections to send over in parallel (default 1)")
+        parser.add_argument("--enqueue-only", action="store_true", help="Only write the outbox; leave sending to dispatch_notifications")
+        parser.add_argument("--jobs", default=None,
+                            help=f"Comma-separated jobs to run ({', '.join(EMAIL_KINDS)}); default due_soon,inactivity plus the flags above")
 
     def handle(self, *args, **opts):  # type: ignore[override]
         due_days = max(0, int(opts["due_days"]))
         inactivity_days = max(1, int(opts["inactivity_days"]))
         from_email = opts.get("from_email") or getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@example.com")
+        # Messages are written to the Notification outbox first, then dispatched
+        self._outbox: list[Notification] = []
+        jobs = self._jobs(opts)
 
-        self._notify_due_soon(due_days, from_email)
-        self._notify_inactivity(inactivity_days, from_email)
+        if "due_soon" in jobs:
+            with NOTIFY_JOB_DURATION.time(job="due_soon"):
+                self._notify_due_soon(due_days, from_email)
+        if "inactivity" in jobs:
+            with NOTIFY_JOB_DURATION.time(job="inactivity"):
+                self._notify_inactivity(inactivity_days, from_email)
+        if "backup" in jobs:
+            with NOTIFY_JOB_DURATION.time(job="backup"):
+                self._backup_reminder(from_email)
+        if "digest" in jobs:
+            with NOTIFY_JOB_DURATION.time(job="digest"):
+                self._advisor_digest(from_email, int(opts.get("digest_window_days", 7)))
 
-        if opts.get("backup_reminder"):
-            self._backup_reminder(from_email)
-        if opts.get("advisor_digest"):
-            self._advisor_digest(from_email, int(opts.get("digest_window_days", 7)))
+        queued = enqueue_notifications(self._outbox)
+        skipped = len(self._outbox) - len(queued)
+        self.stdout.write(f"Queued {len(queued)} notification(s)" + (f"; {skipped} already queued." if skipped else "."))
+        if not opts.get("enqueue_only"):
+            with NOTIFY_JOB_DURATION.time(job="dispatch"):
+                self._dispatch(max(1, int(opts.get("batch_size") or DEFAULT_BATCH_SIZE)), max(1, int(opts.get("concurrency") or 1)))
 
     @staticmethod
-    def _post_webhooks(title: str, text: str) -> None:
-        """Best-effort post to configured Slack/Teams webhooks.
-
-        Uses stdlib to avoid external deps; failures are ignored.
-        """
-        import json
-        from urllib import request
-        slack_url = getattr(settings, 'SLACK_WEBHOOK_URL', '')
-        teams_url = getattr(settings, 'TEAMS_WEBHOOK_URL', '')
-        headers = {"Content-Type": "application/json"}
-        # Prepare a concise digest body and basic bullets
-        lines = [ln.rstrip() for ln in text.splitlines() if ln.strip()]
-        # First line is already the heading in our digest builder
-        heading = lines[0] if lines else title
-        body_lines = lines[1:] if len(lines) > 1 else []
-        # Limit to avoid excessive payloads
-        max_lines = int(getattr(settings, 'WEBHOOK_MAX_LINES', 80))
-        clipped = False
-        if len(body_lines) > max_lines:
-            body_lines = body_lines[:max_lines]
-            clipped = True
-        bullets = "\n".join(f"• {ln.lstrip('- ').lstrip('• ').strip()}" for ln in body_lines)
-        if clipped:
-            bullets += "\n… (truncated)"
-
-        # Slack: blocks with header + section (mrkdwn)
-        if slack_url:
-            try:
-                blocks = [
-                    {"type": "header", "text": {"type": "plain_text", "text": title[:150]}},
-                    {"type": "section", "text": {"type": "mrkdwn", "text": f"*{heading}*"}},
-                ]
-                if bullets:
-                    blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": bullets[:3900]}})
-                payload = {"blocks": blocks}
-                body = json.dumps(payload).encode('utf-8')
-                req = request.Request(slack_url, data=body, headers=headers, method='POST')
-                request.urlopen(req, timeout=5)  # nosec - outbound webhook by config
-            except Exception:
-                pass
+    def _jobs(opts: dict) -> set[str]:
+        if opts.get("jobs"):
+            jobs = {j.strip() for j in str(opts["jobs"]).split(",") if j.strip()}
+            unknown = jobs - set(EMAIL_KINDS)
+            if unknown:
+                raise CommandError(f"Unknown job(s): {', '.join(sorted(unknown))}")
+            return jobs
+        jobs = {"due_soon", "inactivity"}
+        if opts.get("backup_reminder"):
+            jobs.add("backup")
+        if opts.get("advisor_digest"):
+            jobs.add("digest")
+        return jobs
 
-    @staticmethod
-    def _post_webhooks_grouped(title: str, groups: list[dict]) -> None:
-        """Post grouped content to Slack/Teams.
+    def _queue(self, kind: str, user_id: int, period: str, message: EmailMessage) -> None:
+        # One email per kind, recipient and period (day, month or digest window)
+        self._outbox.append(build_notification(user_id, kind, f"{kind}:{user_id}:{period}", message))
 
-        groups: [{ 'title': str, 'lines': [str, ...] }]
-        """
-        import json
-        from urllib import request
-        slack_url = getattr(settings, 'SLACK_WEBHOOK_URL', '')
-        teams_url = getattr(settings, 'TEAMS_WEBHOOK_URL', '')
-        headers = {"Content-Type": "application/json"}
-        max_lines = int(getattr(settings, 'WEBHOOK_MAX_LINES', 80))
+    def _dispatch(self, batch_size: int, concurrency: int) -> None:
+        sent: list[Notification] = []
+        while True:
+            result = dispatch_due_notifications(batch_size=batch_size, concurrency=concurrency)
+            if not result.claimed:
+                break
+            sent += result.sent
+            for n, error in result.failed:
+                retry = "giving up" if n.status == "failed" else f"retrying after {n.next_attempt_at:%H:%M:%S}"
+                self.stderr.write(f"Failed to send '{n.payload.get('subject')}' to {', '.join(n.payload.get('to', []))}: {error} ({retry})")
+        for kind, (label, noun) in EMAIL_KINDS.items():
+            n = sum(len(x.payload.get('to', [])) for x in sent if x.kind == kind)
+            if n:
+                self.stdout.write(self.style.SUCCESS(f"Sent {label} to {n} {noun}."))
 
-        # Slack blocks: header + for each group a section with bold title and bullets
-        if slack_url:
-            try:
-                blocks = [{"type": "header", "text": {"type": "plain_text", "text": title[:150]}}]
-                count = 0
-                for g in groups:
-                    if count >= max_lines:
-                        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": "… (truncated)"}})
-                        break
-                    blines = []
-                    for ln in g.get('lines', []):
-                        if count >= max_lines:
-                            break
-                        blines.append(f"• {ln}")
-                        count += 1
-                    text = f"*{g.get('title','')}*\n" + ("\n".join(blines) if blines else "")
-                    blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": text[:3900]}})
-                payload = {"blocks": blocks}
-                body = json.dumps(payload).encode('utf-8')
-                req = request.Request(slack_url, data=body, headers=headers, method='POST')
-                request.urlopen(req, timeout=5)  # nosec - outbound webhook by config
-            except Exception:
-                pass
-        # Teams: MessageCard with sections, each section has activityTitle and text
-        if teams_url:
-            try:
-                sections = []
-                count = 0
-                for g in groups:
-                    if count >= max_lines:
-                        sections.append({"activityTitle": "… (truncated)", "text": ""})
-                        break
-                    blines = []
-                    for ln in g.get('lines', []):
-                        if count >= max_lines:
-                            break
-                        blines.append(f"• {ln}")
-                        count += 1
-                    sections.append({
-                        "activityTitle": g.get('title', ''),
-                        "text": "\n".join(blines)
-                    })
-                card = {
-                    "@type": "MessageCard",
-                    "@context": "https://schema.org/extensions",
-                    "summary": title,
-                    "themeColor": "0076D7",
-                    "title": title,
-                    "sections": sections,
-                }
-                body = json.dumps(card).encode('utf-8')
-                req = request.Request(teams_url, data=body, headers=headers, method='POST')
-                request.urlopen(req, timeout=5)  # nosec - outbound webhook by config
-            except Exception:
-                pass
-        # Teams incoming webhook: Office 365 Connector Card (simple)
-        if teams_url:
-            try:
-                card = {
-                    "@type": "MessageCard",
-                    "@context": "https://schema.org/extensions",
-                    "summary": title,
-                    "themeColor": "0076D7",
-                    "title": title,
-                    "text": f"**{heading}**\n\n{bullets}",
-                }
-                body = json.dumps(card).encode('utf-8')
-                req = request.Request(teams_url, data=body, headers=headers, method='POST')
-                request.urlopen(req, timeout=5)  # nosec - outbound webhook by config
-            except Exception:
-                pass
+    def _report_webhooks(self, label: str, results: list[WebhookResult]) -> None:
+        """Summarise a webhook fan-out; posting is best-effort and never fails the run."""
+        delivered = [r for r in results if r.ok]
+        if delivered:
+            slowest = max(r.latency_ms for r in delivered)
+            self.stdout.write(f"Posted {label} to webhooks: {len(delivered)} message(s), slowest {slowest:.0f} ms.")
+        for r in results:
+            if not r.ok:
+                self.stderr.write(f"Webhook {r.target} ({label}, part {r.part}) failed after {r.attempts} attempt(s): {r.error}")
 
     def _notify_due_soon(self, due_days: int, from_email: str) -> None:
         today = date.today()
@@ -179,7 +130,7 @@ class Command(BaseCommand):
                 continue
             grouped.setdefault(t.project.student_id, []).append(t)
 
-        sent = 0
+        calc = ProgressCalculator([t for tasks in grouped.values() for t in tasks])
         groups_for_webhook = []
         for student_id, tasks in grouped.items():
             user = tasks[0].project.student
@@ -192,78 +143,59 @@ class Command(BaseCommand):
                 "",
             ]
             for t in tasks:
-                pct = task_combined_percent(t)
+                pct = calc.task_percent(t)
                 lines.append(f"- {t.title} (due {t.due_date}, progress {pct}%)")
             lines.append("\nVisit your dashboard to review and update: /dashboard\n")
-            send_mail(
+            self._queue('due_soon', user.pk, today.isoformat(), EmailMessage(
                 subject="Dissertation: upcoming task deadlines",
-                message="\n".join(lines),
+                body="\n".join(lines),
                 from_email=from_email,
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
-            sent += 1
+                to=[user.email],
+            ))
             groups_for_webhook.append({
                 'title': f"{user.get_username()} — {getattr(tasks[0].project, 'title', '')}",
                 'lines': [f"{t.title} (due {t.due_date})" for t in tasks],
             })
-        if sent:
-            self.stdout.write(self.style.SUCCESS(f"Sent due-soon emails to {sent} student(s)."))
         if groups_for_webhook:
-            try:
-                self._post_webhooks_grouped(
-                    title=f"Due soon (≤{due_days} days)",
-                    groups=groups_for_webhook,
-                )
-            except Exception:
-                pass
+            self._report_webhooks("due soon", post_grouped(f"Due soon (≤{due_days} days)", groups_for_webhook))
 
     def _notify_inactivity(self, inactivity_days: int, from_email: str) -> None:
         today = date.today()
         cutoff = today - timedelta(days=inactivity_days)
-        sent = 0
         summary_lines = []
-        for project in Project.objects.select_related("student").filter(status="active"):
+        # Last log date per project comes from one grouped query
+        projects = (
+            Project.objects.select_related("student").filter(status="active")
+            .annotate(last_log_date=Max("word_logs__date"))
+            .filter(Q(last_log_date__isnull=True) | Q(last_log_date__lt=cutoff))
+        )
+        for project in projects:
             user = project.student
             if not user or not user.email:
                 continue
-            last_log = (
-                WordLog.objects.filter(project=project).order_by("-date").values_list("date", flat=True).first()
+            last_log = project.last_log_date
+            days = (today - (last_log or date(1970, 1, 1))).days
+            msg = (
+                f"Hi {user.get_username()},\n\n"
+                f"It looks like you haven't logged writing activity in {days} day(s).\n"
+                "A little progress every day helps a lot — open your Writing page and add an entry.\n\n"
+                "/writing\n"
             )
-            if last_log is None or last_log < cutoff:
-                days = (today - (last_log or date(1970, 1, 1))).days
-                msg = (
-                    f"Hi {user.get_username()},\n\n"
-                    f"It looks like you haven't logged writing activity in {days} day(s).\n"
-                    "A little progress every day helps a lot — open your Writing page and add an entry.\n\n"
-                    "/writing\n"
-                )
-                send_mail(
-                    subject="Dissertation: keep your writing streak going",
-                    message=msg,
-                    from_email=from_email,
-                    recipient_list=[user.email],
-                    fail_silently=True,
-                )
-                sent += 1
-                summary_lines.append(f"{user.get_username()} — inactive {days}d")
-        if sent:
-            self.stdout.write(self.style.SUCCESS(f"Sent inactivity nudges to {sent} student(s)."))
+            self._queue('inactivity', user.pk, today.isoformat(), EmailMessage(
+                subject="Dissertation: keep your writing streak going",
+                body=msg,
+                from_email=from_email,
+                to=[user.email],
+            ))
+            summary_lines.append(f"{user.get_username()} — inactive {days}d")
         if summary_lines:
-            try:
-                self._post_webhooks(
-                    title="Inactivity nudges",
-                    text="Inactivity summary\n" + "\n".join(summary_lines)
-                )
-            except Exception:
-                pass
+            self._report_webhooks("inactivity", post_text("Inactivity nudges", "Inactivity summary\n" + "\n".join(summary_lines)))
 
     def _backup_reminder(self, from_email: str) -> None:
         today = date.today()
         # Heuristic: only run meaningfully on first 3 days of month to avoid mistakes
         if today.day > 3:
             self.stdout.write(self.style.WARNING("Skipping backup reminders (not first days of month)."))
-        sent = 0
         for project in Project.objects.select_related("student").filter(status="active"):
             user = project.student
             if not user or not user.email:
@@ -274,109 +206,71 @@ class Command(BaseCommand):
                 "Download your ZIP backup here (after login): /export.zip\n\n"
                 "Tip: keep copies of key documents in your cloud drive as well.\n"
             )
-            send_mail(
+            self._queue('backup', user.pk, today.strftime('%Y-%m'), EmailMessage(
                 subject="Dissertation: monthly backup reminder",
-                message=msg,
+                body=msg,
                 from_email=from_email,
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
-            sent += 1
-        if sent:
-            self.stdout.write(self.style.SUCCESS(f"Sent backup reminders to {sent} student(s)."))
+                to=[user.email],
+            ))
+
+    @staticmethod
+    def _digest_groups(start: date, today: date, window_days: int) -> list[dict]:
+        """Per-project digest entries, built once and shared by every channel.
+
+        Runs a fixed number of queries however many projects are active:
+        one annotated project query (last log, window words, progress
+        snapshot) plus one prefetch of the tasks due in the window.
+        """
+        projects = Project.objects.filter(status="active")
+        ensure_project_progress(projects)
+        weights = get_progress_weights()
+        groups = []
+        for p in project_activity(projects, start, today, due_until=today + timedelta(days=window_days)).order_by("pk"):
+            prog = getattr(p, "progress", None) or ProjectProgress(project=p)
+            inactivity = (today - (p.last_log_date or date(1970, 1, 1))).days
+            groups.append({
+                'title': f"{p.student.get_username()} — {p.title}",
+                'progress': f"{prog.done_tasks}/{prog.total_tasks} done, combined {prog.combined_percent(weights)}%",
+                'words': p.window_words,
+                'inactivity': inactivity,
+                'due': [f"Due {t.due_date}: {t.title} ({t.milestone.name})" for t in p.due_soon[:5]],
+            })
+        return groups
 
     def _advisor_digest(self, from_email: str, window_days: int) -> None:
-        from django.db.models import Sum
         today = date.today()
         start = today - timedelta(days=max(1, window_days))
         # Collect advisor/admin recipients
         recipients = list(
             Profile.objects.filter(role__in=["advisor", "admin"], user__email__isnull=False)
             .exclude(user__email="")
-            .values_list("user__email", flat=True)
+            .values_list("user_id", "user__email")
         )
         if not recipients:
             self.stdout.write(self.style.WARNING("No advisors/admins with email for digest."))
             return
-        lines = [
-            f"Advisor weekly digest ({start} to {today})",
-            "",
-        ]
-        projects = Project.objects.select_related("student").filter(status="active").all()
-        for p in projects:
-            tasks = list(p.tasks.select_related("milestone").all())
-            total = len(tasks)
-            done = sum(1 for t in tasks if t.status == "done")
-            combined = int(round(sum(task_combined_percent(t) for t in tasks) / total)) if total else 0
-            # Due soon inside window
-            due_soon = [
-                t for t in tasks
-                if t.status in ("todo", "doing") and t.due_date and start <= t.due_date <= today + timedelta(days=window_days)
-            ]
-            # Inactivity days
-            last_log = (
-                WordLog.objects.filter(project=p).order_by("-date").values_list("date", flat=True).first()
-            )
-            inactivity = (today - (last_log or date(1970, 1, 1))).days
-            # Word count in window
-            words_window = int(
-                WordLog.objects.filter(project=p, date__gte=start, date__lte=today).aggregate(total=Sum("words"))["total"]
-                or 0
-            )
-            lines.append(
-                f"- {p.student.get_username()} — {p.title}: {done}/{total} done, combined {combined}%"
-            )
-            lines.append(
-                f"  Activity: {words_window} words in last {window_days}d; inactivity {inactivity}d"
-            )
-            if due_soon:
-                for t in sorted(due_soon, key=lambda x: (x.due_date, x.milestone.order, x.order))[:5]:
-                    lines.append(f"  • Due {t.due_date}: {t.title} ({t.milestone.name})")
+        title = f"Advisor weekly digest ({start} to {today})"
+        groups = self._digest_groups(start, today, window_days)
+        lines = [title, ""]
+        for g in groups:
+            lines.append(f"- {g['title']}: {g['progress']}")
+            lines.append(f"  Activity: {g['words']} words in last {window_days}d; inactivity {g['inactivity']}d")
+            lines.extend(f"  • {d}" for d in g['due'])
             lines.append("")
-        send_mail(
-            subject="Dissertation: advisor weekly digest",
-            message="\n".join(lines),
-            from_email=from_email,
-            recipient_list=recipients,
-            fail_silently=True,
-        )
+        body = "\n".join(lines)
+        for user_id, email in recipients:
+            self._queue('digest', user_id, f"{start}:{today}", EmailMessage(
+                subject="Dissertation: advisor weekly digest",
+                body=body,
+                from_email=from_email,
+                to=[email],
+            ))
         # Also post to optional webhooks (grouped per project)
-        try:
-            groups = []
-            for p in projects:
-                tasks = list(p.tasks.select_related("milestone").all())
-                total = len(tasks)
-                done = sum(1 for t in tasks if t.status == "done")
-                combined = int(round(sum(task_combined_percent(t) for t in tasks) / total)) if total else 0
-                # Due soon inside window
-                due_soon = [
-                    t for t in tasks
-                    if t.status in ("todo", "doing") and t.due_date and start <= t.due_date <= today + timedelta(days=window_days)
-                ]
-                # Inactivity days
-                last_log = (
-                    WordLog.objects.filter(project=p).order_by("-date").values_list("date", flat=True).first()
-                )
-                inactivity = (today - (last_log or date(1970, 1, 1))).days
-                from django.db.models import Sum
-                words_window = int(
-                    WordLog.objects.filter(project=p, date__gte=start, date__lte=today).aggregate(total=Sum("words"))["total"]
-                    or 0
-                )
-                lines_g = [
-                    f"{done}/{total} done, combined {combined}%",
-                    f"Activity: {words_window} words in {window_days}d; inactivity {inactivity}d",
-                ]
-                for t in sorted(due_soon, key=lambda x: (x.due_date, x.milestone.order, x.order))[:5]:
-                    lines_g.append(f"Due {t.due_date}: {t.title} ({t.milestone.name})")
-                groups.append({
-                    'title': f"{p.student.get_username()} — {p.title}",
-                    'lines': lines_g,
-                })
-            self._post_webhooks_grouped(
-                title=f"Advisor weekly digest ({start} to {today})",
-                groups=groups,
-            )
-        except Exception:
-            pass
-        self.stdout.write(self.style.SUCCESS(f"Sent advisor digest to {len(recipients)} recipient(s)."))
+        self._report_webhooks("advisor digest", post_grouped(title, [
+            {'title': g['title'], 'lines': [
+                g['progress'],
+                f"Activity: {g['words']} words in {window_days}d; inactivity {g['inactivity']}d",
+                *g['due'],
+            ]}
+            for g in groups
+        ]))
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from tracker.models import MilestoneProgress, Project, ProjectProgress
+from tracker.services import refresh_project_progress
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ProjectProgress/MilestoneProgress snapshot tables from scratch."
+
+    def add_arguments(self, parser):  # type: ignore[override]
+        parser.add_argument("--batch-size", type=int, default=200, help="Projects per refresh batch (default 200)")
+        parser.add_argument(
+            "--missing", action="store_true",
+            help="Only build rows for projects (or milestones) that have none; keeps existing rows",
+        )
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        batch = max(1, int(opts["batch_size"]))
+        if opts["missing"]:
+            ids = sorted(
+                set(Project.objects.filter(progress__isnull=True).values_list("pk", flat=True))
+                | set(Project.objects.filter(milestones__progress__isnull=True).values_list("pk", flat=True))
+            )
+        else:
+            MilestoneProgress.objects.all().delete()
+            ProjectProgress.objects.all().delete()
+            ids = list(Project.objects.order_by("pk").values_list("pk", flat=True))
+        done = 0
+        for i in range(0, len(ids), batch):
+            done += refresh_project_progress(ids[i:i + batch])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt progress for {done} project(s)."))
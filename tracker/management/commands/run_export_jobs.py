@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.exports import run_export_job
+from tracker.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = "Build pending cohort export archives (see /advisor/exports/)."
+
+    def add_arguments(self, parser):  # type: ignore[override]
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs instead of exiting")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop (default 5)")
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        interval = max(0.5, float(opts["interval"]))
+        while True:
+            built = 0
+            for job in ExportJob.objects.filter(status="pending").order_by("created_at"):
+                if run_export_job(job):
+                    job.refresh_from_db()
+                    built += 1
+                    style = self.style.SUCCESS if job.status == "done" else self.style.ERROR
+                    self.stdout.write(style(f"Export {job.pk}: {job.status} ({job.done_projects}/{job.total_projects} projects, {job.size} bytes)"))
+            if not opts.get("loop"):
+                if not built:
+                    self.stdout.write("No pending export jobs.")
+                return
+            time.sleep(interval)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.imports import reclaim_stale_import_jobs, retry_import_job, run_import_job
+from tracker.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Process pending advisor CSV import jobs, reclaiming running ones whose worker died."
+
+    def add_arguments(self, parser):  # type: ignore[override]
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs instead of exiting")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop (default 5)")
+        parser.add_argument("--retry", type=int, nargs="+", metavar="JOB_ID", default=[],
+                            help="Queue these failed jobs again before processing")
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        interval = max(0.5, float(opts["interval"]))
+        for job in ImportJob.objects.filter(pk__in=opts["retry"]):
+            if not retry_import_job(job):
+                self.stdout.write(self.style.ERROR(f"Import {job.pk}: not retried (not failed, or upload removed)"))
+        while True:
+            ran = 0
+            reclaimed = reclaim_stale_import_jobs()
+            if reclaimed:
+                self.stdout.write(self.style.WARNING(f"Reclaimed {reclaimed} stale import job(s)."))
+            for job in ImportJob.objects.filter(status="pending").order_by("created_at"):
+                if run_import_job(job):
+                    job.refresh_from_db()
+                    ran += 1
+                    style = self.style.SUCCESS if job.status == "done" else self.style.ERROR
+                    self.stdout.write(style(f"Import {job.pk}: {job.status} ({job.processed_rows}/{job.total_rows} rows)"))
+            if not opts.get("loop"):
+                if not ran:
+                    self.stdout.write("No pending import jobs.")
+                return
+            time.sleep(interval)
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tracker.models import ScheduledJob
+from tracker.scheduler import configured_schedules, ensure_usable_connections, run_due_jobs
+
+
+class Command(BaseCommand):
+    help = "Run notification jobs (due-soon, inactivity, backup, digest, dispatch) on their NOTIFY_SCHEDULE slots."
+
+    def add_arguments(self, parser):  # type: ignore[override]
+        parser.add_argument("--once", action="store_true", help="Run the jobs that are due now, then exit")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds between schedule checks (default 30)")
+        parser.add_argument("--list", action="store_true", help="Show each job's schedule and last run, then exit")
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        schedules = configured_schedules()
+        if opts.get("list"):
+            states = {s.name: s for s in ScheduledJob.objects.all()}
+            now = timezone.now()
+            for name, schedule in schedules.items():
+                state = states.get(name)
+                last = f"{state.last_status}, last slot {state.last_slot:%Y-%m-%d %H:%M}" if state and state.last_slot else "never run"
+                self.stdout.write(f"{name:<12} {schedule.spec:<20} current slot {schedule.latest_slot(now):%Y-%m-%d %H:%M} ({last})")
+            return
+        interval = max(1.0, float(opts["interval"]))
+        if not opts.get("once"):
+            self.stdout.write(f"Scheduler running {', '.join(schedules)}; checking every {interval:g}s.")
+        while True:
+            # The connection is kept open between ticks and only replaced when it broke
+            ensure_usable_connections()
+            for name, ok in run_due_jobs(schedules=schedules):
+                if ok:
+                    self.stdout.write(self.style.SUCCESS(f"Ran {name}."))
+                else:
+                    self.stderr.write(f"Job {name} failed; will retry.")
+            if opts.get("once"):
+                return
+            time.sleep(interval)
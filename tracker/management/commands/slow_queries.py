@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from tracker.slow_queries import log_path, read_entries, threshold_ms
+
+
+class Command(BaseCommand):
+    help = "Show queries from the slow-query log (SLOW_QUERY_MS / SLOW_QUERY_LOG_FILE), newest first."
+
+    def add_arguments(self, parser):  # type: ignore[override]
+        parser.add_argument("--limit", type=int, default=20, help="Entries to show (default 20)")
+        parser.add_argument("--min-ms", type=float, default=0, help="Only entries at least this slow")
+        parser.add_argument("--view", default=None, help="Only entries from this URL name")
+        parser.add_argument("--vendor", default=None, help="Only entries from this database (sqlite, postgresql)")
+        parser.add_argument("--slowest", action="store_true", help="Sort by duration instead of time")
+        parser.add_argument("--no-plan", action="store_true", help="Leave out EXPLAIN plans and stacks")
+        parser.add_argument("--json", action="store_true", help="Print raw JSON lines")
+        parser.add_argument("--file", default=None, help="Log file to read (default SLOW_QUERY_LOG_FILE)")
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        path = opts.get("file") or log_path()
+        entries = [
+            e for e in read_entries(path)
+            if e.get("ms", 0) >= opts["min_ms"]
+            and (not opts.get("view") or e.get("view") == opts["view"])
+            and (not opts.get("vendor") or e.get("vendor") == opts["vendor"])
+        ]
+        if not entries:
+            state = f"threshold {threshold_ms():g} ms" if threshold_ms() else "logging is off; set SLOW_QUERY_MS"
+            self.stdout.write(f"No slow queries in {path} ({state}).")
+            return
+        entries.sort(key=(lambda e: e.get("ms", 0)) if opts.get("slowest") else (lambda e: e.get("at", "")), reverse=True)
+        for e in entries[:max(1, int(opts["limit"]))]:
+            if opts.get("json"):
+                self.stdout.write(json.dumps(e))
+                continue
+            where = e["stack"][-1] if e.get("stack") else ""
+            self.stdout.write(self.style.WARNING(
+                f"{e.get('at', '')[:19]}  {e.get('ms', 0):.1f} ms  {e.get('vendor', '')}  {e.get('view') or '-'}  {where}"
+            ))
+            self.stdout.write(f"  {e.get('sql', '')}")
+            self.stdout.write(f"  params: {e.get('params', '')}")
+            if not opts.get("no_plan"):
+                for line in e.get("plan") or []:
+                    self.stdout.write(f"  | {line}")
+                for frame in e.get("stack") or []:
+                    self.stdout.write(f"    at {frame}")
+            self.stdout.write("")
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.utils import timezone
 
 from tracker.models import Project, Milestone, Task
 from django.db import models
 from tracker.models import MilestoneTemplate
+from tracker.services import refresh_project_progress
 
 
 class Command(BaseCommand):
@@ -60,7 +62,7 @@ class Command(BaseCommand):
                         self.stdout.write(f"[{p.id}] Move {len(tasks)} task(s): '{m.name}' -> '{target.name}'")
                     total_moves += len(tasks)
                     if not dry:
-                        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(milestone=target)
+                        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(milestone=target, updated_at=timezone.now())
                     # Delete old milestone
                     self.stdout.write(f"[{p.id}] Delete old milestone '{m.name}' (id={m.id})")
                     total_deleted += 1
@@ -90,7 +92,7 @@ class Command(BaseCommand):
                         self.stdout.write(f"[{p.id}] Merge {len(tasks)} task(s): '{name}' -> keeper id={keeper.id}")
                     total_moves += len(tasks)
                     if not dry:
-                        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(milestone=keeper)
+                        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(milestone=keeper, updated_at=timezone.now())
                     self.stdout.write(f"[{p.id}] Delete duplicate milestone '{name}' (id={m.id})")
                     total_deleted += 1
                     if not dry:
@@ -103,6 +105,10 @@ class Command(BaseCommand):
                     if m.order != idx:
                         Milestone.objects.filter(pk=m.pk).update(order=idx)
 
+        # Tasks were moved with queryset updates (no signals); refresh snapshots
+        if not dry:
+            refresh_project_progress([p.pk for p in projects])
+
         self.stdout.write(self.style.SUCCESS(
             f"Sync complete. Tasks moved: {total_moves}; milestones deleted: {total_deleted}."
         ))
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import atexit
+import bisect
+import functools
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple[str, ...], values: Iterable[Any], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: 'Registry', name: str, help: str, labelnames: tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict[str, Any]) -> str:
+        return json.dumps([str(labels.get(n, '')) for n in self.labelnames])
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError('Counters only go up')
+        with self.registry.lock:
+            series = self.registry.series(self.name)
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + amount
+        self.registry.changed()
+
+    def render(self, series: dict[str, Any]) -> list[str]:
+        return [f'{self.name}{_labels(self.labelnames, json.loads(k))} {_number(v)}' for k, v in sorted(series.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry: 'Registry', name: str, help: str, labelnames: tuple[str, ...],
+                 buckets: tuple[float, ...]):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            series = self.registry.series(self.name)
+            # Per-bucket (not cumulative) counts plus an overflow slot, then sum
+            state = series.setdefault(self._key(labels), [0] * (len(self.buckets) + 1) + [0.0])
+            state[i] += 1
+            state[-1] += value
+        self.registry.changed()
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self, series: dict[str, Any]) -> list[str]:
+        lines = []
+        for key, state in sorted(series.items()):
+            values = json.loads(key)
+            running = 0
+            for bound, n in zip(self.buckets + (float('inf'),), state[:-1]):
+                running += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, values, le)} {running}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, values)} {_number(state[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, values)} {running}')
+        return lines
+
+
+def _merge(into: dict, other: dict) -> None:
+    for name, series in other.items():
+        target = into.setdefault(name, {})
+        for key, value in series.items():
+            if key not in target:
+                target[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                target[key] = [a + b for a, b in zip(target[key], value)]
+            else:
+                target[key] += value
+
+
+class Registry:
+    """In-process metrics, rendered in the Prometheus text exposition format.
+
+    With ``METRICS_MULTIPROC_DIR`` set, each process also writes its values
+    to its own file there (at most every ``METRICS_FLUSH_SECONDS`` and at
+    exit), and ``render`` adds up the files of every process, including
+    exited ones, so counts stay correct across gunicorn workers. Clear the
+    directory when the app (not a single worker) restarts.
+    """
+
+    def __init__(self, multiproc_dir: str | None = None):
+        self.lock = threading.RLock()
+        self.metrics: dict[str, _Metric] = {}
+        # Callables turning collected values into extra exposition lines (e.g. ratios)
+        self.derived: list[Callable[[dict[str, dict[str, Any]]], list[str]]] = []
+        self.values: dict[str, dict[str, Any]] = {}
+        self._multiproc_dir = multiproc_dir
+        self._file_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._pid = os.getpid()
+        self._flushed_at = 0.0
+        self._flush_timer: threading.Timer | None = None
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def _register(self, metric: Any) -> Any:
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+        return metric
+
+    @property
+    def multiproc_dir(self) -> str:
+        if self._multiproc_dir is not None:
+            return self._multiproc_dir
+        return getattr(settings, 'METRICS_MULTIPROC_DIR', '') if settings.configured else ''
+
+    def series(self, name: str) -> dict[str, Any]:
+        """The values of metric ``name`` in this process; call with the lock held."""
+        if os.getpid() != self._pid:
+            # Forked from a process that already counted: start a file (and values) of our own
+            self._pid, self._file_id = os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+            self.values, self._flush_timer = {}, None
+        return self.values.setdefault(name, {})
+
+    def changed(self) -> None:
+        if not self.multiproc_dir:
+            return
+        interval = float(getattr(settings, 'METRICS_FLUSH_SECONDS', 1.0))
+        wait = interval - (time.monotonic() - self._flushed_at)
+        if wait <= 0:
+            self.flush()
+            return
+        with self.lock:
+            # Changes inside the interval are written by one deferred flush
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(wait, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Write this process's values to its file in the multiprocess directory."""
+        if not self.multiproc_dir:
+            return
+        with self.lock:
+            self._flush_timer = None
+            path = os.path.join(self.multiproc_dir, f'metrics-{self._file_id}.json')
+            data = json.dumps(self.values)
+            self._flushed_at = time.monotonic()
+        try:
+            tmp = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            logger.warning('Could not write metrics to %s', path, exc_info=True)
+
+    def collect(self) -> dict[str, dict[str, Any]]:
+        """All values: this process's, or every process's in multiprocess mode."""
+        if not self.multiproc_dir:
+            with self.lock:
+                return json.loads(json.dumps(self.values))
+        self.flush()
+        merged: dict[str, dict[str, Any]] = {}
+        for path in sorted(glob.glob(os.path.join(self.multiproc_dir, 'metrics-*.json'))):
+            try:
+                with open(path, encoding='utf-8') as fh:
+                    _merge(merged, json.load(fh))
+            except (OSError, ValueError):
+                logger.warning('Skipping unreadable metrics file %s', path)
+        return merged
+
+    def render(self) -> str:
+        values = self.collect()
+        lines: list[str] = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.render(values.get(name, {})))
+        for derive in self.derived:
+            lines.extend(derive(values))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'tracker_http_request_duration_seconds', 'Request latency by URL name.', ('view', 'method'), LATENCY_BUCKETS)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'tracker_http_request_queries', 'SQL queries per request by URL name.', ('view',), QUERY_BUCKETS)
+NOTIFY_JOB_DURATION = REGISTRY.histogram(
+    'tracker_notify_job_duration_seconds', 'Duration of notify jobs.', ('job',), JOB_BUCKETS)
+EXPORT_BYTES = REGISTRY.counter('tracker_export_bytes_total', 'Bytes of export files produced.', ('kind',))
+CACHE_REQUESTS = REGISTRY.counter('tracker_cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result'))
+
+
+def _cache_hit_ratios(values: dict[str, dict[str, Any]]) -> list[str]:
+    totals: dict[str, list[float]] = {}
+    for key, n in values.get(CACHE_REQUESTS.name, {}).items():
+        cache_name, result = json.loads(key)
+        hits_total = totals.setdefault(cache_name, [0, 0])
+        hits_total[1] += n
+        if result == 'hit':
+            hits_total[0] += n
+    lines = ['# HELP tracker_cache_hit_ratio Share of cache lookups that hit.', '# TYPE tracker_cache_hit_ratio gauge']
+    for cache_name, (hits, total) in sorted(totals.items()):
+        lines.append(f'tracker_cache_hit_ratio{_labels(("cache",), [cache_name])} {_number(hits / total if total else 0)}')
+    return lines
+
+
+REGISTRY.derived.append(_cache_hit_ratios)
+
+
+def cache_lookup(cache_name: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache_name, result='hit' if hit else 'miss')
+
+
+def _counting(chunks: Iterable[Any], kind: str) -> Iterator[Any]:
+    total = 0
+    try:
+        for chunk in chunks:
+            total += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        EXPORT_BYTES.inc(total, kind=kind)
+
+
+def count_export_bytes(kind: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """View decorator adding the size of successful (200) export responses to ``tracker_export_bytes_total``."""
+    def decorator(view: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(view)
+        def wrapper(request: Any, *args: Any, **kwargs: Any) -> Any:
+            response = view(request, *args, **kwargs)
+            if getattr(response, 'status_code', None) != 200:
+                return response
+            if getattr(response, 'streaming', False):
+                response.streaming_content = _counting(response.streaming_content, kind)
+            else:
+                EXPORT_BYTES.inc(len(response.content), kind=kind)
+            return response
+        return wrapper
+    return decorator
@@ -8,19 +8,41 @@ from typing import Callable
 
 from django.http import HttpRequest, HttpResponse
 
+from .instrumentation import RequestMetrics, track
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES
+from .profiling import profile_call, requested_engine, save_profile
+
 logger = logging.getLogger(__name__)
 
 
+def server_timing(metrics: RequestMetrics, total_ms: float) -> str:
+    return ', '.join([
+        f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_ms:.1f}',
+        f'total;dur={total_ms:.1f}',
+    ])
+
+
 class RequestLogMiddleware:
+    """Log one JSON line per request with timing and SQL stats, and add a Server-Timing header.
+
+    Queries made while a streaming response is consumed are not counted.
+    """
+
     def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
         self.get_response = get_response
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
         req_id = request.headers.get('X-Request-ID') or str(uuid.uuid4())
         request.META['HTTP_X_REQUEST_ID'] = req_id
-        start = time.time()
-        response = self.get_response(request)
-        duration_ms = int((time.time() - start) * 1000)
+        start = time.perf_counter()
+        with track(request) as metrics:
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - start) * 1000
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.observe(duration_ms / 1000, view=view, method=request.method)
+        REQUEST_QUERIES.observe(metrics.queries, view=view)
         try:
             user = getattr(request, 'user', None)
             payload = {
@@ -28,13 +50,42 @@ class RequestLogMiddleware:
                 'id': req_id,
                 'method': request.method,
                 'path': request.path,
+                'view': view,
                 'status': response.status_code,
-                'ms': duration_ms,
+                'ms': round(duration_ms, 1),
+                'queries': metrics.queries,
+                'db_ms': round(metrics.db_ms, 1),
+                'slowest_query_ms': round(metrics.slowest_ms, 1),
+                'slowest_query': metrics.slowest_sql or None,
+                'template_ms': round(metrics.template_ms, 1),
                 'user': getattr(user, 'username', None) if user and user.is_authenticated else None,
             }
             logger.info(json.dumps(payload))
         except Exception:
             pass
         response['X-Request-ID'] = req_id
+        response['Server-Timing'] = server_timing(metrics, duration_ms)
         return response
 
+
+class ProfilerMiddleware:
+    """Profile a request when a staff user asks for it with ``?_profile=1`` (or ``cprofile``) or the
+    ``tracker_profile`` cookie; the profile is stored as a RequestProfile (see tracker/profiling.py).
+
+    Without the switch this is one dict lookup per request.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        engine = requested_engine(request)
+        if engine is None:
+            return self.get_response(request)
+        response, fields = profile_call(lambda: self.get_response(request), engine)
+        try:
+            profile = save_profile(request, response, fields)
+            response['X-Profile-ID'] = str(profile.pk)
+        except Exception:
+            logger.exception('Could not store request profile for %s', request.path)
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_merge_20250908_0213'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectProgress',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress', serialize=False, to='tracker.project')),
+                ('total_tasks', models.PositiveIntegerField(default=0)),
+                ('done_tasks', models.PositiveIntegerField(default=0)),
+                ('status_points', models.PositiveIntegerField(default=0)),
+                ('effort_points', models.PositiveIntegerField(default=0)),
+                ('gated_next', models.CharField(blank=True, max_length=255)),
+                ('gated_next_index', models.PositiveIntegerField(default=999)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('gated_next_milestone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tracker.milestone')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MilestoneProgress',
+            fields=[
+                ('milestone', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress', serialize=False, to='tracker.milestone')),
+                ('total_tasks', models.PositiveIntegerField(default=0)),
+                ('done_tasks', models.PositiveIntegerField(default=0)),
+                ('status_points', models.PositiveIntegerField(default=0)),
+                ('effort_points', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='milestone_progress', to='tracker.project')),
+            ],
+        ),
+    ]
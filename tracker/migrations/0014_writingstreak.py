@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_projectprogress_milestoneprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WritingStreak',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='writing_streak', serialize=False, to='tracker.project')),
+                ('last_log_date', models.DateField(blank=True, null=True)),
+                ('run_length', models.PositiveIntegerField(default=0)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0018_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('schedule', models.CharField(blank=True, max_length=64)),
+                ('last_slot', models.DateTimeField(blank=True, null=True)),
+                ('running_until', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(choices=[('idle', 'Idle'), ('running', 'Running'), ('ok', 'OK'), ('failed', 'Failed')], default='idle', max_length=10)),
+                ('last_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_duration_ms', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:31
+
+from django.db import migrations, models
+import django.utils.timezone
+import tracker.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0021_importjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64, unique=True)),
+                ('token', models.CharField(default=tracker.models.new_feed_token, max_length=32)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,11 +1,31 @@
 from __future__ import annotations
 
+import uuid
+
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
 from django.utils import timezone
 
 
+class ChangeTracked(models.Model):
+    """Abstract base giving a model an indexed ``updated_at`` change watermark.
+
+    Read by the delta export (tracker/delta.py); saves with ``update_fields``
+    still bump it.
+    """
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+        super().save(*args, **kwargs)
+
+
 class Profile(models.Model):
     ROLE_CHOICES = (
         ('student', 'Student'),
@@ -48,7 +68,7 @@ class Profile(models.Model):
         return self.advisor_calendar_token
 
 
-class Project(models.Model):
+class Project(ChangeTracked):
     STATUS_CHOICES = (
         ('active', 'Active'),
         ('archived', 'Archived'),
@@ -59,7 +79,6 @@ class Project(models.Model):
     expected_defense_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
 
     def completion_percent(self) -> int:
         total = self.tasks.count()
@@ -122,7 +141,7 @@ class Milestone(models.Model):
         return f"{user} • {project_title} • {label}{tmpl}"
 
 
-class Task(models.Model):
+class Task(ChangeTracked):
     PRIORITY_CHOICES = (
         ('low', 'Low'), ('med', 'Medium'), ('high', 'High')
     )
@@ -156,7 +175,7 @@ class Task(models.Model):
         return f"{user} • {project_title} • {milestone_name} • {label}{tmpl}"
 
 
-class WordLog(models.Model):
+class WordLog(ChangeTracked):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='word_logs')
     task = models.ForeignKey('Task', null=True, blank=True, on_delete=models.SET_NULL, related_name='word_logs')
     date = models.DateField(default=timezone.now)
@@ -168,7 +187,7 @@ class WordLog(models.Model):
         ordering = ['-date']
 
 
-class FeedbackRequest(models.Model):
+class FeedbackRequest(ChangeTracked):
     STATUS_CHOICES = (('open', 'Open'), ('resolved', 'Resolved'))
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='feedback_requests')
     task = models.ForeignKey(Task, null=True, blank=True, on_delete=models.SET_NULL)
@@ -186,7 +205,7 @@ class FeedbackComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
-class Document(models.Model):
+class Document(ChangeTracked):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='documents')
     task = models.ForeignKey(Task, null=True, blank=True, on_delete=models.SET_NULL)
     file = models.FileField(upload_to='uploads/%Y/%m/')
@@ -198,6 +217,83 @@ class Document(models.Model):
     notes = models.CharField(max_length=255, blank=True)
 
 
+class ExportJob(models.Model):
+    """Background cohort export built by the ``run_export_jobs`` command."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'),
+    )
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='export_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total_projects = models.PositiveIntegerField(default=0)
+    done_projects = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def percent(self) -> int:
+        if self.status == 'done':
+            return 100
+        if not self.total_projects:
+            return 0
+        return min(99, int(100 * self.done_projects / self.total_projects))
+
+    @property
+    def filename(self) -> str:
+        return f"cohort_export_{self.pk}.zip"
+
+
+class ImportJob(models.Model):
+    """A roster CSV upload processed outside the request (see tracker/imports.py)."""
+    STATUS_CHOICES = ExportJob.STATUS_CHOICES
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='import_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Removed once processed: roster files may carry initial passwords
+    file = models.FileField(upload_to='imports/%Y/%m/', blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    options = models.JSONField(default=dict, blank=True)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_users = models.PositiveIntegerField(default=0)
+    updated_users = models.PositiveIntegerField(default=0)
+    created_projects = models.PositiveIntegerField(default=0)
+    updated_projects = models.PositiveIntegerField(default=0)
+    results = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed after every chunk; a running job silent for IMPORT_JOB_LEASE_SECONDS is reclaimed
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def percent(self) -> int:
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(100 * self.processed_rows / self.total_rows))
+
+
+class ChangeTombstone(models.Model):
+    """A deleted delta-exported row, so incremental syncs can drop it too."""
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+
+
 class ProjectNote(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='notes')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -210,14 +306,102 @@ class ProjectNote(models.Model):
 
 
 class Notification(models.Model):
+    """Outbox row for one email; written by ``notify``, sent by ``dispatch_notifications``.
+
+    ``payload`` holds the rendered message (subject, body, from_email, to).
+    ``idempotency_key`` makes enqueuing the same notification twice a no-op.
+    """
     KIND_CHOICES = (
         ('due_soon', 'Due Soon'), ('inactivity', 'Inactivity Nudge'), ('feedback', 'Feedback Request'),
+        ('backup', 'Backup Reminder'), ('digest', 'Advisor Digest'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
     )
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     kind = models.CharField(max_length=20, choices=KIND_CHOICES)
     payload = models.JSONField(default=dict, blank=True)
     scheduled_for = models.DateTimeField(null=True, blank=True)
     sent_at = models.DateTimeField(null=True, blank=True)
+    idempotency_key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # Earliest time a dispatcher may (re)claim the row: retry backoff or a claim lease
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.kind} for user {self.user_id} ({self.status})"
+
+
+class ScheduledJob(models.Model):
+    """Run state of one ``scheduler`` job (see tracker/scheduler.py).
+
+    ``last_slot`` is the most recent schedule slot that completed; a run is
+    due when a newer slot has passed. ``running_until`` leases the job to
+    one scheduler while it runs, and delays the retry after a failure.
+    """
+    STATUS_CHOICES = (
+        ('idle', 'Idle'),
+        ('running', 'Running'),
+        ('ok', 'OK'),
+        ('failed', 'Failed'),
+    )
+    name = models.CharField(max_length=64, unique=True)
+    schedule = models.CharField(max_length=64, blank=True)
+    last_slot = models.DateTimeField(null=True, blank=True)
+    running_until = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='idle')
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration_ms = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.name} ({self.last_status})"
+
+
+class RequestProfile(models.Model):
+    """A staff-triggered request profile (see tracker/profiling.py).
+
+    ``collapsed`` holds sampled stacks in the collapsed format read by
+    flamegraph.pl and speedscope (``frame;frame;frame count`` per line);
+    ``summary`` holds the cProfile table or the hottest sampled frames.
+    """
+    ENGINE_CHOICES = (
+        ('sample', 'Sampling'),
+        ('cprofile', 'cProfile'),
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    status = models.PositiveSmallIntegerField(default=0)
+    engine = models.CharField(max_length=10, choices=ENGINE_CHOICES, default='sample')
+    duration_ms = models.PositiveIntegerField(default=0)
+    query_count = models.PositiveIntegerField(default=0)
+    db_ms = models.PositiveIntegerField(default=0)
+    samples = models.PositiveIntegerField(default=0)
+    collapsed = models.TextField(blank=True)
+    summary = models.TextField(blank=True)
+    sql = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.method} {self.path} ({self.duration_ms} ms)"
 
 
 class AuditLog(models.Model):
@@ -259,3 +443,83 @@ class AppSettings(models.Model):
             return obj
         # Create with defaults on first access
         return cls.objects.create()
+
+
+class ProjectProgress(models.Model):
+    """Precomputed progress snapshot for a project.
+
+    Maintained by signals on Task/WordLog/Milestone changes (see signals.py) and
+    rebuilt from scratch by ``manage.py rebuild_progress``. Status/effort are
+    stored as sums of per-task percents so the combined percent can be derived
+    with the current AppSettings weights without a rebuild.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='progress')
+    total_tasks = models.PositiveIntegerField(default=0)
+    done_tasks = models.PositiveIntegerField(default=0)
+    status_points = models.PositiveIntegerField(default=0)
+    effort_points = models.PositiveIntegerField(default=0)
+    gated_next = models.CharField(max_length=255, blank=True)
+    gated_next_milestone = models.ForeignKey(Milestone, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    gated_next_index = models.PositiveIntegerField(default=999)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"Progress for project {self.project_id}: {self.done_tasks}/{self.total_tasks}"
+
+    @property
+    def status_percent(self) -> int:
+        return int(round(100 * self.done_tasks / self.total_tasks)) if self.total_tasks else 0
+
+    def combined_percent(self, weights: dict | None = None) -> int:
+        from .services import combined_from_points
+        return combined_from_points(self.status_points, self.effort_points, self.total_tasks, weights)
+
+
+class MilestoneProgress(models.Model):
+    """Per-milestone rows of the progress snapshot (see ProjectProgress)."""
+    milestone = models.OneToOneField(Milestone, on_delete=models.CASCADE, primary_key=True, related_name='progress')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='milestone_progress')
+    total_tasks = models.PositiveIntegerField(default=0)
+    done_tasks = models.PositiveIntegerField(default=0)
+    status_points = models.PositiveIntegerField(default=0)
+    effort_points = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def combined_percent(self, weights: dict | None = None) -> int:
+        from .services import combined_from_points
+        return combined_from_points(self.status_points, self.effort_points, self.total_tasks, weights)
+
+
+class WritingStreak(models.Model):
+    """Per-project writing streak state, updated as WordLogs are written.
+
+    ``run_length`` is the number of consecutive logged days ending at
+    ``last_log_date``; the current streak is that run if it ends today.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='writing_streak')
+    last_log_date = models.DateField(null=True, blank=True)
+    run_length = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def current_streak(self, today=None) -> int:  # type: ignore[no-untyped-def]
+        from datetime import date
+        return self.run_length if self.last_log_date and self.last_log_date == (today or date.today()) else 0
+
+
+def new_feed_token() -> str:
+    return uuid.uuid4().hex
+
+
+class FeedVersion(models.Model):
+    """Version of a calendar feed scope (a student, or the shared advisor cohort).
+
+    Kept in the database so every worker sees a bump at once; rendered feed
+    bodies are cached per process under an ETag derived from it.
+    """
+    scope = models.CharField(max_length=64, unique=True)
+    token = models.CharField(max_length=32, default=new_feed_token)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.scope} @ {self.token}"
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import logging
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .mailer import DEFAULT_BATCH_SIZE, send_messages_batched
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Rows claimed per dispatcher round trip
+DEFAULT_CLAIM_SIZE = 200
+
+
+@dataclass
+class DispatchResult:
+    sent: list[Notification] = field(default_factory=list)
+    failed: list[tuple[Notification, str]] = field(default_factory=list)
+
+    @property
+    def claimed(self) -> int:
+        return len(self.sent) + len(self.failed)
+
+
+def build_notification(user_id: int, kind: str, key: str, message: EmailMessage) -> Notification:
+    return Notification(
+        user_id=user_id,
+        kind=kind,
+        idempotency_key=key,
+        payload={
+            'subject': message.subject,
+            'body': message.body,
+            'from_email': message.from_email,
+            'to': list(message.to),
+        },
+    )
+
+
+def enqueue_notifications(items: Iterable[Notification]) -> list[Notification]:
+    """Insert notifications whose idempotency key is new; returns the ones inserted.
+
+    Keys already in the outbox (sent or not) are skipped, so re-running a
+    job never queues the same email twice.
+    """
+    items = list(items)
+    keys = [n.idempotency_key for n in items if n.idempotency_key]
+    existing = set(Notification.objects.filter(idempotency_key__in=keys).values_list('idempotency_key', flat=True))
+    fresh, seen = [], set(existing)
+    for n in items:
+        if n.idempotency_key and n.idempotency_key in seen:
+            continue
+        seen.add(n.idempotency_key)
+        fresh.append(n)
+    # ignore_conflicts covers a concurrent run inserting the same keys
+    Notification.objects.bulk_create(fresh, batch_size=500, ignore_conflicts=True)
+    return fresh
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter: base, 2x base, 4x base ... capped at NOTIFY_RETRY_MAX_SECONDS."""
+    base = float(getattr(settings, 'NOTIFY_RETRY_BASE_SECONDS', 60))
+    cap = float(getattr(settings, 'NOTIFY_RETRY_MAX_SECONDS', 6 * 3600))
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.0))
+
+
+def _due(now) -> Q:  # type: ignore[no-untyped-def]
+    return (
+        Q(status='pending')
+        & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        & (Q(scheduled_for__isnull=True) | Q(scheduled_for__lte=now))
+    )
+
+
+def claim_due_notifications(limit: int = DEFAULT_CLAIM_SIZE) -> list[Notification]:
+    """Claim up to ``limit`` due rows for this worker.
+
+    Candidate rows are locked with ``SKIP LOCKED`` where the database
+    supports it, then leased by pushing ``next_attempt_at`` forward
+    ``NOTIFY_CLAIM_LEASE_SECONDS``. Only rows carrying this claim's lease
+    are returned, so two workers never send the same row, and rows of a
+    worker that dies are picked up again once the lease runs out.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=int(getattr(settings, 'NOTIFY_CLAIM_LEASE_SECONDS', 300)),
+                                  microseconds=random.randrange(1000))
+    with transaction.atomic():
+        ids = list(
+            Notification.objects.filter(_due(now)).order_by('pk')
+            .select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Notification.objects.filter(_due(now), pk__in=ids).update(
+            next_attempt_at=lease_until, attempts=F('attempts') + 1,
+        )
+    return list(Notification.objects.filter(pk__in=ids, next_attempt_at=lease_until).order_by('pk'))
+
+
+def _message(n: Notification) -> EmailMessage:
+    p = n.payload or {}
+    return EmailMessage(subject=p.get('subject', ''), body=p.get('body', ''), from_email=p.get('from_email'),
+                        to=list(p.get('to') or []))
+
+
+def dispatch_due_notifications(limit: int = DEFAULT_CLAIM_SIZE, batch_size: int = DEFAULT_BATCH_SIZE,
+                               concurrency: int = 1) -> DispatchResult:
+    """Claim due notifications, send them over reused connections and record the outcome.
+
+    Failed rows go back to pending with a backoff until ``NOTIFY_MAX_ATTEMPTS``
+    attempts have been made, then stay ``failed``.
+    """
+    result = DispatchResult()
+    rows = claim_due_notifications(limit)
+    if not rows:
+        return result
+    pairs = [(n, _message(n)) for n in rows]
+    by_message = {id(m): n for n, m in pairs}
+    report = send_messages_batched([m for _, m in pairs], batch_size=batch_size, concurrency=concurrency)
+    now = timezone.now()
+    result.sent = [by_message[id(m)] for m in report.sent]
+    if result.sent:
+        Notification.objects.filter(pk__in=[n.pk for n in result.sent]).update(
+            status='sent', sent_at=now, next_attempt_at=None, last_error='',
+        )
+    max_attempts = int(getattr(settings, 'NOTIFY_MAX_ATTEMPTS', 5))
+    for msg, error in report.failed:
+        n = by_message[id(msg)]
+        result.failed.append((n, error))
+        if n.attempts >= max_attempts:
+            n.status, n.next_attempt_at = 'failed', None
+        else:
+            n.next_attempt_at = now + retry_delay(n.attempts)
+        n.last_error = error[:2000]
+        n.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+        logger.warning('Notification %s failed (attempt %s): %s', n.pk, n.attempts, error)
+    return result
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from django.db.models import F, Q, QuerySet
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    has_next: bool = False
+    has_previous: bool = False
+    next_cursor: str = ''
+    previous_cursor: str = ''
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str | None, size: int) -> list | None:
+    """Return the cursor's key values, or None if missing/garbled."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except Exception:
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _seek(keys: list[tuple[str, bool]], values: list, forward: bool) -> Q:
+    """Row-value comparison "(k1, k2, ...) > (v1, v2, ...)" honouring per-key direction."""
+    cond = Q()
+    for i in range(len(keys) - 1, -1, -1):
+        name, desc = keys[i]
+        op = 'lt' if (desc == forward) else 'gt'
+        strict = Q(**{f'{name}__{op}': values[i]})
+        cond = strict if i == len(keys) - 1 else strict | (Q(**{name: values[i]}) & cond)
+    return cond
+
+
+def keyset_paginate(
+    qs: QuerySet,
+    ordering: Sequence[tuple[Any, bool]],
+    per: int,
+    after: str | None = None,
+    before: str | None = None,
+) -> KeysetPage:
+    """Cursor-paginate ``qs`` by SQL expressions instead of OFFSET.
+
+    ``ordering`` is a list of ``(expression, descending)`` pairs; the primary key
+    is appended as a final tie-breaker. Only ``per + 1`` rows are fetched, so the
+    cost of a page does not depend on how many rows sort before it.
+    """
+    exprs = list(ordering) + [(F('pk'), False)]
+    keys = [(f'sort_k{i}', desc) for i, (_, desc) in enumerate(exprs)]
+    qs = qs.annotate(**{name: expr for (name, _), (expr, __) in zip(keys, exprs)})
+    after_vals = decode_cursor(after, len(keys))
+    before_vals = decode_cursor(before, len(keys)) if after_vals is None else None
+    forward = before_vals is None
+    if after_vals is not None:
+        qs = qs.filter(_seek(keys, after_vals, True))
+    elif before_vals is not None:
+        qs = qs.filter(_seek(keys, before_vals, False))
+    order_by = [
+        (f'-{name}' if desc == forward else name) for name, desc in keys
+    ]
+    rows = list(qs.order_by(*order_by)[:per + 1])
+    more = len(rows) > per
+    rows = rows[:per]
+    if not forward:
+        rows.reverse()
+    page = KeysetPage(object_list=rows)
+    if rows:
+        first = encode_cursor([getattr(rows[0], n) for n, _ in keys])
+        last = encode_cursor([getattr(rows[-1], n) for n, _ in keys])
+        if forward:
+            page.has_next = more
+            page.has_previous = after_vals is not None
+        else:
+            page.has_next = True
+            page.has_previous = more
+        page.next_cursor = last if page.has_next else ''
+        page.previous_cursor = first if page.has_previous else ''
+    return page
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connections
+
+from .models import RequestProfile
+
+# ?_profile=1 (sampling) or ?_profile=cprofile; or the same values in this cookie
+PROFILE_PARAM = '_profile'
+PROFILE_COOKIE = 'tracker_profile'
+MAX_QUERIES = 500
+SQL_CHARS = 2000
+SUMMARY_ROWS = 40
+
+
+def requested_engine(request: Any) -> str | None:
+    """The engine a staff user asked for, or None. Cheap when no switch is present."""
+    value = request.GET.get(PROFILE_PARAM) or request.COOKIES.get(PROFILE_COOKIE)
+    if not value or value in ('0', 'off'):
+        return None
+    user = getattr(request, 'user', None)
+    if not (user is not None and user.is_authenticated and user.is_staff):
+        return None
+    return 'cprofile' if value == 'cprofile' else 'sample'
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _origin() -> str:
+    """The innermost tracker frame (outside this module) on the current stack."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('tracker.') and module != __name__:
+            return f'{module}:{frame.f_code.co_name}:{frame.f_lineno}'
+        frame = frame.f_back
+    return ''
+
+
+class Sampler:
+    """Sample one thread's stack every ``interval`` seconds from a background thread.
+
+    Stacks are counted root-first from ``root_code`` (the profiled call) so
+    server frames above it do not appear in the flame graph.
+    """
+
+    def __init__(self, thread_id: int, root_code: Any, interval: float):
+        self.thread_id = thread_id
+        self.root_code = root_code
+        self.interval = interval
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        stack: list[str] = []
+        while frame is not None:
+            if frame.f_code is self.root_code:
+                break
+            if frame.f_code is _EXIT_CODE:
+                return  # caught stopping the sampler, after the profiled call returned
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        if stack:
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> 'Sampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return '\n'.join(f"{';'.join(stack)} {n}" for stack, n in sorted(self.stacks.items()))
+
+    def summary(self) -> str:
+        """Hottest frames by samples where they were on top of the stack (self time)."""
+        leaf = Counter()
+        for stack, n in self.stacks.items():
+            leaf[stack[-1]] += n
+        total = sum(leaf.values()) or 1
+        return '\n'.join(f'{n:6d} {100 * n / total:5.1f}%  {label}' for label, n in leaf.most_common(SUMMARY_ROWS))
+
+
+_EXIT_CODE = Sampler.__exit__.__code__
+
+
+@dataclass
+class _SqlLog:
+    queries: list[dict] = field(default_factory=list)
+    count: int = 0
+    total_ms: float = 0.0
+
+    def __call__(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict) -> Any:
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.total_ms += ms
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({'sql': str(sql)[:SQL_CHARS], 'ms': round(ms, 2), 'origin': _origin()})
+
+
+def profile_call(fn: Callable[[], Any], engine: str) -> tuple[Any, dict]:
+    """Call ``fn`` under the chosen profiler; returns its result and the fields for a RequestProfile."""
+    sql = _SqlLog()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(sql))
+        start = time.perf_counter()
+        if engine == 'cprofile':
+            profiler = cProfile.Profile()
+            result = profiler.runcall(fn)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(SUMMARY_ROWS)
+            fields = {'summary': out.getvalue(), 'collapsed': '', 'samples': 0}
+        else:
+            interval = float(getattr(settings, 'PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000
+            with Sampler(threading.get_ident(), profile_call.__code__, interval) as sampler:
+                result = fn()
+            fields = {'summary': sampler.summary(), 'collapsed': sampler.collapsed(),
+                      'samples': sum(sampler.stacks.values())}
+        duration_ms = (time.perf_counter() - start) * 1000
+    fields.update(engine=engine, duration_ms=int(duration_ms), query_count=sql.count, db_ms=int(sql.total_ms),
+                  sql=sql.queries)
+    return result, fields
+
+
+def save_profile(request: Any, response: Any, fields: dict) -> RequestProfile:
+    """Store a profile and prune old ones beyond ``PROFILE_KEEP``."""
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile.objects.create(
+        user=request.user if request.user.is_authenticated else None,
+        method=request.method or '', path=request.get_full_path()[:500],
+        view_name=(match.view_name if match else '')[:200], status=response.status_code, **fields,
+    )
+    keep = int(getattr(settings, 'PROFILE_KEEP', 200))
+    stale = RequestProfile.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)[keep:keep + 1000]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    return profile
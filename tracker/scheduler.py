@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import calendar
+import io
+import logging
+import time as time_mod
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+DEFAULT_SCHEDULE = {
+    'due_soon': 'daily 09:00',
+    'inactivity': 'daily 09:00',
+    'backup': 'monthly 1 09:00',
+    'digest': 'weekly mon 09:00',
+    'dispatch': 'every 60',
+}
+
+
+@dataclass(frozen=True)
+class Schedule:
+    """A recurring slot: ``every N`` (seconds), ``daily HH:MM``, ``weekly DOW HH:MM`` or ``monthly D HH:MM``.
+
+    Wall-clock schedules are in the current time zone (settings.TIME_ZONE).
+    """
+    kind: str
+    spec: str = ''
+    seconds: int = 0
+    at: time = time(0, 0)
+    weekday: int = 0
+    day: int = 1
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Schedule':
+        parts = (spec or '').lower().split()
+        try:
+            if parts[0] == 'every' and len(parts) == 2:
+                return cls('every', spec, seconds=max(1, int(parts[1])))
+            at = datetime.strptime(parts[-1], '%H:%M').time()
+            if parts[0] == 'daily' and len(parts) == 2:
+                return cls('daily', spec, at=at)
+            if parts[0] == 'weekly' and len(parts) == 3:
+                return cls('weekly', spec, at=at, weekday=WEEKDAYS.index(parts[1][:3]))
+            if parts[0] == 'monthly' and len(parts) == 3 and 1 <= int(parts[1]) <= 31:
+                return cls('monthly', spec, at=at, day=int(parts[1]))
+        except (IndexError, ValueError):
+            pass
+        raise ValueError(f'Invalid schedule: {spec!r}')
+
+    def _at(self, day: date) -> datetime:
+        return timezone.make_aware(datetime.combine(day, self.at))
+
+    def latest_slot(self, now: datetime) -> datetime:
+        """The most recent slot at or before ``now``."""
+        if self.kind == 'every':
+            return datetime.fromtimestamp(int(now.timestamp()) // self.seconds * self.seconds, tz=now.tzinfo)
+        today = timezone.localtime(now).date()
+        if self.kind == 'daily':
+            slot = self._at(today)
+            return slot if slot <= now else self._at(today - timedelta(days=1))
+        if self.kind == 'weekly':
+            slot = self._at(today - timedelta(days=(today.weekday() - self.weekday) % 7))
+            return slot if slot <= now else slot - timedelta(days=7)
+        year, month = today.year, today.month
+        for _ in range(2):
+            slot = self._at(date(year, month, min(self.day, calendar.monthrange(year, month)[1])))
+            if slot <= now:
+                return slot
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        return slot
+
+
+def _notify(job: str) -> Callable[[io.StringIO], None]:
+    def run(out: io.StringIO) -> None:
+        call_command(
+            'notify', jobs=job, stdout=out, stderr=out,
+            due_days=int(getattr(settings, 'NOTIFY_DUE_DAYS', 3)),
+            inactivity_days=int(getattr(settings, 'NOTIFY_INACTIVITY_DAYS', 5)),
+            digest_window_days=int(getattr(settings, 'NOTIFY_DIGEST_WINDOW_DAYS', 7)),
+        )
+    return run
+
+
+JOBS: dict[str, Callable[[io.StringIO], None]] = {
+    'due_soon': _notify('due_soon'),
+    'inactivity': _notify('inactivity'),
+    'backup': _notify('backup'),
+    'digest': _notify('digest'),
+    'dispatch': lambda out: call_command('dispatch_notifications', stdout=out, stderr=out),
+}
+
+
+def configured_schedules() -> dict[str, Schedule]:
+    """Job name -> Schedule from ``NOTIFY_SCHEDULE``; an empty spec disables a job."""
+    specs = {**DEFAULT_SCHEDULE, **(getattr(settings, 'NOTIFY_SCHEDULE', None) or {})}
+    return {name: Schedule.parse(spec) for name, spec in specs.items() if spec and name in JOBS}
+
+
+def _claim(state: ScheduledJob, slot: datetime, now: datetime) -> bool:
+    lease = timedelta(seconds=int(getattr(settings, 'SCHEDULER_LEASE_SECONDS', 1800)))
+    return bool(
+        ScheduledJob.objects.filter(pk=state.pk)
+        .filter(Q(last_slot__isnull=True) | Q(last_slot__lt=slot))
+        .filter(Q(running_until__isnull=True) | Q(running_until__lte=now))
+        .update(running_until=now + lease, last_status='running', last_started_at=now)
+    )
+
+
+def run_job(name: str, state: ScheduledJob, slot: datetime) -> bool:
+    """Run one claimed job and record the outcome; returns True on success.
+
+    A failed run keeps its slot due and is retried after
+    ``SCHEDULER_RETRY_SECONDS``. Jobs are safe to repeat: notify dedupes
+    emails through the outbox's idempotency keys.
+    """
+    out = io.StringIO()
+    started = time_mod.perf_counter()
+    try:
+        JOBS[name](out)
+    except Exception as exc:
+        logger.exception('Scheduled job %s failed', name)
+        retry = timedelta(seconds=int(getattr(settings, 'SCHEDULER_RETRY_SECONDS', 300)))
+        ScheduledJob.objects.filter(pk=state.pk).update(
+            last_status='failed', last_error=f'{type(exc).__name__}: {exc}'[:2000],
+            last_finished_at=timezone.now(), running_until=timezone.now() + retry,
+            last_duration_ms=int((time_mod.perf_counter() - started) * 1000),
+        )
+        return False
+    ScheduledJob.objects.filter(pk=state.pk).update(
+        last_slot=slot, last_status='ok', last_error='', last_finished_at=timezone.now(), running_until=None,
+        last_duration_ms=int((time_mod.perf_counter() - started) * 1000), run_count=F('run_count') + 1,
+    )
+    output = out.getvalue().strip()
+    if output:
+        logger.info('Scheduled job %s: %s', name, output)
+    return True
+
+
+def run_due_jobs(now: datetime | None = None, schedules: dict[str, Schedule] | None = None) -> list[tuple[str, bool]]:
+    """Run every job whose latest slot has not completed yet; returns (name, ok) pairs.
+
+    A job seen for the first time starts from the current slot rather than
+    running immediately. After downtime each job runs once for its latest
+    missed slot, not once per missed slot.
+    """
+    now = now or timezone.now()
+    schedules = configured_schedules() if schedules is None else schedules
+    states = {s.name: s for s in ScheduledJob.objects.filter(name__in=list(schedules))}
+    ran = []
+    for name, schedule in schedules.items():
+        slot = schedule.latest_slot(now)
+        state = states.get(name)
+        if state is None:
+            state, _ = ScheduledJob.objects.get_or_create(name=name, defaults={'last_slot': slot, 'schedule': schedule.spec})
+        if state.schedule != schedule.spec:
+            ScheduledJob.objects.filter(pk=state.pk).update(schedule=schedule.spec)
+        if state.last_slot is not None and state.last_slot >= slot:
+            continue
+        if _claim(state, slot, now):
+            ran.append((name, run_job(name, state, slot)))
+    return ran
+
+
+def ensure_usable_connections() -> None:
+    """Drop connections that broke while idle; healthy ones stay open between ticks."""
+    for conn in connections.all():
+        if conn.connection is not None and not conn.is_usable():
+            conn.close()
@@ -1,115 +1,297 @@
 from __future__ import annotations
 
+import threading
+import time
+from datetime import date, timedelta
 from typing import Iterable, Tuple
-from django.db import models as dj_models
+from django.db import models as dj_models, transaction
+from django.db.models.functions import Coalesce
 
-from .models import MilestoneTemplate, TaskTemplate, Project, Milestone, Task, AppSettings
+from .metrics import cache_lookup
+from .models import (
+    MilestoneTemplate, TaskTemplate, Project, Milestone, Task, WordLog, AppSettings,
+    ProjectProgress, MilestoneProgress, WritingStreak,
+)
 from django.conf import settings
 
 
-def apply_templates_to_project(project: Project, include_phd: bool = False, include_detailed: bool = False) -> None:
-    """Apply milestone/task templates to a project.
-    Safe to call multiple times: skips templates already applied.
+# Stage-gated milestone template keys, in the order they must be completed.
+# Override with settings.STAGE_GATE_KEYS.
+GATED_KEYS: tuple[str, ...] = (
+    'core-literature-review-general',
+    'core-literature-review-special',
+    'core-irb-application',
+    'core-preliminary-exam',
+    'core-final-defence',
+)
+
+
+def stage_gate_keys() -> tuple[str, ...]:
+    return tuple(getattr(settings, 'STAGE_GATE_KEYS', None) or GATED_KEYS)
+
+
+# Default word targets for template tasks, as (milestone template keys,
+# substrings the lower-cased task title must all contain, target). Rules are
+# evaluated in order and the last match wins.
+WORD_TARGET_RULES: tuple[tuple[frozenset[str], tuple[str, ...], int], ...] = (
+    (frozenset({'chapter2-general', 'core-literature-review-general'}), ('start general field writing',), 5500),
+    (frozenset({'chapter2-general', 'core-literature-review-general'}), ('goal', '5000'), 5500),
+    (frozenset({'chapter2-special', 'core-literature-review-special'}), ('start special field writing',), 4500),
+    (frozenset({'chapter2-special', 'core-literature-review-special'}), ('goal', '4000'), 4500),
+    (
+        frozenset({'core-literature-review', 'core-literature-review-general', 'core-literature-review-special'}),
+        ('draft literature review',),
+        5500,
+    ),
+    (frozenset({'core-methodology'}), ('draft methodology',), 2500),
+    (frozenset({'core-findings'}), ('draft findings',), 2500),
+    (frozenset({'core-conclusion'}), ('draft conclusion',), 1500),
+)
+
+
+def default_word_target(milestone_key: str, title: str) -> int:
+    title_lower = (title or '').lower()
+    target = 0
+    for keys, needles, value in WORD_TARGET_RULES:
+        if milestone_key in keys and all(n in title_lower for n in needles):
+            target = value
+    return target
+
+
+def apply_templates_to_projects(
+    projects: Iterable[Project],
+    include_phd: bool = False,
+    include_detailed: bool = False,
+    core_only: bool = False,
+) -> int:
+    """Apply milestone/task templates to many projects in one transaction.
+
+    Templates are read once and milestones/tasks are inserted with
+    ``bulk_create``. Safe to call multiple times: templates already applied
+    (by template id, or by milestone name as a fallback) are skipped. With
+    ``core_only`` every ``core-*`` template is applied regardless of the
+    include flags. Returns the number of milestones created.
     """
-    mts: Iterable[MilestoneTemplate] = (
-        MilestoneTemplate.objects.all().order_by('order', 'id')
-    )
-    # Track already-applied templates (by template id and by name as a fallback)
-    existing_tmpl_ids = set(
-        project.milestones.filter(template__isnull=False).values_list('template_id', flat=True)
-    )
-    existing_names = set(project.milestones.values_list('name', flat=True))
-    order = 1
-    for mt in mts:
+    projects = [p for p in projects if p.pk]
+    if not projects:
+        return 0
+    mts = []
+    for mt in MilestoneTemplate.objects.all().order_by('order', 'id'):
+        is_core = str(mt.key).startswith('core-')
+        if core_only:
+            if is_core:
+                mts.append(mt)
+            continue
         if mt.is_phd_only and not include_phd:
             continue
         # Apply core milestones always; apply detailed ones only if requested
-        is_core = str(mt.key).startswith('core-')
         if not is_core and not include_detailed and not mt.is_phd_only:
             continue
-        # Skip if template already applied (or name already present)
-        if (mt.id in existing_tmpl_ids) or (mt.name in existing_names):
-            continue
-        milestone = Milestone.objects.create(
-            project=project,
-            template=mt,
-            name=mt.name,
-            order=order,
-        )
-        order += 1
-        t_order = 1
-        for tt in TaskTemplate.objects.filter(milestone=mt).order_by('order', 'id'):
-            # Heuristics to set default word targets for literature reviews
-            target = 0
-            title_lower = tt.title.lower()
-            if mt.key in ('chapter2-general', 'core-literature-review-general'):
-                if 'start general field writing' in title_lower:
-                    target = 5500
-                if 'goal' in title_lower and '5000' in title_lower:
-                    target = 5500
-            if mt.key in ('chapter2-special', 'core-literature-review-special'):
-                if 'start special field writing' in title_lower:
-                    target = 4500
-                if 'goal' in title_lower and '4000' in title_lower:
-                    target = 4500
-            # Core literature review default target for Draft
-            if mt.key in ('core-literature-review', 'core-literature-review-general', 'core-literature-review-special'):
-                if 'draft literature review' in title_lower:
-                    target = 5500
-            # Core methodology/findings/conclusion default targets for Draft
-            if mt.key == 'core-methodology':
-                if 'draft methodology' in title_lower:
-                    target = 2500
-            if mt.key == 'core-findings':
-                if 'draft findings' in title_lower:
-                    target = 2500
-            if mt.key == 'core-conclusion':
-                if 'draft conclusion' in title_lower:
-                    target = 1500
-
-            Task.objects.create(
-                project=project,
-                milestone=milestone,
-                template=tt,
-                title=tt.title,
-                description=tt.description,
-                order=t_order,
-                word_target=target,
-            )
-            t_order += 1
+        mts.append(mt)
+    if not mts:
+        return 0
+    tts_by_mt: dict[int, list[TaskTemplate]] = {}
+    for tt in TaskTemplate.objects.filter(milestone__in=mts).order_by('order', 'id'):
+        tts_by_mt.setdefault(tt.milestone_id, []).append(tt)
+
+    project_ids = [p.pk for p in projects]
+    existing_tmpl_ids: dict[int, set] = {pid: set() for pid in project_ids}
+    existing_names: dict[int, set] = {pid: set() for pid in project_ids}
+    counts: dict[int, int] = dict.fromkeys(project_ids, 0)
+    for pid, tmpl_id, name in Milestone.objects.filter(project_id__in=project_ids).values_list(
+        'project_id', 'template_id', 'name'
+    ):
+        if tmpl_id:
+            existing_tmpl_ids[pid].add(tmpl_id)
+        existing_names[pid].add(name)
+        counts[pid] += 1
+
+    new_milestones: list[tuple[Milestone, MilestoneTemplate]] = []
+    for project in projects:
+        order = counts[project.pk] + 1
+        for mt in mts:
+            if (mt.id in existing_tmpl_ids[project.pk]) or (mt.name in existing_names[project.pk]):
+                continue
+            new_milestones.append((Milestone(project=project, template=mt, name=mt.name, order=order), mt))
+            order += 1
+    if not new_milestones:
+        return 0
+
+    with transaction.atomic():
+        Milestone.objects.bulk_create([m for m, _ in new_milestones], batch_size=500)
+        tasks = []
+        for milestone, mt in new_milestones:
+            for t_order, tt in enumerate(tts_by_mt.get(mt.id, []), start=1):
+                tasks.append(Task(
+                    project_id=milestone.project_id,
+                    milestone=milestone,
+                    template=tt,
+                    title=tt.title,
+                    description=tt.description,
+                    order=t_order,
+                    word_target=default_word_target(mt.key, tt.title),
+                ))
+        Task.objects.bulk_create(tasks, batch_size=500)
+        # bulk_create skips post_save, so queue the progress refresh ourselves
+        for pid in {m.project_id for m, _ in new_milestones}:
+            schedule_progress_refresh(pid)
+    return len(new_milestones)
+
+
+def apply_templates_to_project(project: Project, include_phd: bool = False, include_detailed: bool = False) -> None:
+    """Apply milestone/task templates to a project.
+    Safe to call multiple times: skips templates already applied.
+    """
+    apply_templates_to_projects([project], include_phd=include_phd, include_detailed=include_detailed)
+
+
+def _streak_state(dates: Iterable) -> tuple[date | None, int, int]:
+    """Return (last_date, run_ending_at_last_date, longest_run) for a set of dates."""
+    days = sorted(set(dates))
+    if not days:
+        return None, 0, 0
+    longest = run = 1
+    for prev, cur in zip(days, days[1:]):
+        run = run + 1 if cur == prev + timedelta(days=1) else 1
+        longest = max(longest, run)
+    return days[-1], run, longest
+
+
+def rebuild_writing_streak(project_id: int) -> WritingStreak | None:
+    """Recompute a project's WritingStreak row from its full WordLog history."""
+    if not Project.objects.filter(pk=project_id).exists():
+        return None
+    dates = WordLog.objects.filter(project_id=project_id, words__gt=0).values_list('date', flat=True)
+    last, run, longest = _streak_state(dates)
+    streak, _ = WritingStreak.objects.update_or_create(
+        project_id=project_id,
+        defaults={'last_log_date': last, 'run_length': run, 'longest_streak': longest},
+    )
+    return streak
+
+
+def _run_bounds(logged: set, day: date) -> tuple[date, date]:
+    """First and last day of the run of consecutive ``logged`` days through ``day``."""
+    start = end = day
+    while start - timedelta(days=1) in logged:
+        start -= timedelta(days=1)
+    while end + timedelta(days=1) in logged:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _logged_near(project_id: int, days: Iterable[date], span: timedelta) -> set:
+    """Positive-word log dates within ``span`` of any of ``days`` (one query)."""
+    window = dj_models.Q()
+    for d in days:
+        window |= dj_models.Q(date__range=(d - span, d + span))
+    return set(
+        WordLog.objects.filter(window, project_id=project_id, words__gt=0).values_list('date', flat=True)
+    )
+
+
+def record_writing_day(project_id: int, day: date) -> None:
+    """Fold a newly logged day into the project's streak.
+
+    O(1) when the day extends or restarts the latest run. Back-filled older
+    dates only re-read the window that can merge with them: neighbouring runs
+    are at most ``longest_streak`` long, so nothing outside
+    ``day ± (longest + 1)`` can change.
+    """
+    # WordLog.date defaults to timezone.now, so unsaved values may be datetimes
+    day = WordLog._meta.get_field('date').to_python(day)
+    with transaction.atomic():
+        streak = WritingStreak.objects.select_for_update().filter(project_id=project_id).first()
+        if streak is None or streak.last_log_date is None:
+            rebuild_writing_streak(project_id)
+            return
+        last = streak.last_log_date
+        if day == last:
+            return
+        if day > last:
+            streak.run_length = streak.run_length + 1 if day == last + timedelta(days=1) else 1
+            streak.last_log_date = day
+        else:
+            logged = _logged_near(project_id, [day], timedelta(days=streak.longest_streak + 1))
+            logged.add(day)
+            start, end = _run_bounds(logged, day)
+            merged = (end - start).days + 1
+            if end == last:
+                streak.run_length = merged
+            streak.longest_streak = max(streak.longest_streak, merged)
+        streak.longest_streak = max(streak.longest_streak, streak.run_length)
+        streak.save(update_fields=['last_log_date', 'run_length', 'longest_streak', 'updated_at'])
+
+
+def update_writing_days(project_id: int, added: Iterable[date] = (), removed: Iterable[date] = ()) -> None:
+    """Apply edited or deleted WordLogs to the project's streak.
+
+    ``added`` are days that gained positive words, ``removed`` days that may
+    have lost them (another log can still cover the day). Only
+    ``± (longest + 1)`` around those days and the latest logged day is
+    re-read, as in record_writing_day(). The full history is only rebuilt
+    when a removal may have broken the longest run, since how long the
+    other runs are is not stored.
+    """
+    to_date = WordLog._meta.get_field('date').to_python
+    added = {to_date(d) for d in added if d}
+    removed = {to_date(d) for d in removed if d} - added
+    if not added and not removed:
+        return
+    with transaction.atomic():
+        streak = WritingStreak.objects.select_for_update().filter(project_id=project_id).first()
+        if streak is None or streak.last_log_date is None:
+            rebuild_writing_streak(project_id)
+            return
+        last, longest = streak.last_log_date, streak.longest_streak
+        span = timedelta(days=longest + 1)
+        logged = _logged_near(project_id, added | removed | {last}, span)
+        # Before the change every removed day was logged, and an added day may have been
+        before = logged | removed
+        for day in removed - logged:
+            start, end = _run_bounds(before, day)
+            if (end - start).days + 1 >= longest:
+                rebuild_writing_streak(project_id)
+                return
+        newest = max(logged, default=None)
+        if newest is None or newest < last - span:
+            # The latest day was removed and nothing was logged near it: find the previous one
+            newest = WordLog.objects.filter(project_id=project_id, words__gt=0).aggregate(
+                last=dj_models.Max('date'))['last']
+            if newest is None:
+                streak.last_log_date, streak.run_length, streak.longest_streak = None, 0, 0
+                streak.save(update_fields=['last_log_date', 'run_length', 'longest_streak', 'updated_at'])
+                return
+        if newest not in added and newest != last:
+            # Its run may reach past the windows read so far
+            logged |= _logged_near(project_id, [newest], span)
+        for day in added & logged:
+            start, end = _run_bounds(logged, day)
+            longest = max(longest, (end - start).days + 1)
+        start, _ = _run_bounds(logged, newest)
+        streak.last_log_date = newest
+        streak.run_length = (newest - start).days + 1
+        streak.longest_streak = max(longest, streak.run_length)
+        streak.save(update_fields=['last_log_date', 'run_length', 'longest_streak', 'updated_at'])
+
+
+def schedule_streak_update(project_id: int | None, added: Iterable[date] = (), removed: Iterable[date] = ()) -> None:
+    """Apply an edited or deleted WordLog to the streak after commit (see update_writing_days)."""
+    added, removed = list(added), list(removed)
+    if project_id and (added or removed):
+        transaction.on_commit(lambda: update_writing_days(project_id, added, removed))
 
 
 def compute_streaks(project: Project) -> tuple[int, int]:
     """Return (current_streak_days, longest_streak_days) based on WordLog with words>0.
     A streak is consecutive calendar days with any positive words.
+
+    Reads the stored WritingStreak row (built on first use).
     """
-    from datetime import date, timedelta
-    logs = list(project.word_logs.filter(words__gt=0).order_by('date').values_list('date', flat=True))
-    if not logs:
+    streak = WritingStreak.objects.filter(project=project).first() or rebuild_writing_streak(project.pk)
+    if streak is None:
         return 0, 0
-    longest = 1
-    current = 1 if logs[-1] == date.today() else 0
-    run = 1
-    for i in range(1, len(logs)):
-        if logs[i] == logs[i-1] + timedelta(days=1):
-            run += 1
-        elif logs[i] == logs[i-1]:
-            # same day duplicate handled by unique_together but be defensive
-            continue
-        else:
-            if run > longest:
-                longest = run
-            run = 1
-    if run > longest:
-        longest = run
-    # recompute current streak from today backwards
-    current = 0
-    day = date.today()
-    s = set(logs)
-    while day in s:
-        current += 1
-        day = day - timedelta(days=1)
-    return current, longest
+    return streak.current_streak(), streak.longest_streak
 
 
 def task_status_percent(task: Task) -> int:
@@ -130,16 +312,79 @@ def task_effort(task: Task) -> Tuple[int, int, int]:
     return words, target, percent
 
 
+# (version, checked_at, weights) shared by all threads in this process; the
+# version is AppSettings.updated_at, which every process can read
+_weights_cache: tuple | None = None
+# Per thread: False once a request starts, True after its first check, None outside requests
+_weights_request = threading.local()
+
+
+def invalidate_app_settings_cache() -> None:
+    """Drop the weights cached in this process (other processes revalidate on their own)."""
+    global _weights_cache
+    _weights_cache = None
+
+
+def start_weights_request() -> None:
+    """Make the next get_progress_weights() in this thread check AppSettings once."""
+    _weights_request.checked = False
+
+
+def end_weights_request() -> None:
+    _weights_request.checked = None
+
+
 def get_progress_weights() -> dict:
     """Return current global weights as a dict {'status': int, 'effort': int}.
 
     Defaults to status=100, effort=0 so effort is hidden by default.
+    Weights are cached in-process and versioned by ``AppSettings.updated_at``.
+    Each request re-reads that one row on its first call (later calls in the
+    request cost no queries), so a save in any process reaches every worker
+    on its next request. Outside requests (scheduler, management commands)
+    the row is re-read at most every APP_SETTINGS_CACHE_TTL seconds.
     """
+    global _weights_cache
+    cached = _weights_cache
+    checked = getattr(_weights_request, 'checked', None)
+    if cached is not None:
+        ttl = float(getattr(settings, 'APP_SETTINGS_CACHE_TTL', 60))
+        if checked or (checked is None and time.monotonic() - cached[1] < ttl):
+            cache_lookup('app_settings', True)
+            return dict(cached[2])
     try:
-        s = AppSettings.get()
-        return {'status': int(s.status_weight or 0), 'effort': int(s.effort_weight or 0)}
+        row = AppSettings.objects.order_by('pk').values('status_weight', 'effort_weight', 'updated_at').first()
+        if row is None:
+            s = AppSettings.get()
+            row = {'status_weight': s.status_weight, 'effort_weight': s.effort_weight, 'updated_at': s.updated_at}
     except Exception:
         return {'status': 100, 'effort': 0}
+    if checked is False:
+        _weights_request.checked = True
+    hit = cached is not None and cached[0] == row['updated_at']
+    cache_lookup('app_settings', hit)
+    weights = cached[2] if hit else {'status': int(row['status_weight'] or 0), 'effort': int(row['effort_weight'] or 0)}
+    _weights_cache = (row['updated_at'], time.monotonic(), weights)
+    return dict(weights)
+
+
+def _combine_percents(status_pct: int, effort_pct: int, weights: dict) -> int:
+    ws = int(weights.get('status', 0))
+    we = int(weights.get('effort', 0))
+    tot = max(1, ws + we)
+    return int(round((ws * status_pct + we * effort_pct) / tot))
+
+
+def combined_from_points(status_points: int, effort_points: int, total: int, weights: dict | None = None) -> int:
+    """Combined percent for a group of tasks from summed per-task percents."""
+    if not total:
+        return 0
+    if getattr(settings, 'SIMPLE_PROGRESS_MODE', False):
+        return int(round(status_points / total))
+    weights = weights or get_progress_weights()
+    ws = int(weights.get('status', 0))
+    we = int(weights.get('effort', 0))
+    return int(round((ws * status_points + we * effort_points) / (max(1, ws + we) * total)))
 
 
 def task_combined_percent(task: Task, weights: dict | None = None) -> int:
@@ -149,8 +394,97 @@ def task_combined_percent(task: Task, weights: dict | None = None) -> int:
     weights = weights or get_progress_weights()
     sp = task_status_percent(task)
     _, __, ep = task_effort(task)
-    tot = max(1, int(weights.get('status', 0)) + int(weights.get('effort', 0)))
-    return int(round((int(weights.get('status', 0)) * sp + int(weights.get('effort', 0)) * ep) / tot))
+    return _combine_percents(sp, ep, weights)
+
+
+class ProgressCalculator:
+    """Compute task/milestone/project progress for many tasks at once.
+
+    Word sums for every task with a target are fetched in a single grouped
+    query; all percents are then served from in-memory maps. Use this instead
+    of calling task_combined_percent() in a loop.
+
+        calc = ProgressCalculator.for_projects(projects)
+        calc.project_summary(p.pk)  # {'percent': .., 'done': .., 'total': ..}
+    """
+
+    def __init__(self, tasks: Iterable[Task], weights: dict | None = None) -> None:
+        self.weights = weights if weights is not None else get_progress_weights()
+        self.simple = bool(getattr(settings, 'SIMPLE_PROGRESS_MODE', False))
+        self.tasks: list[Task] = list(tasks)
+        self._words = self._fetch_word_sums(self.tasks)
+        self._by_milestone: dict[int, list[Task]] = {}
+        self._by_project: dict[int, list[Task]] = {}
+        for t in self.tasks:
+            self._by_milestone.setdefault(t.milestone_id, []).append(t)
+            self._by_project.setdefault(t.project_id, []).append(t)
+
+    @classmethod
+    def for_projects(cls, projects: Iterable[Project], weights: dict | None = None) -> "ProgressCalculator":
+        """Build a calculator covering every task of the given projects."""
+        if isinstance(projects, dj_models.QuerySet) and not projects.query.is_sliced:
+            flt = {'project__in': projects.values('pk')}
+        else:
+            flt = {'project_id__in': [p.pk for p in projects]}
+        tasks = Task.objects.filter(**flt).select_related('milestone').order_by('milestone__order', 'order', 'pk')
+        return cls(tasks, weights)
+
+    @staticmethod
+    def _fetch_word_sums(tasks: list[Task]) -> dict[int, int]:
+        ids = [t.pk for t in tasks if int(t.word_target or 0) > 0]
+        if not ids:
+            return {}
+        rows = (
+            WordLog.objects.filter(task_id__in=ids)
+            .values('task_id')
+            .annotate(total=dj_models.Sum('words'))
+        )
+        return {r['task_id']: int(r['total'] or 0) for r in rows}
+
+    def task_effort(self, task: Task) -> Tuple[int, int, int]:
+        """Same contract as task_effort(): (words_sum, target, percent)."""
+        target = int(task.word_target or 0)
+        words = self._words.get(task.pk, 0) if target > 0 else 0
+        percent = 0 if target <= 0 else min(100, int(round(100 * words / max(1, target))))
+        return words, target, percent
+
+    def task_percent(self, task: Task) -> int:
+        if self.simple:
+            return task_status_percent(task)
+        return _combine_percents(task_status_percent(task), self.task_effort(task)[2], self.weights)
+
+    def annotate(self, tasks: Iterable[Task] | None = None) -> list[Task]:
+        """Set effort_pct/combined_pct on tasks (defaults to all covered tasks)."""
+        out = list(self.tasks if tasks is None else tasks)
+        for t in out:
+            t.effort_pct = self.task_effort(t)[2]
+            t.combined_pct = self.task_percent(t)
+        return out
+
+    def _summary(self, ts: list[Task]) -> dict:
+        total = len(ts)
+        done = sum(1 for t in ts if t.status == 'done')
+        status_points = sum(task_status_percent(t) for t in ts)
+        effort_points = sum(self.task_effort(t)[2] for t in ts)
+        return {
+            'percent': combined_from_points(status_points, effort_points, total, self.weights),
+            'done': done,
+            'total': total,
+            'status_points': status_points,
+            'effort_points': effort_points,
+        }
+
+    def milestone_summary(self, milestone_id: int) -> dict:
+        return self._summary(self._by_milestone.get(milestone_id, []))
+
+    def project_summary(self, project_id: int) -> dict:
+        return self._summary(self._by_project.get(project_id, []))
+
+    def project_percent(self, project_id: int) -> int:
+        return self.project_summary(project_id)['percent']
+
+    def project_tasks(self, project_id: int) -> list[Task]:
+        return list(self._by_project.get(project_id, []))
 
 
 def compute_badges(project: Project) -> list[str]:
@@ -167,3 +501,296 @@ def compute_badges(project: Project) -> list[str]:
         if total_words >= thresh:
             badges.append(label)
     return badges
+
+
+class StageGateEvaluator:
+    """Evaluate stage gates for one or many projects in a single pass.
+
+    Builds a milestone -> tasks tree per project (one milestone query plus one
+    task query, or none if tasks are passed in) and answers which gated
+    milestones are done, which gate is next, and whether a task is blocked.
+    """
+
+    def __init__(self, milestones: Iterable[Milestone], tasks: Iterable[Task], keys: Iterable[str] | None = None,
+                 counts: dict[int, tuple[int, int]] | None = None) -> None:
+        """``counts`` maps milestone id to (total, done) tasks and replaces counting ``tasks``."""
+        self.keys: tuple[str, ...] = tuple(keys) if keys is not None else stage_gate_keys()
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self.milestones: dict[int, list[Milestone]] = {}
+        self._key_by_milestone: dict[int, str] = {}
+        self._gates: dict[int, dict[str, Milestone]] = {}
+        for m in milestones:
+            self.milestones.setdefault(m.project_id, []).append(m)
+            key = getattr(m.template, 'key', None) if m.template_id else None
+            if key in self._index:
+                self._key_by_milestone[m.pk] = key
+                self._gates.setdefault(m.project_id, {}).setdefault(key, m)
+        if counts is None:
+            tally: dict[int, list[int]] = {}
+            for t in tasks:
+                if t.milestone_id in self._key_by_milestone:
+                    c = tally.setdefault(t.milestone_id, [0, 0])
+                    c[0] += 1
+                    c[1] += 1 if t.status == 'done' else 0
+            counts = {mid: (c[0], c[1]) for mid, c in tally.items()}
+        # A gated milestone is done when it has tasks and all of them are done
+        self._done_by_project: dict[int, dict[str, bool]] = {}
+        for pid, by_key in self._gates.items():
+            done: dict[str, bool] = {}
+            for key, m in by_key.items():
+                total, finished = counts.get(m.pk, (0, 0))
+                done[key] = total > 0 and total == finished
+            self._done_by_project[pid] = done
+
+    @classmethod
+    def for_projects(cls, projects: Iterable[Project], tasks: Iterable[Task] | None = None) -> "StageGateEvaluator":
+        ids = [p if isinstance(p, int) else p.pk for p in projects]
+        milestones = Milestone.objects.filter(project_id__in=ids).select_related('template').order_by('order', 'id')
+        if tasks is None:
+            tasks = Task.objects.filter(project_id__in=ids).only('id', 'project_id', 'milestone_id', 'status')
+        return cls(milestones, tasks)
+
+    def done_by_key(self, project_id: int) -> dict[str, bool]:
+        done = self._done_by_project.get(project_id, {})
+        return {key: done.get(key, False) for key in self.keys}
+
+    def _name(self, project_id: int, key: str) -> str:
+        m = self._gates.get(project_id, {}).get(key)
+        return m.name if m else key
+
+    def next_gate(self, project_id: int) -> dict | None:
+        """Return {'key', 'name', 'milestone_id', 'index'} for the first unfinished gate."""
+        done = self._done_by_project.get(project_id, {})
+        for i, key in enumerate(self.keys):
+            if not done.get(key, False):
+                m = self._gates.get(project_id, {}).get(key)
+                return {'key': key, 'name': self._name(project_id, key), 'milestone_id': m.pk if m else None, 'index': i}
+        return None
+
+    def task_flags(self, task: Task) -> tuple[bool, str]:
+        """Return (blocked, wait_for_name) for a task based on earlier gates."""
+        key = self._key_by_milestone.get(task.milestone_id)
+        if key is None:
+            return False, ''
+        done = self._done_by_project.get(task.project_id, {})
+        for prev in self.keys[:self._index[key]]:
+            if not done.get(prev, False):
+                return True, self._name(task.project_id, prev)
+        return False, ''
+
+    def annotate(self, tasks: Iterable[Task]) -> None:
+        """Set gated_blocked/gated_wait on each task."""
+        for t in tasks:
+            t.gated_blocked, t.gated_wait = self.task_flags(t)
+
+
+def refresh_project_progress(project_ids: Iterable[int]) -> int:
+    """Recompute ProjectProgress/MilestoneProgress rows for the given projects.
+
+    Runs a fixed number of queries regardless of how many projects are passed.
+    Returns the number of projects refreshed.
+    """
+    ids = list(Project.objects.filter(pk__in=set(project_ids)).values_list('pk', flat=True))
+    if not ids:
+        return 0
+    tasks = Task.objects.filter(project_id__in=ids).only(
+        'id', 'project_id', 'milestone_id', 'status', 'word_target'
+    )
+    calc = ProgressCalculator(tasks, weights={'status': 100, 'effort': 0})
+    milestones = list(
+        Milestone.objects.filter(project_id__in=ids).select_related('template').order_by('order', 'id')
+    )
+    gates = StageGateEvaluator(milestones, calc.tasks)
+    m_rows = []
+    for m in milestones:
+        ms = calc.milestone_summary(m.pk)
+        m_rows.append(MilestoneProgress(
+            milestone=m, project_id=m.project_id, total_tasks=ms['total'], done_tasks=ms['done'],
+            status_points=ms['status_points'], effort_points=ms['effort_points'],
+        ))
+    p_rows = []
+    for pid in ids:
+        ps = calc.project_summary(pid)
+        row = ProjectProgress(
+            project_id=pid, total_tasks=ps['total'], done_tasks=ps['done'],
+            status_points=ps['status_points'], effort_points=ps['effort_points'],
+        )
+        nxt = gates.next_gate(pid)
+        if nxt:
+            row.gated_next = nxt['name']
+            row.gated_next_milestone_id = nxt['milestone_id']
+            row.gated_next_index = nxt['index']
+        p_rows.append(row)
+    fields = ['total_tasks', 'done_tasks', 'status_points', 'effort_points']
+    with transaction.atomic():
+        ProjectProgress.objects.bulk_create(
+            p_rows, update_conflicts=True, unique_fields=['project'],
+            update_fields=fields + ['gated_next', 'gated_next_milestone', 'gated_next_index'],
+        )
+        if m_rows:
+            MilestoneProgress.objects.bulk_create(
+                m_rows, update_conflicts=True, unique_fields=['milestone'], update_fields=['project'] + fields,
+            )
+    return len(ids)
+
+
+def update_progress(project_ids: Iterable[int] = (), milestone_ids: Iterable[int] = (),
+                    task_ids: Iterable[int] = ()) -> int:
+    """Recount the touched milestones, then re-total their projects from the milestone rows.
+
+    Only tasks of the given milestones (and of the milestones of ``task_ids``)
+    are read; project totals and the next gate are summed from
+    MilestoneProgress rows, so a change costs the size of its milestone, not
+    of the project. Projects with a milestone lacking a row fall back to
+    refresh_project_progress(). Returns the number of projects updated.
+    """
+    milestone_ids = set(milestone_ids)
+    if task_ids:
+        milestone_ids |= set(Task.objects.filter(pk__in=set(task_ids)).values_list('milestone_id', flat=True))
+    with transaction.atomic():
+        project_ids = set(project_ids)
+        if milestone_ids:
+            milestones = list(Milestone.objects.filter(pk__in=milestone_ids).values_list('pk', 'project_id'))
+            project_ids |= {pid for _, pid in milestones}
+            tasks = Task.objects.filter(milestone_id__in=[mid for mid, _ in milestones]).only(
+                'id', 'project_id', 'milestone_id', 'status', 'word_target'
+            )
+            calc = ProgressCalculator(tasks, weights={'status': 100, 'effort': 0})
+            m_rows = []
+            for mid, pid in milestones:
+                ms = calc.milestone_summary(mid)
+                m_rows.append(MilestoneProgress(
+                    milestone_id=mid, project_id=pid, total_tasks=ms['total'], done_tasks=ms['done'],
+                    status_points=ms['status_points'], effort_points=ms['effort_points'],
+                ))
+            if m_rows:
+                MilestoneProgress.objects.bulk_create(
+                    m_rows, update_conflicts=True, unique_fields=['milestone'],
+                    update_fields=['project', 'total_tasks', 'done_tasks', 'status_points', 'effort_points'],
+                )
+        ids = set(Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True)) if project_ids else set()
+        incomplete = set(
+            Milestone.objects.filter(project_id__in=ids, progress__isnull=True).values_list('project_id', flat=True)
+        ) if ids else set()
+        if incomplete:
+            refresh_project_progress(incomplete)
+            ids -= incomplete
+        if not ids:
+            return len(incomplete)
+        sums = {
+            r['project_id']: r for r in MilestoneProgress.objects.filter(project_id__in=ids).values('project_id').annotate(
+                total=dj_models.Sum('total_tasks'), done=dj_models.Sum('done_tasks'),
+                status=dj_models.Sum('status_points'), effort=dj_models.Sum('effort_points'),
+            )
+        }
+        gated = list(
+            Milestone.objects.filter(project_id__in=ids, template__key__in=stage_gate_keys())
+            .select_related('template', 'progress').order_by('order', 'id')
+        )
+        gates = StageGateEvaluator(gated, (), counts={m.pk: (m.progress.total_tasks, m.progress.done_tasks) for m in gated})
+        p_rows = []
+        for pid in ids:
+            r = sums.get(pid, {})
+            row = ProjectProgress(
+                project_id=pid, total_tasks=r.get('total') or 0, done_tasks=r.get('done') or 0,
+                status_points=r.get('status') or 0, effort_points=r.get('effort') or 0,
+            )
+            nxt = gates.next_gate(pid)
+            if nxt:
+                row.gated_next = nxt['name']
+                row.gated_next_milestone_id = nxt['milestone_id']
+                row.gated_next_index = nxt['index']
+            p_rows.append(row)
+        ProjectProgress.objects.bulk_create(
+            p_rows, update_conflicts=True, unique_fields=['project'],
+            update_fields=['total_tasks', 'done_tasks', 'status_points', 'effort_points',
+                           'gated_next', 'gated_next_milestone', 'gated_next_index'],
+        )
+        return len(ids) + len(incomplete)
+
+
+def ensure_project_progress(projects: dj_models.QuerySet) -> int:
+    """Build snapshot rows for any project in ``projects`` that lacks one."""
+    missing = list(projects.filter(progress__isnull=True).values_list('pk', flat=True))
+    return refresh_project_progress(missing) if missing else 0
+
+
+def project_activity(projects: dj_models.QuerySet, start: date, end: date,
+                     due_until: date | None = None) -> dj_models.QuerySet:
+    """Annotate ``projects`` with writing activity for digests and nudges.
+
+    Each project gets ``last_log_date`` and ``window_words`` (words logged
+    from ``start`` to ``end``) from one grouped query; done/total counts come
+    from the joined ``progress`` snapshot. With ``due_until``, open tasks due
+    from ``start`` to ``due_until`` are prefetched (one more query) into
+    ``due_soon``, ordered by due date.
+    """
+    qs = projects.select_related('student', 'progress').annotate(
+        last_log_date=dj_models.Max('word_logs__date'),
+        window_words=Coalesce(
+            dj_models.Sum('word_logs__words', filter=dj_models.Q(word_logs__date__gte=start, word_logs__date__lte=end)),
+            0,
+        ),
+    )
+    if due_until is not None:
+        due = Task.objects.filter(
+            status__in=['todo', 'doing'], due_date__gte=start, due_date__lte=due_until,
+        ).select_related('milestone').order_by('due_date', 'milestone__order', 'order')
+        qs = qs.prefetch_related(dj_models.Prefetch('tasks', queryset=due, to_attr='due_soon'))
+    return qs
+
+
+_pending_refresh = threading.local()
+
+
+def _pending_progress() -> tuple[set, set, set, set]:
+    if not hasattr(_pending_refresh, 'ids'):
+        _pending_refresh.ids = set()
+        _pending_refresh.projects = set()
+        _pending_refresh.milestones = set()
+        _pending_refresh.tasks = set()
+    return _pending_refresh.ids, _pending_refresh.projects, _pending_refresh.milestones, _pending_refresh.tasks
+
+
+def _flush_progress_refresh() -> None:
+    full, projects, milestones, tasks = _pending_progress()
+    if not (full or projects or milestones or tasks):
+        return
+    _pending_refresh.ids, _pending_refresh.projects = set(), set()
+    _pending_refresh.milestones, _pending_refresh.tasks = set(), set()
+    if full:
+        refresh_project_progress(full)
+    if projects - full or milestones or tasks:
+        update_progress(projects - full, milestones, tasks)
+
+
+def schedule_progress_refresh(project_id: int | None) -> None:
+    """Rebuild a project's progress snapshot once the current transaction commits.
+
+    For new projects and bulk inserts; single-row changes use
+    schedule_progress_update(). Many changes to the same project inside one
+    transaction collapse into a single refresh. Deferring to commit also
+    keeps cascading deletes of a project from re-creating its snapshot row
+    mid-delete.
+    """
+    if not project_id:
+        return
+    _pending_progress()[0].add(project_id)
+    transaction.on_commit(_flush_progress_refresh)
+
+
+def schedule_progress_update(project_id: int | None, milestone_id: int | None = None,
+                             task_id: int | None = None) -> None:
+    """Recount one milestone (given directly or through ``task_id``) and re-total its project after commit.
+
+    See update_progress(); a task's milestone is looked up at commit time.
+    """
+    if not project_id:
+        return
+    _, projects, milestones, tasks = _pending_progress()
+    projects.add(project_id)
+    if milestone_id:
+        milestones.add(milestone_id)
+    if task_id:
+        tasks.add(task_id)
+    transaction.on_commit(_flush_progress_refresh)
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Profile
+from .delta import DELTA_SOURCES, delta_kind
+from .ics import schedule_feed_invalidation
+from .models import AppSettings, ChangeTombstone, Milestone, Profile, Project, Task, WordLog
+from .services import (
+    end_weights_request,
+    invalidate_app_settings_cache,
+    record_writing_day,
+    schedule_progress_refresh,
+    schedule_progress_update,
+    schedule_streak_update,
+    start_weights_request,
+)
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -12,3 +24,125 @@ def ensure_profile(sender, instance, created, **kwargs):  # type: ignore[no-unty
     # Create a Profile for each new user; leave role default (student)
     if created:
         Profile.objects.get_or_create(user=instance)
+
+
+# Keep the ProjectProgress snapshot in step with the rows it summarises
+@receiver(post_save, sender=Project)
+def project_progress_created(sender, instance, created, raw=False, **kwargs):  # type: ignore[no-untyped-def]
+    if created and not raw:
+        schedule_progress_refresh(instance.pk)
+
+
+@receiver(pre_save, sender=Task)
+def task_remember_milestone(sender, instance, raw=False, update_fields=None, **kwargs):  # type: ignore[no-untyped-def]
+    # A task moved to another milestone changes the counts of both
+    if raw or instance.pk is None or (update_fields is not None and not {'milestone', 'milestone_id'} & update_fields):
+        return
+    instance._old_milestone_id = Task.objects.filter(pk=instance.pk).values_list('milestone_id', flat=True).first()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_progress_changed(sender, instance, raw=False, **kwargs):  # type: ignore[no-untyped-def]
+    if raw:
+        return
+    schedule_progress_update(instance.project_id, milestone_id=instance.milestone_id)
+    old = getattr(instance, '_old_milestone_id', None)
+    if old and old != instance.milestone_id:
+        schedule_progress_update(instance.project_id, milestone_id=old)
+
+
+@receiver(post_save, sender=Milestone)
+@receiver(post_delete, sender=Milestone)
+def milestone_progress_changed(sender, instance, raw=False, **kwargs):  # type: ignore[no-untyped-def]
+    if not raw:
+        # A deleted milestone's row cascades away; its project is still re-totalled
+        schedule_progress_update(instance.project_id, milestone_id=instance.pk)
+
+
+@receiver(pre_save, sender=WordLog)
+def wordlog_remember_old(sender, instance, raw=False, update_fields=None, **kwargs):  # type: ignore[no-untyped-def]
+    # Edits need the old task (effort) and day/words (streak), which post_save no longer sees
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'task', 'task_id', 'date', 'words'} & update_fields:
+        return
+    instance._old_values = WordLog.objects.filter(pk=instance.pk).values('task_id', 'date', 'words').first()
+
+
+@receiver(post_save, sender=WordLog)
+@receiver(post_delete, sender=WordLog)
+def wordlog_progress_changed(sender, instance, raw=False, **kwargs):  # type: ignore[no-untyped-def]
+    # Only logs against a task count towards effort
+    if raw:
+        return
+    old_task = (getattr(instance, '_old_values', None) or {}).get('task_id')
+    for task_id in {instance.task_id, old_task} - {None}:
+        schedule_progress_update(instance.project_id, task_id=task_id)
+
+
+@receiver(post_save, sender=WordLog)
+def wordlog_streak_saved(sender, instance, created, raw=False, **kwargs):  # type: ignore[no-untyped-def]
+    if raw:
+        return
+    if created:
+        if instance.words:
+            record_writing_day(instance.project_id, instance.date)
+        return
+    old = getattr(instance, '_old_values', None)
+    if old is None:
+        return
+    removed = [old['date']] if old['words'] else []
+    added = [instance.date] if instance.words else []
+    if removed != added:
+        schedule_streak_update(instance.project_id, added=added, removed=removed)
+
+
+@receiver(post_delete, sender=WordLog)
+def wordlog_streak_deleted(sender, instance, **kwargs):  # type: ignore[no-untyped-def]
+    if instance.words:
+        schedule_streak_update(instance.project_id, removed=[instance.date])
+
+
+# Calendar feeds show task titles/dates, milestone names and project status
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_feed_changed(sender, instance, raw=False, **kwargs):  # type: ignore[no-untyped-def]
+    if not raw:
+        schedule_feed_invalidation(instance.pk, student_id=instance.student_id)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Milestone)
+@receiver(post_delete, sender=Milestone)
+def task_feed_changed(sender, instance, raw=False, **kwargs):  # type: ignore[no-untyped-def]
+    if not raw:
+        schedule_feed_invalidation(instance.project_id)
+
+
+@receiver(post_save, sender=AppSettings)
+@receiver(post_delete, sender=AppSettings)
+def app_settings_changed(sender, instance, **kwargs):  # type: ignore[no-untyped-def]
+    invalidate_app_settings_cache()
+
+
+# Each request checks AppSettings once, so saves made by other processes apply on the next request
+@receiver(request_started)
+def weights_request_started(sender, **kwargs):  # type: ignore[no-untyped-def]
+    start_weights_request()
+
+
+@receiver(request_finished)
+def weights_request_finished(sender, **kwargs):  # type: ignore[no-untyped-def]
+    end_weights_request()
+
+
+def record_tombstone(sender, instance, **kwargs):  # type: ignore[no-untyped-def]
+    kind = delta_kind(sender)
+    if kind and instance.pk is not None:
+        ChangeTombstone.objects.create(model=kind, object_id=instance.pk)
+
+
+for _model, _ in DELTA_SOURCES.values():
+    post_delete.connect(record_tombstone, sender=_model, dispatch_uid=f'tracker-tombstone-{_model.__name__}')
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .instrumentation import current_metrics
+
+logger = logging.getLogger(__name__)
+
+# Logger the entries are written to, one JSON object per line
+LOG_NAME = 'tracker.slow_queries'
+SQL_CHARS = 10000
+PARAM_CHARS = 2000
+STACK_FRAMES = 15
+
+_PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+_local = threading.local()
+_handler_lock = threading.Lock()
+
+
+def threshold_ms() -> float:
+    return float(getattr(settings, 'SLOW_QUERY_MS', 0) or 0)
+
+
+def log_path() -> str:
+    return str(getattr(settings, 'SLOW_QUERY_LOG_FILE', '') or Path(_PROJECT_DIR) / 'slow_queries.log')
+
+
+def _entry_logger() -> logging.Logger:
+    """The rotating file logger for SLOW_QUERY_LOG_FILE, created on first use."""
+    log = logging.getLogger(LOG_NAME)
+    path = log_path()
+    with _handler_lock:
+        if not any(getattr(h, 'baseFilename', None) == os.path.abspath(path) for h in log.handlers):
+            for old in list(log.handlers):
+                log.removeHandler(old)
+                old.close()
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                path, maxBytes=int(getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024)),
+                backupCount=int(getattr(settings, 'SLOW_QUERY_LOG_BACKUPS', 3)), encoding='utf-8', delay=True,
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            log.addHandler(handler)
+            log.setLevel(logging.INFO)
+            log.propagate = False
+    return log
+
+
+def _stack() -> list[str]:
+    """Project frames (not Django or this module) that led to the query, innermost last."""
+    frames = [
+        f for f in traceback.extract_stack()[:-3]
+        if f.filename.startswith(_PROJECT_DIR) and f.filename != __file__ and '/site-packages/' not in f.filename
+    ]
+    return [f'{os.path.relpath(f.filename, _PROJECT_DIR)}:{f.lineno} in {f.name}' for f in frames[-STACK_FRAMES:]]
+
+
+def explain(connection: Any, sql: str, params: Any) -> list[str]:
+    """The query plan for a SELECT on SQLite (EXPLAIN QUERY PLAN) or Postgres (EXPLAIN); [] otherwise.
+
+    The plan is read inside a savepoint so a failing EXPLAIN cannot break
+    the caller's transaction. EXPLAIN without ANALYZE does not run the query.
+    """
+    if not str(sql).lstrip().upper().startswith(('SELECT', 'WITH')):
+        return []
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        return []
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+    except Exception as exc:
+        return [f'EXPLAIN failed: {type(exc).__name__}: {exc}']
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail); indent children under their parent
+        depth: dict[int, int] = {}
+        plan = []
+        for row in rows:
+            depth[row[0]] = depth.get(row[1], -1) + 1
+            plan.append('  ' * depth[row[0]] + str(row[-1]))
+        return plan
+    return [str(row[0]) for row in rows]
+
+
+class SlowQueryLogger:
+    """Execute wrapper that logs queries slower than SLOW_QUERY_MS, with their plan."""
+
+    def __init__(self, connection: Any):
+        self.connection = connection
+
+    def __call__(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict) -> Any:
+        limit = threshold_ms()
+        if not limit or getattr(_local, 'active', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        ms = (time.perf_counter() - start) * 1000
+        if ms >= limit:
+            _local.active = True
+            try:
+                self.record(sql, params, many, ms)
+            except Exception:
+                logger.warning('Could not record slow query', exc_info=True)
+            finally:
+                _local.active = False
+        return result
+
+    def record(self, sql: str, params: Any, many: bool, ms: float) -> None:
+        metrics = current_metrics()
+        explain_on = bool(getattr(settings, 'SLOW_QUERY_EXPLAIN', True))
+        entry = {
+            'at': timezone.now().isoformat(),
+            'ms': round(ms, 1),
+            'vendor': self.connection.vendor,
+            'db': self.connection.alias,
+            'view': metrics.view_name if metrics else '',
+            'path': getattr(getattr(metrics, 'request', None), 'path', ''),
+            'sql': str(sql)[:SQL_CHARS],
+            'params': repr(params)[:PARAM_CHARS],
+            'many': many,
+            'stack': _stack(),
+            'plan': explain(self.connection, sql, params) if explain_on and not many else [],
+        }
+        _entry_logger().info(json.dumps(entry))
+
+
+def install_slow_query_log(sender: Any, connection: Any, **kwargs: Any) -> None:
+    """connection_created receiver: wrap new connections while SLOW_QUERY_MS is set.
+
+    With no threshold configured connections are left untouched.
+    """
+    if not threshold_ms():
+        return
+    if not any(isinstance(w, SlowQueryLogger) for w in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryLogger(connection))
+
+
+def read_entries(path: str | None = None) -> Iterator[dict]:
+    """Entries from the log and its rotated backups, oldest file first."""
+    path = path or log_path()
+    backups = int(getattr(settings, 'SLOW_QUERY_LOG_BACKUPS', 3))
+    for candidate in [f'{path}.{i}' for i in range(backups, 0, -1)] + [path]:
+        try:
+            with open(candidate, encoding='utf-8') as fh:
+                for line in fh:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
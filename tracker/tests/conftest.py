@@ -26,3 +26,19 @@ def relax_signup_requirements(settings):  # type: ignore[no-untyped-def]
     settings.REQUIRE_EMAIL_VERIFICATION = False
     # Allow any email domain in tests
     settings.SIGNUP_ALLOWED_EMAIL_DOMAINS = []
+
+
+@pytest.fixture(autouse=True)
+def reset_app_settings_cache():  # type: ignore[no-untyped-def]
+    """Test transactions roll back AppSettings without signals; start each test cold."""
+    from tracker.services import invalidate_app_settings_cache
+    invalidate_app_settings_cache()
+    yield
+
+
+@pytest.fixture
+def query_budget(db):  # type: ignore[no-untyped-def]
+    """``query_budget(body, sizes=..., label=...)`` fails unless ``body(cohort)`` makes a constant number
+    of queries across cohort sizes; see tracker/tests/querybudget.py."""
+    from tracker.tests.querybudget import assert_constant_queries
+    return assert_constant_queries
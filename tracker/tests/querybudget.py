@@ -0,0 +1,207 @@
+"""Query-budget harness: assert a view's query count does not grow with the data.
+
+Use the ``constant_queries`` decorator on TestCase methods, or the
+``query_budget`` fixture (tracker/tests/conftest.py) in pytest functions::
+
+    @constant_queries(sizes=((2, 2), (6, 5)))
+    def test_dashboard(self, cohort: Cohort):
+        self.client.force_login(cohort.advisor)
+        return self.client.get(reverse('advisor_dashboard'))
+
+The body runs once per (projects, tasks) size against a freshly seeded
+cohort inside a rolled-back savepoint. Only the queries of the request(s)
+made in the body are counted; streamed responses are consumed while
+recording. On failure the SQL is listed grouped by the tracker frame that
+issued it, so the loop that fans out is easy to find.
+"""
+from __future__ import annotations
+
+import functools
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import connections, transaction
+from django.test import TestCase
+
+from tracker.models import FeedbackRequest, Milestone, Profile, Project, Task, WordLog
+from tracker.services import invalidate_app_settings_cache
+
+DEFAULT_SIZES = ((2, 2), (6, 5))
+
+_TRACKER_DIR = str(Path(__file__).resolve().parent.parent)
+_TESTS_DIR = str(Path(__file__).resolve().parent)
+
+
+@dataclass
+class Cohort:
+    advisor: User
+    students: list[User] = field(default_factory=list)
+    projects: list[Project] = field(default_factory=list)
+
+    @property
+    def student(self) -> User:
+        return self.students[0]
+
+    @property
+    def project(self) -> Project:
+        return self.projects[0]
+
+
+def seed_cohort(projects: int, tasks: int, prefix: str = 'qb') -> Cohort:
+    """An advisor plus ``projects`` students, each with ``tasks`` tasks over two milestones,
+    a word log per task and a feedback request.
+
+    Deferred on-commit work (progress snapshots, streaks) runs as it would in
+    production, so views see steady-state data.
+    """
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        return _seed(projects, tasks, prefix)
+
+
+def _seed(projects: int, tasks: int, prefix: str) -> Cohort:
+    advisor = User.objects.create_user(username=f'{prefix}-advisor', password='x', email=f'{prefix}-advisor@example.com')
+    Profile.objects.update_or_create(user=advisor, defaults={'role': 'advisor'})
+    cohort = Cohort(advisor=advisor)
+    today = date.today()
+    for i in range(projects):
+        student = User.objects.create_user(username=f'{prefix}-s{i}', password='x', email=f'{prefix}-s{i}@example.com')
+        project = Project.objects.create(student=student, title=f'Project {i}')
+        milestones = [Milestone.objects.create(project=project, name=name, order=n) for n, name in enumerate(('Intro', 'Methods'), 1)]
+        for j in range(tasks):
+            task = Task.objects.create(
+                project=project, milestone=milestones[j % 2], title=f'Task {j}', order=j,
+                status='done' if j % 3 == 0 else 'todo', due_date=today + timedelta(days=j), word_target=500,
+            )
+            WordLog.objects.create(project=project, task=task, date=today - timedelta(days=j), words=100 + j)
+        FeedbackRequest.objects.create(project=project, note='Please review')
+        cohort.students.append(student)
+        cohort.projects.append(project)
+    return cohort
+
+
+def _origin(stack: Iterable[traceback.FrameSummary]) -> str:
+    frames = [f for f in stack if f.filename.startswith(_TRACKER_DIR) and not f.filename.startswith(_TESTS_DIR)]
+    if not frames:
+        return '(outside tracker)'
+    f = frames[-1]
+    return f'{Path(f.filename).relative_to(Path(_TRACKER_DIR).parent)}:{f.lineno} in {f.name}'
+
+
+def _shape(sql: str) -> str:
+    # Literal values differ per row; the statement shape is what repeats in an N+1
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    sql = re.sub(r'"s\d+_x\d+"', '?', sql)  # savepoint names
+    return re.sub(r'\(\?(?:, \?)+\)', '(?, ...)', ' '.join(sql.split()))[:200]
+
+
+class QueryRecorder:
+    """Record each query's SQL and the tracker frame that issued it.
+
+    Only queries made while a request is being handled are kept (between
+    the request_started and request_finished signals), so logging in and
+    other test setup inside the body do not count.
+    """
+
+    def __init__(self) -> None:
+        self.queries: list[tuple[str, str]] = []
+        self._in_request = False
+
+    def __call__(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict) -> Any:
+        if self._in_request:
+            self.queries.append((_origin(traceback.extract_stack()[:-1]), _shape(sql)))
+        return execute(sql, params, many, context)
+
+    def _started(self, **kwargs: Any) -> None:
+        self._in_request = True
+
+    def _finished(self, **kwargs: Any) -> None:
+        self._in_request = False
+
+    def record(self, fn: Callable[[], Any]) -> Any:
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(self))
+            request_started.connect(self._started)
+            request_finished.connect(self._finished)
+            stack.callback(request_started.disconnect, self._started)
+            stack.callback(request_finished.disconnect, self._finished)
+            result = fn()
+            for response in result if isinstance(result, (list, tuple)) else [result]:
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+            return result
+
+    def grouped(self) -> Counter:
+        return Counter(self.queries)
+
+
+def _report(label: str, runs: list[tuple[tuple[int, int], QueryRecorder]]) -> str:
+    counts = ', '.join(f'{n} projects x {m} tasks: {len(r.queries)}' for (n, m), r in runs)
+    lines = [f'{label}: query count grows with the data ({counts})']
+    small, large = runs[0][1].grouped(), runs[-1][1].grouped()
+    growing = sorted(((key, small.get(key, 0), large.get(key, 0)) for key in small.keys() | large.keys()
+                      if small.get(key, 0) != large.get(key, 0)), key=lambda item: -item[2])
+    by_origin: dict[str, list[str]] = {}
+    for (origin, sql), before, after in growing:
+        by_origin.setdefault(origin, []).append(f'    {before} -> {after}  {sql}')
+    for origin, entries in by_origin.items():
+        lines.append(f'  {origin}')
+        lines.extend(entries)
+    return '\n'.join(lines)
+
+
+def measure(body: Callable[[Cohort], Any], sizes: Iterable[tuple[int, int]] = DEFAULT_SIZES,
+            setup: Callable[[Cohort], None] | None = None) -> list[tuple[tuple[int, int], QueryRecorder]]:
+    """Run ``body(cohort)`` once per size, each against a freshly seeded cohort that is rolled back."""
+    runs = []
+    for n, m in sizes:
+        with transaction.atomic():
+            cohort = seed_cohort(n, m)
+            if setup is not None:
+                setup(cohort)
+            # Start each run cold so per-process caches do not hide queries
+            cache.clear()
+            invalidate_app_settings_cache()
+            recorder = QueryRecorder()
+            recorder.record(lambda: body(cohort))
+            runs.append(((n, m), recorder))
+            transaction.set_rollback(True)
+    return runs
+
+
+def assert_constant_queries(body: Callable[[Cohort], Any], sizes: Iterable[tuple[int, int]] = DEFAULT_SIZES,
+                            label: str = 'view', setup: Callable[[Cohort], None] | None = None) -> int:
+    """Fail unless ``body`` makes the same number of queries for every size; returns that number."""
+    runs = measure(body, sizes, setup)
+    counts = {len(r.queries) for _, r in runs}
+    if len(counts) > 1:
+        raise AssertionError(_report(label, runs))
+    return counts.pop()
+
+
+def constant_queries(sizes: Iterable[tuple[int, int]] = DEFAULT_SIZES, max_queries: int | None = None
+                     ) -> Callable[[Callable[..., Any]], Callable[..., None]]:
+    """TestCase method decorator; the method receives the seeded Cohort and makes its request(s).
+
+    ``max_queries`` additionally caps the (constant) count.
+    """
+    sizes = tuple(sizes)
+
+    def decorator(method: Callable[..., Any]) -> Callable[..., None]:
+        @functools.wraps(method)
+        def wrapper(self: Any) -> None:
+            count = assert_constant_queries(lambda cohort: method(self, cohort), sizes, label=method.__name__)
+            if max_queries is not None and count > max_queries:
+                self.fail(f'{method.__name__}: {count} queries, budget is {max_queries}')
+        return wrapper
+    return decorator
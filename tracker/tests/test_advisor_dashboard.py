@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from tracker.models import Milestone, Profile, Project, Task
+
+
+class AdvisorDashboardPaginationTests(TestCase):
+    def setUp(self) -> None:
+        # Seven projects with 0..6 of 6 tasks done; snapshot rows are built on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(7):
+                u = User.objects.create_user(username=f"s{i}", password="x")
+                p = Project.objects.create(student=u, title=f"Project {i}")
+                m = Milestone.objects.create(project=p, name="Intro", order=1)
+                for j in range(6):
+                    Task.objects.create(project=p, milestone=m, title=f"T{j}", order=j, status="done" if j < i else "todo")
+        advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        self.client.login(username="adv", password="pass")
+        self.url = reverse("advisor_dashboard")
+
+    def titles(self, r) -> list[str]:
+        return [p.title for p in r.context["projects"]]
+
+    def test_status_sort_walks_pages_with_cursors(self):
+        r = self.client.get(self.url, {"sort": "status", "per": 3})
+        self.assertEqual(self.titles(r), ["Project 6", "Project 5", "Project 4"])
+        page = r.context["page"]
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+        r2 = self.client.get(self.url, {"sort": "status", "per": 3, "after": page.next_cursor})
+        self.assertEqual(self.titles(r2), ["Project 3", "Project 2", "Project 1"])
+        r3 = self.client.get(self.url, {"sort": "status", "per": 3, "after": r2.context["page"].next_cursor})
+        self.assertEqual(self.titles(r3), ["Project 0"])
+        self.assertFalse(r3.context["page"].has_next)
+        back = self.client.get(self.url, {"sort": "status", "per": 3, "before": r3.context["page"].previous_cursor})
+        self.assertEqual(self.titles(back), ["Project 3", "Project 2", "Project 1"])
+        self.assertTrue(back.context["page"].has_previous)
+
+    def test_page_query_count_is_independent_of_cohort_size(self):
+        self.client.get(self.url, {"sort": "tasks", "per": 3})  # creates AppSettings
+        # session, user, profile, AppSettings check, page
+        with self.assertNumQueries(5):
+            r = self.client.get(self.url, {"sort": "gate", "per": 3})
+        self.assertEqual(len(r.context["projects"]), 3)
+        self.assertEqual(r.context["projects"][0].total_tasks, 6)
+
+    def test_garbled_cursor_falls_back_to_first_page(self):
+        r = self.client.get(self.url, {"sort": "title", "after": "not-a-cursor"})
+        self.assertEqual(self.titles(r)[0], "Project 0")
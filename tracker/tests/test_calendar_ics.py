@@ -3,14 +3,24 @@ from __future__ import annotations
 from datetime import date
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
-from tracker.models import Project, Milestone, Task, Profile
+from tracker.ics import bump_feed_versions, escape_text, fold_line
+from tracker.models import FeedVersion, Project, Milestone, Task, Profile
+
+
+def _body(response) -> str:  # type: ignore[no-untyped-def]
+    # Advisor feeds stream on a cache miss
+    data = b"".join(response.streaming_content) if response.streaming else response.content
+    return data.decode("utf-8")
 
 
 class CalendarIcsTokenTests(TestCase):
     def setUp(self) -> None:
+        # Rendered bodies live in the cache, which outlives each test's rollback
+        cache.clear()
         # Student + project + task with due date
         self.student = User.objects.create_user(username="sue", password="pass", email="sue@example.com")
         self.project = Project.objects.create(student=self.student, title="Sues Thesis")
@@ -42,8 +52,140 @@ class CalendarIcsTokenTests(TestCase):
         url = reverse("advisor_calendar_ics_token", args=[self.advisor_token])
         r = self.client.get(url)
         self.assertEqual(r.status_code, 200)
-        body = r.content.decode("utf-8")
+        body = _body(r)
         self.assertIn("BEGIN:VCALENDAR", body)
         self.assertIn("BEGIN:VEVENT", body)
         self.assertIn("SUMMARY:sue: Draft", body)
 
+
+
+class CalendarIcsCachingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.student = User.objects.create_user(username="sam", password="pass")
+        self.project = Project.objects.create(student=self.student, title="Thesis")
+        self.milestone = Milestone.objects.create(project=self.project, name="Intro", order=1)
+        self.task = Task.objects.create(
+            project=self.project, milestone=self.milestone, title="Draft", status="todo", order=1,
+            due_date=date.today(),
+        )
+        prof, _ = Profile.objects.update_or_create(user=self.student, defaults={"role": "student"})
+        self.url = reverse("calendar_ics_token", args=[prof.ensure_student_token()])
+        advisor = User.objects.create_user(username="adv", password="pass")
+        aprof, _ = Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        self.advisor_url = reverse("advisor_calendar_ics_token", args=[aprof.ensure_advisor_token()])
+
+    def test_body_is_stable_and_stamped_from_task(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertIn("Last-Modified", first)
+        self.task.refresh_from_db()
+        self.assertIn(f"DTSTAMP:{self.task.updated_at:%Y%m%dT%H%M%SZ}", first.content.decode())
+
+    def test_matching_etag_gets_304_with_two_queries(self):
+        etag = self.client.get(self.url)["ETag"]
+        # Token lookup and feed version
+        with self.assertNumQueries(2):
+            r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.content, b"")
+        self.assertEqual(r["ETag"], etag)
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        r = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(r.status_code, 304)
+
+    def test_task_change_invalidates_feed(self):
+        etag = self.client.get(self.url)["ETag"]
+        adv_etag = self.client.get(self.advisor_url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = "Revise"
+            self.task.save()
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        self.assertIn("SUMMARY:Revise", r.content.decode())
+        r = self.client.get(self.advisor_url, HTTP_IF_NONE_MATCH=adv_etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("SUMMARY:sam: Revise", _body(r))
+
+    def test_version_is_shared_through_the_database(self):
+        first = self.client.get(self.url)
+        # Another worker's cache: empty, but the version row is the same
+        cache.clear()
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(r.status_code, 304)
+        # A bump from any process changes the ETag, so the old cached body is never served
+        bump_feed_versions([self.student.pk])
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], first["ETag"])
+        self.assertEqual(FeedVersion.objects.filter(scope=f"student:{self.student.pk}").count(), 1)
+
+    def test_advisor_window_has_its_own_etag(self):
+        a = self.client.get(self.advisor_url)
+        b = self.client.get(self.advisor_url + "?days=7")
+        self.assertNotEqual(a["ETag"], b["ETag"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.status = "archived"
+            self.project.save()
+        r = self.client.get(self.url)
+        self.assertNotIn("BEGIN:VEVENT", r.content.decode())
+
+
+class IcsFormattingTests(TestCase):
+    def test_escape_text(self):
+        self.assertEqual(escape_text("a,b;c\\d\ne"), "a\\,b\\;c\\\\d\\ne")
+
+    def test_fold_line_limits_octets(self):
+        for line in ("SUMMARY:" + "x" * 200, "SUMMARY:" + "é" * 120, "SUMMARY:short"):
+            folded = fold_line(line)
+            self.assertTrue(folded.endswith("\r\n"))
+            physical = folded[:-2].split("\r\n")
+            self.assertTrue(all(len(p.encode("utf-8")) <= 75 for p in physical))
+            self.assertTrue(all(p.startswith(" ") for p in physical[1:]))
+            self.assertEqual("".join(p[1:] if i else p for i, p in enumerate(physical)), line)
+
+
+class AdvisorIcsStreamingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        advisor = User.objects.create_user(username="adv", password="pass")
+        aprof, _ = Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        self.url = reverse("advisor_calendar_ics_token", args=[aprof.ensure_advisor_token()])
+        for i in range(3):
+            student = User.objects.create_user(username=f"s{i}", password="pass")
+            project = Project.objects.create(student=student, title=f"Thesis, part {i}")
+            m = Milestone.objects.create(project=project, name="Intro", order=1)
+            Task.objects.create(project=project, milestone=m, title="Write; " + "long " * 30, status="todo", order=1,
+                                due_date=date.today())
+
+    def test_streams_then_serves_from_cache(self):
+        r = self.client.get(self.url)
+        self.assertTrue(r.streaming)
+        body = _body(r)
+        self.assertEqual(body.count("BEGIN:VEVENT"), 3)
+        self.assertIn("SUMMARY:s0: Write\\; long", body)
+        self.assertIn("DESCRIPTION:Project: Thesis\\, part 0\\nMilestone: Intro", body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split("\r\n")))
+        cached = self.client.get(self.url)
+        self.assertFalse(cached.streaming)
+        self.assertEqual(cached.content.decode(), body)
+
+    def test_oversized_window_is_clamped(self):
+        capped = self.client.get(self.url + "?days=365")
+        r = self.client.get(self.url + "?days=10000000")
+        self.assertEqual(r.status_code, 200)
+        body = _body(r)
+        self.assertTrue(body.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(body.count("BEGIN:VEVENT"), 3)
+        # Same variant as the maximum window, so no extra cache entry
+        self.assertEqual(r["ETag"], capped["ETag"])
+
+    def test_large_feed_is_not_cached(self):
+        with self.settings(ICS_FEED_CACHE_MAX_BYTES=100):
+            first = _body(self.client.get(self.url))
+            r = self.client.get(self.url)
+            self.assertTrue(r.streaming)
+            self.assertEqual(_body(r), first)
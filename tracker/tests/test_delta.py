@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import io
+import json
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tracker.models import Milestone, Profile, Project, Task, WordLog
+
+
+@override_settings(DELTA_EXPORT_LAG_SECONDS=0)
+class DeltaExportTests(TestCase):
+    def setUp(self) -> None:
+        advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        self.student = User.objects.create_user(username="stu", password="pass")
+        self.project = Project.objects.create(student=self.student, title="Thesis")
+        self.milestone = Milestone.objects.create(project=self.project, name="Intro", order=1)
+        self.task = Task.objects.create(project=self.project, milestone=self.milestone, title="Write", order=1)
+        WordLog.objects.create(project=self.project, task=self.task, date=date.today(), words=100)
+        self.client.login(username="adv", password="pass")
+
+    def _fetch(self, **params) -> tuple[list[dict], dict]:  # type: ignore[no-untyped-def]
+        resp = self.client.get(reverse("advisor_changes_ndjson"), params)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(ln) for ln in b"".join(resp.streaming_content).splitlines()]
+        return lines[:-1], lines[-1]
+
+    def test_only_changes_after_cursor(self):
+        records, trailer = self._fetch()
+        self.assertEqual(sorted(r["type"] for r in records), ["project", "task", "wordlog"])
+        self.assertTrue(trailer["complete"])
+        # Nothing changed since: empty page
+        records, again = self._fetch(cursor=trailer["cursor"])
+        self.assertEqual(records, [])
+        # A save with update_fields still bumps the watermark
+        self.task.status = "done"
+        self.task.save(update_fields=["status"])
+        records, _ = self._fetch(cursor=trailer["cursor"])
+        self.assertEqual([(r["type"], r["id"], r["data"]["status"]) for r in records], [("task", self.task.pk, "done")])
+
+    def test_deletes_reported_as_tombstones(self):
+        _, trailer = self._fetch()
+        task_id = self.task.pk
+        self.task.delete()
+        records, _ = self._fetch(cursor=trailer["cursor"])
+        self.assertIn({"type": "task", "op": "delete", "id": task_id}, [
+            {k: r[k] for k in ("type", "op", "id")} for r in records
+        ])
+
+    def test_limit_pages_until_complete(self):
+        for i in range(3):
+            Task.objects.create(project=self.project, milestone=self.milestone, title=f"T{i}", order=i + 2)
+        seen, cursor = [], ""
+        for _ in range(5):
+            records, trailer = self._fetch(cursor=cursor, limit=2) if cursor else self._fetch(limit=2)
+            seen += [r["id"] for r in records if r["type"] == "task"]
+            cursor = trailer["cursor"]
+            if trailer["complete"]:
+                break
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list("pk", flat=True)))
+
+    def test_garbled_cursor_rejected(self):
+        resp = self.client.get(reverse("advisor_changes_ndjson"), {"cursor": "not-a-cursor"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_command_keeps_state_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            state = Path(tmp) / "cursor"
+            out = Path(tmp) / "changes.ndjson"
+            call_command("export_changes", state_file=str(state), output=str(out), stderr=io.StringIO())
+            self.assertEqual(len(out.read_text().splitlines()), 3)
+            WordLog.objects.create(project=self.project, date=date(2020, 1, 1), words=5)
+            call_command("export_changes", state_file=str(state), output=str(out), stderr=io.StringIO())
+            rows = [json.loads(ln) for ln in out.read_text().splitlines()]
+            self.assertEqual([r["type"] for r in rows], ["wordlog"])
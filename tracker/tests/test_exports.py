@@ -2,12 +2,23 @@ from __future__ import annotations
 
 import csv
 import io
+import json
+import random
+import shutil
+import tempfile
+import zipfile
+from datetime import date
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
-from tracker.models import Project, Milestone, Task, Profile
+from tracker.exports import stream_project_zip
+from tracker.services import get_progress_weights
+from tracker.models import Document, ExportJob, Milestone, Profile, Project, Task, WordLog
 
 
 class AdvisorExportsTests(TestCase):
@@ -27,15 +38,165 @@ class AdvisorExportsTests(TestCase):
         r = self.client.get(url)
         self.assertEqual(r.status_code, 200)
         self.assertEqual(r["Content-Type"], "application/json")
-        self.assertIn("Sues Thesis", r.content.decode("utf-8"))
+        self.assertIn("Sues Thesis", b"".join(r.streaming_content).decode("utf-8"))
 
     def test_advisor_export_csv(self):
         url = reverse("advisor_export_csv")
         r = self.client.get(url)
         self.assertEqual(r.status_code, 200)
         # Parse minimal CSV to ensure header present
-        reader = csv.reader(io.StringIO(r.content.decode("utf-8")))
+        reader = csv.reader(io.StringIO(b"".join(r.streaming_content).decode("utf-8")))
         header = next(reader)
         self.assertIn("project_id", header)
         rows = list(reader)
         self.assertTrue(any(str(self.project.id) in row for row in rows))
+
+
+class ZipExportTests(TestCase):
+    def setUp(self) -> None:
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.student = User.objects.create_user(username="bob", password="pass")
+        self.project = Project.objects.create(student=self.student, title="Project Bob")
+        m = Milestone.objects.create(project=self.project, name="Intro", order=1)
+        Task.objects.create(project=self.project, milestone=m, title="Write", order=1)
+        WordLog.objects.create(project=self.project, date=date.today(), words=123)
+        self.payload = random.Random(0).randbytes(512 * 1024)
+        Document.objects.create(
+            project=self.project,
+            file=SimpleUploadedFile("draft.bin", self.payload),
+            filename="draft.bin",
+            size=len(self.payload),
+        )
+        # A document whose file has gone missing is skipped
+        Document.objects.create(project=self.project, file="uploads/missing.pdf", filename="missing.pdf")
+
+    def _read_zip(self, resp) -> zipfile.ZipFile:  # type: ignore[no-untyped-def]
+        self.assertTrue(resp.streaming)
+        return zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content)))
+
+    def test_my_export_zip_streams_archive(self):
+        self.client.login(username="bob", password="pass")
+        zf = self._read_zip(self.client.get(reverse("my_export_zip")))
+        self.assertIsNone(zf.testzip())
+        names = zf.namelist()
+        self.assertEqual(names[:4], ["tasks.json", "tasks.csv", "logs.json", "logs.csv"])
+        doc = Document.objects.get(filename="draft.bin")
+        self.assertEqual(zf.read(f"attachments/{doc.id}_draft.bin"), self.payload)
+        self.assertEqual(len(names), 5)
+        self.assertIn("123", zf.read("logs.csv").decode("utf-8"))
+
+    def test_advisor_export_zip_matches(self):
+        advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        self.client.login(username="adv", password="pass")
+        resp = self.client.get(reverse("advisor_project_export_zip", args=[self.project.pk]))
+        self.assertIn(f"project_{self.project.pk}_export.zip", resp["Content-Disposition"])
+        self.assertEqual(len(self._read_zip(resp).namelist()), 5)
+
+    def test_attachment_copied_in_chunks(self):
+        chunks = [c for c in stream_project_zip(self.project, chunk_size=16 * 1024) if c]
+        self.assertGreater(len(chunks), 10)
+        # Each yielded piece stays around the read size, not the attachment size
+        self.assertLess(max(len(c) for c in chunks), len(self.payload) // 4)
+
+
+class CohortExportJobTests(TestCase):
+    def setUp(self) -> None:
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, EXPORT_SPOOL_MAX_BYTES=1024)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=self.advisor, defaults={"role": "advisor"})
+        for name in ("ann", "ben"):
+            student = User.objects.create_user(username=name, password="pass")
+            project = Project.objects.create(student=student, title=f"Project {name}")
+            Milestone.objects.create(project=project, name="Intro", order=1)
+        archived = User.objects.create_user(username="old", password="pass")
+        Project.objects.create(student=archived, title="Old", status="archived")
+        self.client.login(username="adv", password="pass")
+
+    def _build(self) -> ExportJob:
+        self.client.post(reverse("advisor_exports"))
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, "pending")
+        call_command("run_export_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        return job
+
+    def test_worker_builds_cohort_archive(self):
+        job = self._build()
+        self.assertEqual((job.status, job.done_projects, job.total_projects, job.percent), ("done", 2, 2, 100))
+        resp = self.client.get(reverse("advisor_export_download", args=[job.pk]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Accept-Ranges"], "bytes")
+        body = b"".join(resp.streaming_content)
+        self.assertEqual(len(body), job.size)
+        names = zipfile.ZipFile(io.BytesIO(body)).namelist()
+        self.assertIn(f"ann_{Project.objects.get(title='Project ann').pk}/tasks.json", names)
+        self.assertFalse(any(n.startswith("old_") for n in names))
+        # Progress partial for HTMX polling
+        resp = self.client.get(reverse("advisor_exports"), HTTP_HX_REQUEST="true")
+        self.assertContains(resp, "2/2 projects")
+
+    def test_download_resumes_with_range(self):
+        job = self._build()
+        url = reverse("advisor_export_download", args=[job.pk])
+        full = b"".join(self.client.get(url).streaming_content)
+        resp = self.client.get(url, HTTP_RANGE="bytes=100-")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], f"bytes 100-{job.size - 1}/{job.size}")
+        self.assertEqual(b"".join(resp.streaming_content), full[100:])
+        resp = self.client.get(url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(resp.streaming_content), full[-10:])
+        # A stale validator gets the whole file instead of a mismatched tail
+        resp = self.client.get(url, HTTP_RANGE="bytes=100-", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(url, HTTP_RANGE=f"bytes={job.size}-")
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp["Content-Range"], f"bytes */{job.size}")
+
+    def test_download_limited_to_requester(self):
+        job = self._build()
+        other = User.objects.create_user(username="adv2", password="pass")
+        Profile.objects.update_or_create(user=other, defaults={"role": "advisor"})
+        self.client.login(username="adv2", password="pass")
+        self.assertEqual(self.client.get(reverse("advisor_export_download", args=[job.pk])).status_code, 404)
+
+
+class AdvisorSummaryExportTests(TestCase):
+    def setUp(self) -> None:
+        advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        for i in range(5):
+            student = User.objects.create_user(username=f"s{i}", password="pass", email=f"s{i}@example.com")
+            project = Project.objects.create(student=student, title=f"Thesis {i}")
+            m = Milestone.objects.create(project=project, name="Intro", order=1)
+            Task.objects.create(
+                project=project, milestone=m, title="Write", order=1, word_target=100,
+                status="done" if i % 2 else "todo",
+            )
+        self.client.login(username="adv", password="pass")
+
+    def test_json_export_streams_valid_array(self):
+        resp = self.client.get(reverse("advisor_export_json"))
+        self.assertTrue(resp.streaming)
+        data = json.loads(b"".join(resp.streaming_content))
+        self.assertEqual([d["author"] for d in data], [f"s{i}" for i in range(5)])
+        self.assertEqual([d["done_tasks"] for d in data], [0, 1, 0, 1, 0])
+
+    def test_csv_export_queries_per_batch(self):
+        get_progress_weights()
+        with patch("tracker.exports.EXPORT_BATCH_SIZE", 2):
+            resp = self.client.get(reverse("advisor_export_csv"))
+            # AppSettings check + projects + (tasks, word sums) per batch of 2 -> 2 + 3 * 2
+            with self.assertNumQueries(8):
+                body = b"".join(resp.streaming_content).decode("utf-8")
+        lines = body.splitlines()
+        self.assertEqual(lines[0], "project_id,author,email,title,total_tasks,done_tasks,combined_percent")
+        self.assertEqual(len(lines), 6)
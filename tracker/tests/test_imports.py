@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tracker.imports import AdvisorImporter, ImportOptions, iter_csv_rows, retry_import_job
+from tracker.models import ImportJob, MilestoneTemplate, Profile, Project, TaskTemplate
+
+HEADER = "username,email,title,apply_templates,status,password,display_name,new_title"
+
+
+def _rows(lines: list[str]) -> list[dict]:
+    return list(iter_csv_rows(io.BytesIO("\n".join([HEADER, *lines]).encode("utf-8"))))
+
+
+class AdvisorImporterTests(TestCase):
+    def setUp(self) -> None:
+        existing = User.objects.create_user(username="old", password="x", email="old@example.com")
+        Project.objects.create(student=existing, title="Old Project")
+        mt = MilestoneTemplate.objects.create(key="core-intro", name="Introduction", order=1)
+        TaskTemplate.objects.create(milestone=mt, key="draft", title="Draft introduction", order=1)
+
+    def test_query_count_does_not_grow_per_row(self):
+        rows = _rows([f"u{i},u{i}@example.com,Thesis {i},1,active,,User {i}," for i in range(200)])
+        rows += _rows(["old,new@example.com,Old Project,0,archived,,Old Timer,Renamed"])
+        # 3 lookups, then batched inserts/updates and templates inside savepoints,
+        # then the updated_at stamps; SQLite splits the larger inserts by its variable limit
+        with self.assertNumQueries(29):
+            report = AdvisorImporter(ImportOptions()).run(rows)
+        self.assertEqual(
+            (report.created_users, report.updated_users, report.created_projects, report.updated_projects),
+            (200, 1, 200, 1),
+        )
+        self.assertEqual(Profile.objects.get(user__username="u7").display_name, "User 7")
+        self.assertEqual(Project.objects.get(student__username="u7").tasks.count(), 1)
+        old = Project.objects.get(student__username="old")
+        self.assertEqual((old.title, old.status), ("Renamed", "archived"))
+        self.assertEqual(User.objects.get(username="old").email, "new@example.com")
+
+    def test_rows_are_stamped_just_before_commit(self):
+        rows = _rows(["n1,n1@example.com,New,1,active,,,", "old,,Old Project,0,archived,,,"])
+        with CaptureQueriesContext(connection) as ctx:
+            AdvisorImporter(ImportOptions()).run(rows)
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        # The delta export reads updated_at, so the chunk's last writes restamp every exported row
+        self.assertTrue(writes[-2].startswith('UPDATE "tracker_project" SET "updated_at"'))
+        self.assertTrue(writes[-1].startswith('UPDATE "tracker_task" SET "updated_at"'))
+        self.assertEqual(
+            len({p.updated_at for p in Project.objects.filter(title__in=["New", "Old Project"])}), 1,
+        )
+
+    def test_dry_run_report_matches_real_run(self):
+        lines = [
+            "a,a@example.com,First,0,active,,,",
+            "a,a@example.com,Second,0,active,,,",
+            ",,Nameless,0,active,,,",
+            "old,,Old Project,0,archived,,,",
+        ]
+        dry = AdvisorImporter(ImportOptions(dry_run=True), chunk_rows=2).run(_rows(lines))
+        self.assertFalse(User.objects.filter(username="a").exists())
+        real = AdvisorImporter(ImportOptions(), chunk_rows=2).run(_rows(lines))
+        # Only project updates differ: a dry run has always reported them as 0
+        self.assertEqual((dry.updated_projects, real.updated_projects), (0, 1))
+        dry.updated_projects = real.updated_projects
+        self.assertEqual(dry, real)
+        self.assertEqual(real.created_users, 1)
+        self.assertEqual(Project.objects.filter(student__username="a").count(), 2)
+        self.assertEqual(real.results[2], ("error", "Missing username"))
+
+    def test_update_only_skips_missing(self):
+        report = AdvisorImporter(ImportOptions(update_only=True)).run(_rows(["ghost,,X,0,active,,,"]))
+        self.assertEqual(report.results, [("error", "User missing (update-only): ghost")])
+        self.assertFalse(User.objects.filter(username="ghost").exists())
+
+    def test_password_hashed_for_new_users(self):
+        AdvisorImporter(ImportOptions()).run(_rows(["pw,,P,0,active,S3cret-pass!,,", "nopw,,Q,0,active,,,"]))
+        self.assertTrue(User.objects.get(username="pw").check_password("S3cret-pass!"))
+        self.assertFalse(User.objects.get(username="nopw").has_usable_password())
+
+
+@override_settings(IMPORT_INLINE_MAX_ROWS=2, IMPORT_JOB_EXECUTOR="worker")
+class ImportJobTests(TestCase):
+    def setUp(self) -> None:
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=self.advisor, defaults={"role": "advisor"})
+        self.client.login(username="adv", password="pass")
+
+    def _upload(self, lines: list[str], **flags) -> ImportJob:  # type: ignore[no-untyped-def]
+        f = io.BytesIO("\n".join([HEADER, *lines]).encode("utf-8"))
+        f.name = "roster.csv"
+        resp = self.client.post(reverse("advisor_import"), {"file": f, **flags})
+        job = ImportJob.objects.get()
+        self.assertRedirects(resp, reverse("advisor_import_job", args=[job.pk]))
+        return job
+
+    def test_large_upload_runs_as_job(self):
+        job = self._upload([f"j{i},,T{i},0,active,,," for i in range(3)] + [",,Nameless,0,active,,,"])
+        self.assertEqual((job.status, job.total_rows), ("pending", 4))
+        self.assertFalse(User.objects.filter(username="j0").exists())
+        call_command("run_import_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.created_users, job.created_projects), ("done", 4, 3, 3))
+        self.assertEqual(job.results[-1], ["error", "Missing username"])
+        self.assertFalse(job.file)
+        self.assertTrue(User.objects.filter(username="j2").exists())
+        resp = self.client.get(reverse("advisor_import_job", args=[job.pk]), HTTP_HX_REQUEST="true")
+        self.assertContains(resp, "4/4 rows")
+        self.assertNotContains(resp, "hx-trigger")
+
+    def test_job_keeps_dry_run_and_update_only(self):
+        job = self._upload([f"d{i},,T{i},0,active,,," for i in range(3)], dry_run="on", update_only="on")
+        self.assertEqual(job.options["dry_run"], True)
+        resp = self.client.get(reverse("advisor_import_job", args=[job.pk]), HTTP_HX_REQUEST="true")
+        self.assertContains(resp, 'hx-trigger="every 2s"')
+        call_command("run_import_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.results[0], ["error", "User missing (update-only): d0"])
+        self.assertFalse(User.objects.filter(username__startswith="d").exists())
+
+    def test_stuck_running_job_is_reclaimed_and_resumed(self):
+        job = self._upload([f"r{i},,T{i},0,active,,," for i in range(4)])
+        # A worker that claimed the job, saved one 2-row chunk and died
+        stale = timezone.now() - timedelta(seconds=600)
+        ImportJob.objects.filter(pk=job.pk).update(
+            status="running", started_at=stale, heartbeat_at=stale, processed_rows=2, created_users=2,
+            created_projects=2, results=[["created", "r0"], ["created", "r1"]],
+        )
+        call_command("run_import_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.created_users, job.created_projects), ("done", 4, 4, 4))
+        self.assertEqual(len(job.results), 4)
+        self.assertEqual(job.started_at, stale)
+        # Rows before the saved position were not read again
+        self.assertFalse(User.objects.filter(username__in=["r0", "r1"]).exists())
+        self.assertTrue(User.objects.filter(username="r3").exists())
+
+    def test_running_job_with_fresh_heartbeat_is_left_alone(self):
+        job = self._upload([f"h{i},,T{i},0,active,,," for i in range(3)])
+        ImportJob.objects.filter(pk=job.pk).update(status="running", heartbeat_at=timezone.now())
+        call_command("run_import_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows), ("running", 0))
+
+    def test_failed_job_keeps_upload_and_retry_resumes(self):
+        job = self._upload([f"f{i},,T{i},0,active,,," for i in range(4)])
+        original = AdvisorImporter._apply
+        calls = []
+
+        def fail_second_chunk(importer, plan):  # type: ignore[no-untyped-def]
+            calls.append(plan)
+            with transaction.atomic():
+                original(importer, plan)
+                if len(calls) == 2:
+                    raise DatabaseError("disk full")
+
+        with mock.patch("tracker.imports.IMPORT_JOB_CHUNK_ROWS", 2), \
+                mock.patch.object(AdvisorImporter, "_apply", fail_second_chunk):
+            call_command("run_import_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.error), ("failed", 2, "disk full"))
+        self.assertTrue(job.file)
+        self.assertEqual(User.objects.filter(username__startswith="f").count(), 2)
+
+        self.assertTrue(retry_import_job(job))
+        self.assertFalse(retry_import_job(job))
+        with mock.patch("tracker.imports.IMPORT_JOB_CHUNK_ROWS", 2):
+            call_command("run_import_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.error), ("done", 4, ""))
+        # The first chunk was not read again: every row created exactly once
+        self.assertEqual((job.created_users, job.updated_users, job.created_projects), (4, 0, 4))
+        self.assertEqual(len(job.results), 4)
+        self.assertEqual(User.objects.filter(username__startswith="f").count(), 4)
+        self.assertFalse(job.file)
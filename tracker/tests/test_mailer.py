@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import socketserver
+import threading
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from tracker.mailer import send_messages_batched
+from tracker.models import Milestone, Project, Task
+
+
+class CountingBackend(LocmemBackend):
+    """Locmem backend that counts opened connections and rejects one address."""
+
+    opened = 0
+    lock = threading.Lock()
+
+    def open(self):  # type: ignore[no-untyped-def]
+        with CountingBackend.lock:
+            CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):  # type: ignore[no-untyped-def]
+        for m in messages:
+            if 'bounce@example.com' in m.to:
+                raise OSError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self) -> None:
+        self.server.connections += 1  # type: ignore[attr-defined]
+        self.reply('220 localhost stand-in')
+        in_data = False
+        for raw in self.rfile:
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    self.server.messages += 1  # type: ignore[attr-defined]
+                    self.reply('250 queued')
+                continue
+            verb = line[:4].upper()
+            if verb == 'DATA':
+                in_data = True
+                self.reply('354 go ahead')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+def _smtp_server() -> socketserver.ThreadingTCPServer:
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.connections = 0  # type: ignore[attr-defined]
+    server.messages = 0  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _messages(n: int, bounce: int | None = None) -> list[EmailMessage]:
+    return [
+        EmailMessage(subject=f'm{i}', body='hi', from_email='noreply@example.com',
+                     to=['bounce@example.com' if i == bounce else f'u{i}@example.com'])
+        for i in range(n)
+    ]
+
+
+@override_settings(EMAIL_BACKEND='tracker.tests.test_mailer.CountingBackend')
+class BatchedDeliveryTests(SimpleTestCase):
+    def setUp(self) -> None:
+        CountingBackend.opened = 0
+        mail.outbox = []
+
+    def test_one_connection_per_batch_and_errors_per_message(self):
+        report = send_messages_batched(_messages(7, bounce=3), batch_size=3)
+        self.assertEqual(CountingBackend.opened, 3 + 1)  # 3 batches, plus a reconnect after the failure
+        self.assertEqual(len(report.sent), 6)
+        self.assertEqual([m.subject for m, _ in report.failed], ['m3'])
+        self.assertIn('mailbox unavailable', report.failed[0][1])
+
+    def test_concurrency_spreads_batches(self):
+        report = send_messages_batched(_messages(8), batch_size=50, concurrency=4)
+        self.assertEqual(len(report.sent), 8)
+        self.assertEqual(CountingBackend.opened, 4)
+        self.assertEqual(sorted(m.subject for m in mail.outbox), sorted(f'm{i}' for i in range(8)))
+
+
+class SMTPStandInTests(SimpleTestCase):
+    def test_smtp_connection_is_reused(self):
+        server = _smtp_server()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                           EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+                           EMAIL_USE_TLS=False, EMAIL_USE_SSL=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+            report = send_messages_batched(_messages(5), batch_size=10)
+        self.assertEqual(len(report.sent), 5)
+        self.assertEqual(server.messages, 5)
+        self.assertEqual(server.connections, 1)
+
+
+@override_settings(EMAIL_BACKEND='tracker.tests.test_mailer.CountingBackend')
+class NotifyDeliveryTests(TestCase):
+    def test_notify_reports_failures_and_keeps_sending(self):
+        CountingBackend.opened = 0
+        mail.outbox = []
+        for name in ('ann', 'bounce', 'cat'):
+            user = User.objects.create_user(username=name, password='pass', email=f'{name}@example.com')
+            project = Project.objects.create(student=user, title='Thesis')
+            m = Milestone.objects.create(project=project, name='Intro', order=1)
+            Task.objects.create(project=project, milestone=m, title='Draft', status='todo', order=1)
+        out, err = StringIO(), StringIO()
+        call_command('notify', '--batch-size', '2', stdout=out, stderr=err)
+        self.assertIn('Sent inactivity nudges to 2 student(s).', out.getvalue())
+        self.assertIn('bounce@example.com', err.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(CountingBackend.opened, 2 + 1)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import multiprocessing
+import re
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from tracker.metrics import REGISTRY, Registry
+from tracker.models import Milestone, Profile, Project, Task
+from tracker.services import get_progress_weights
+
+
+def sample(text: str, name: str, **labels: str) -> float:
+    """Value of the series ``name`` carrying at least ``labels`` (0 if absent)."""
+    for line in text.splitlines():
+        m = re.fullmatch(rf'{re.escape(name)}(?:\{{(.*)\}})? (\S+)', line)
+        if m and all(f'{k}="{v}"' in (m.group(1) or '') for k, v in labels.items()):
+            return float(m.group(2))
+    return 0.0
+
+
+def _child_observe(directory: str) -> None:
+    registry = Registry(multiproc_dir=directory)
+    registry.counter('jobs_total', 'Jobs.', ('kind',)).inc(2, kind='a')
+    registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0)).observe(0.5)
+    registry.flush()
+
+
+class RegistryTests(SimpleTestCase):
+    def test_exposition_format(self):
+        registry = Registry(multiproc_dir='')
+        hist = registry.histogram('latency_seconds', 'Latency.', ('view',), buckets=(0.1, 1.0))
+        hist.observe(0.05, view='a"b')
+        hist.observe(0.5, view='a"b')
+        hist.observe(3, view='a"b')
+        registry.counter('bytes_total', 'Bytes.', ('kind',)).inc(10, kind='zip')
+        text = registry.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{view="a\\"b",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{view="a\\"b",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{view="a\\"b",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_sum{view="a\\"b"} 3.55', text)
+        self.assertIn('latency_seconds_count{view="a\\"b"} 3', text)
+        self.assertIn('bytes_total{kind="zip"} 10', text)
+        with self.assertRaises(ValueError):
+            registry.counter('bytes_total', 'Again.')
+
+    def test_multiprocess_files_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ctx = multiprocessing.get_context('fork')
+            children = [ctx.Process(target=_child_observe, args=(directory,)) for _ in range(2)]
+            for child in children:
+                child.start()
+            for child in children:
+                child.join(10)
+                self.assertEqual(child.exitcode, 0)
+            registry = Registry(multiproc_dir=directory)
+            registry.counter('jobs_total', 'Jobs.', ('kind',)).inc(kind='a')
+            registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+            text = registry.render()
+        self.assertEqual(sample(text, 'jobs_total', kind='a'), 5)
+        self.assertEqual(sample(text, 'latency_seconds_bucket', le='1'), 2)
+        self.assertEqual(sample(text, 'latency_seconds_count'), 2)
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self) -> None:
+        self.student = User.objects.create_user(username='sam', password='pass')
+        project = Project.objects.create(student=self.student, title='Metrics')
+        m = Milestone.objects.create(project=project, name='Intro', order=1)
+        Task.objects.create(project=project, milestone=m, title='Draft', order=1)
+        self.project = project
+        self.staff = User.objects.create_user(username='ops', password='pass', is_staff=True)
+
+    def scrape(self) -> str:
+        self.client.force_login(self.staff)
+        r = self.client.get(reverse('metrics'))
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return r.content.decode()
+
+    def test_access_control(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer nope').status_code, 401)
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+    def test_request_latency_and_queries_by_view(self):
+        before = sample(REGISTRY.render(), 'tracker_http_request_duration_seconds_count', view='dashboard')
+        self.client.force_login(self.student)
+        self.client.get(reverse('dashboard'))
+        text = self.scrape()
+        self.assertEqual(sample(text, 'tracker_http_request_duration_seconds_count', view='dashboard', method='GET'), before + 1)
+        self.assertGreater(sample(text, 'tracker_http_request_queries_sum', view='dashboard'), 0)
+
+    def test_export_bytes_and_notify_durations(self):
+        before = REGISTRY.render()
+        advisor = User.objects.create_user(username='adv', password='pass')
+        Profile.objects.update_or_create(user=advisor, defaults={'role': 'advisor'})
+        self.client.force_login(advisor)
+        r = self.client.get(reverse('advisor_project_export_csv', args=[self.project.pk]))
+        size = len(b''.join(r.streaming_content) if r.streaming else r.content)
+        call_command('notify', '--enqueue-only', stdout=StringIO())
+        text = self.scrape()
+        self.assertEqual(sample(text, 'tracker_export_bytes_total', kind='project_csv'),
+                         sample(before, 'tracker_export_bytes_total', kind='project_csv') + size)
+        self.assertEqual(sample(text, 'tracker_notify_job_duration_seconds_count', job='inactivity'),
+                         sample(before, 'tracker_notify_job_duration_seconds_count', job='inactivity') + 1)
+
+    def test_cache_hit_ratio(self):
+        get_progress_weights()  # cold: a miss
+        get_progress_weights()  # then a hit
+        text = self.scrape()
+        hits = sample(text, 'tracker_cache_requests_total', cache='app_settings', result='hit')
+        misses = sample(text, 'tracker_cache_requests_total', cache='app_settings', result='miss')
+        self.assertGreaterEqual(min(hits, misses), 1)
+        self.assertAlmostEqual(sample(text, 'tracker_cache_hit_ratio', cache='app_settings'), hits / (hits + misses))
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.template import engines
+from django.test import TestCase
+from django.urls import reverse
+
+from tracker.instrumentation import track
+from tracker.models import Milestone, Profile, Project, Task
+
+
+class RequestLogMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        u = User.objects.create_user(username="s1", password="x")
+        p = Project.objects.create(student=u, title="Project 1")
+        m = Milestone.objects.create(project=p, name="Intro", order=1)
+        Task.objects.create(project=p, milestone=m, title="T", order=1)
+        advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        self.client.login(username="adv", password="pass")
+
+    def _log(self, url: str):  # type: ignore[no-untyped-def]
+        with self.assertLogs("tracker.middleware", level="INFO") as logs:
+            r = self.client.get(url, HTTP_X_REQUEST_ID="req-1")
+        return r, json.loads(logs.records[-1].getMessage())
+
+    def test_log_line_carries_sql_and_template_timings(self):
+        r, payload = self._log(reverse("advisor_dashboard"))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual((payload["id"], payload["view"], payload["user"]), ("req-1", "advisor_dashboard", "adv"))
+        self.assertGreater(payload["queries"], 0)
+        self.assertGreaterEqual(payload["db_ms"], payload["slowest_query_ms"])
+        self.assertTrue(payload["slowest_query"].upper().startswith(("SELECT", "UPDATE", "INSERT")))
+        self.assertGreater(payload["template_ms"], 0)
+        self.assertGreaterEqual(payload["ms"], payload["template_ms"])
+
+    def test_server_timing_header(self):
+        r, payload = self._log(reverse("advisor_dashboard"))
+        self.assertEqual(r["X-Request-ID"], "req-1")
+        m = re.fullmatch(r'db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+), total;dur=([\d.]+)', r["Server-Timing"])
+        self.assertIsNotNone(m)
+        self.assertEqual(int(m.group(2)), payload["queries"])
+
+    def test_track_counts_queries_and_renders(self):
+        with track() as metrics:
+            list(User.objects.all())
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            engines["django"].from_string("{% for i in items %}{{ i }}{% endfor %}").render({"items": range(3)})
+        self.assertEqual(metrics.queries, 2)
+        self.assertTrue(metrics.slowest_sql.startswith("SELECT"))
+        self.assertGreater(metrics.template_ms, 0)
+        # Nothing is recorded outside the block
+        list(User.objects.all())
+        self.assertEqual(metrics.queries, 2)
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tracker.models import Milestone, Notification, Project, Task
+from tracker.notifications import (
+    build_notification,
+    claim_due_notifications,
+    dispatch_due_notifications,
+    enqueue_notifications,
+)
+
+
+def _note(user: User, key: str) -> Notification:
+    msg = EmailMessage(subject='Hello', body='Body', from_email='noreply@example.com', to=[user.email])
+    return build_notification(user.pk, 'inactivity', key, msg)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NotificationOutboxTests(TestCase):
+    def setUp(self) -> None:
+        mail.outbox = []
+        self.user = User.objects.create_user(username='erin', password='pass', email='erin@example.com')
+        project = Project.objects.create(student=self.user, title='Outbox')
+        m = Milestone.objects.create(project=project, name='Intro', order=1)
+        Task.objects.create(project=project, milestone=m, title='Draft', status='todo', order=1)
+
+    def test_repeated_notify_runs_send_once(self):
+        call_command('notify', stdout=StringIO())
+        out = StringIO()
+        call_command('notify', stdout=out)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Queued 0 notification(s); 1 already queued.', out.getvalue())
+        n = Notification.objects.get()
+        self.assertEqual((n.status, n.attempts, n.kind), ('sent', 1, 'inactivity'))
+        self.assertIsNotNone(n.sent_at)
+
+    def test_enqueue_only_leaves_sending_to_dispatcher(self):
+        call_command('notify', '--enqueue-only', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Notification.objects.filter(status='pending').count(), 1)
+        out = StringIO()
+        call_command('dispatch_notifications', stdout=out)
+        self.assertIn('Sent 1 notification(s); 0 failed.', out.getvalue())
+        self.assertEqual(mail.outbox[0].to, ['erin@example.com'])
+
+    def test_enqueue_skips_known_keys(self):
+        first = enqueue_notifications([_note(self.user, 'k1'), _note(self.user, 'k1'), _note(self.user, 'k2')])
+        self.assertEqual(len(first), 2)
+        self.assertEqual(enqueue_notifications([_note(self.user, 'k2'), _note(self.user, 'k3')])[0].idempotency_key, 'k3')
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_claimed_rows_are_leased(self):
+        enqueue_notifications([_note(self.user, 'k1'), _note(self.user, 'k2')])
+        self.assertEqual(len(claim_due_notifications(limit=1)), 1)
+        self.assertEqual(len(claim_due_notifications()), 1)
+        self.assertEqual(claim_due_notifications(), [])
+        # Scheduled rows wait for their time
+        later = _note(self.user, 'k3')
+        later.scheduled_for = timezone.now() + timedelta(hours=1)
+        enqueue_notifications([later])
+        self.assertEqual(claim_due_notifications(), [])
+
+    @override_settings(EMAIL_BACKEND='tracker.tests.test_mailer.CountingBackend', NOTIFY_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        self.user.email = 'bounce@example.com'
+        self.user.save()
+        enqueue_notifications([_note(self.user, 'k1')])
+        result = dispatch_due_notifications()
+        self.assertEqual(len(result.failed), 1)
+        n = Notification.objects.get()
+        self.assertEqual((n.status, n.attempts), ('pending', 1))
+        self.assertGreater(n.next_attempt_at, timezone.now())
+        self.assertIn('mailbox unavailable', n.last_error)
+        # Not due yet
+        self.assertEqual(dispatch_due_notifications().claimed, 0)
+        Notification.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        dispatch_due_notifications()
+        n.refresh_from_db()
+        self.assertEqual((n.status, n.attempts, n.next_attempt_at), ('failed', 2, None))
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, timedelta
+from io import StringIO
 
 from django.contrib.auth.models import User
 from django.core import mail
 from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from tracker.models import Project, Milestone, Task
+from tracker.models import Project, Milestone, Profile, Task, WordLog
 
 
 @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
@@ -23,3 +26,44 @@ class NotifyCommandTests(TestCase):
         # At least one email should be queued (due-soon notification)
         self.assertGreaterEqual(len(mail.outbox), 1)
 
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class AdvisorDigestTests(TestCase):
+    def setUp(self) -> None:
+        advisor = User.objects.create_user(username='adv', password='pass', email='adv@example.com')
+        Profile.objects.update_or_create(user=advisor, defaults={'role': 'advisor'})
+        self._add_student('dana', words=300)
+
+    def _add_student(self, name: str, words: int = 0) -> Project:
+        user = User.objects.create_user(username=name, password='pass', email=f'{name}@example.com')
+        project = Project.objects.create(student=user, title=f'{name} thesis')
+        m = Milestone.objects.create(project=project, name='Intro', order=1)
+        Task.objects.create(project=project, milestone=m, title='Outline', status='done', order=1)
+        Task.objects.create(project=project, milestone=m, title='Draft', status='todo', order=2,
+                            due_date=date.today() + timedelta(days=2))
+        if words:
+            WordLog.objects.create(project=project, date=date.today() - timedelta(days=2), words=words)
+            WordLog.objects.create(project=project, date=date.today() - timedelta(days=30), words=999)
+        return project
+
+    def _digest_queries(self) -> int:
+        mail.outbox = []
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('notify', '--advisor-digest', '--due-days', '0', stdout=StringIO())
+        return len(ctx.captured_queries)
+
+    def test_digest_content(self):
+        call_command('notify', '--advisor-digest', stdout=StringIO())
+        digest = [m for m in mail.outbox if m.subject == 'Dissertation: advisor weekly digest'][0]
+        self.assertIn('- dana — dana thesis: 1/2 done', digest.body)
+        self.assertIn('Activity: 300 words in last 7d; inactivity 2d', digest.body)
+        self.assertIn(f'  • Due {date.today() + timedelta(days=2)}: Draft (Intro)', digest.body)
+
+    def test_digest_query_count_does_not_grow_with_projects(self):
+        self._digest_queries()  # backfill progress snapshots
+        few = self._digest_queries()
+        for i in range(4):
+            self._add_student(f's{i}', words=10 * (i + 1))
+        self._digest_queries()
+        self.assertEqual(self._digest_queries(), few)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from tracker.models import Milestone, Profile, Project, RequestProfile, Task
+from tracker.profiling import Sampler
+
+
+def _busy(ms: float) -> None:
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def _outer() -> None:
+    _busy(60)
+
+
+class SamplerTests(SimpleTestCase):
+    def test_collapsed_stacks_start_at_the_profiled_call(self):
+        def run() -> None:
+            with Sampler(threading.get_ident(), run.__code__, 0.002) as sampler:
+                _outer()
+            self.sampler = sampler
+        run()
+        stacks = dict(line.rsplit(' ', 1) for line in self.sampler.collapsed().splitlines())
+        self.assertTrue(stacks)
+        self.assertTrue(all(s.startswith('tracker.tests.test_profiling:_outer') for s in stacks), stacks)
+        self.assertGreater(int(stacks['tracker.tests.test_profiling:_outer;tracker.tests.test_profiling:_busy']), 0)
+        self.assertIn('tracker.tests.test_profiling:_busy', self.sampler.summary())
+
+
+@override_settings(PROFILE_SAMPLE_INTERVAL_MS=1)
+class ProfilerMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        self.student = User.objects.create_user(username='pat', password='pass')
+        project = Project.objects.create(student=self.student, title='Profiled')
+        m = Milestone.objects.create(project=project, name='Intro', order=1)
+        Task.objects.create(project=project, milestone=m, title='Draft', order=1)
+        self.staff = User.objects.create_superuser(username='ops', password='pass', email='ops@example.com')
+        Profile.objects.update_or_create(user=self.staff, defaults={'role': 'admin'})
+
+    def test_switch_is_ignored_for_non_staff(self):
+        self.client.force_login(self.student)
+        r = self.client.get(reverse('dashboard'), {'_profile': '1'})
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn('X-Profile-ID', r)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_staff_sampling_profile_is_stored(self):
+        self.client.force_login(self.staff)
+        r = self.client.get(reverse('advisor_dashboard'), {'_profile': '1'})
+        profile = RequestProfile.objects.get(pk=r['X-Profile-ID'])
+        self.assertEqual((profile.engine, profile.view_name, profile.status, profile.user), ('sample', 'advisor_dashboard', 200, self.staff))
+        self.assertGreater(profile.query_count, 0)
+        self.assertEqual(len(profile.sql), profile.query_count)
+        self.assertTrue(any(q['origin'].startswith('tracker.') for q in profile.sql))
+        for line in profile.collapsed.splitlines():
+            self.assertRegex(line, r'^\S.* \d+$')
+
+    def test_cookie_selects_cprofile(self):
+        self.client.force_login(self.staff)
+        self.client.cookies['tracker_profile'] = 'cprofile'
+        self.client.get(reverse('advisor_dashboard'))
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.engine, 'cprofile')
+        self.assertIn('advisor_dashboard', profile.summary)
+
+    def test_admin_lists_profiles_and_serves_collapsed_stacks(self):
+        profile = RequestProfile.objects.create(method='GET', path='/advisor/', collapsed='a;b 3\na;c 1', samples=4)
+        self.client.force_login(self.staff)
+        r = self.client.get(reverse('admin:tracker_requestprofile_changelist'))
+        self.assertContains(r, '/advisor/')
+        r = self.client.get(reverse('admin:tracker_requestprofile_change', args=[profile.pk]))
+        self.assertContains(r, reverse('admin:tracker_requestprofile_collapsed', args=[profile.pk]))
+        r = self.client.get(reverse('admin:tracker_requestprofile_collapsed', args=[profile.pk]))
+        self.assertEqual(r.content, b'a;b 3\na;c 1\n')
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_old_profiles_are_pruned(self):
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            self.client.get(reverse('dashboard'), {'_profile': 'cprofile'})
+        self.assertEqual(RequestProfile.objects.count(), 2)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tracker.models import (
+    MilestoneProgress, MilestoneTemplate, Milestone, Profile, Project, ProjectProgress, Task, WordLog,
+)
+
+
+class ProjectProgressSnapshotTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="pat", password="pass")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project = Project.objects.create(student=self.user, title="Snapshot")
+            gate = MilestoneTemplate.objects.create(key="core-literature-review-general", name="LR General", order=1)
+            self.milestone = Milestone.objects.create(project=self.project, template=gate, name="LR General", order=1)
+            self.t1 = Task.objects.create(project=self.project, milestone=self.milestone, title="Read", order=1)
+            self.t2 = Task.objects.create(
+                project=self.project, milestone=self.milestone, title="Draft", order=2, word_target=100
+            )
+
+    def test_signals_keep_snapshot_current(self):
+        prog = ProjectProgress.objects.get(project=self.project)
+        self.assertEqual((prog.done_tasks, prog.total_tasks), (0, 2))
+        self.assertEqual(prog.gated_next, "LR General")
+        self.assertEqual(prog.gated_next_milestone_id, self.milestone.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.t1.status = "done"
+            self.t1.save()
+            WordLog.objects.create(project=self.project, task=self.t2, date=date.today(), words=50)
+        prog.refresh_from_db()
+        self.assertEqual(prog.done_tasks, 1)
+        self.assertEqual(prog.effort_points, 50)
+        self.assertEqual(prog.combined_percent({"status": 50, "effort": 50}), 38)
+        mp = self.milestone.progress
+        mp.refresh_from_db()
+        self.assertEqual((mp.done_tasks, mp.total_tasks), (1, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.t2.delete()
+        prog.refresh_from_db()
+        self.assertEqual((prog.done_tasks, prog.total_tasks), (1, 1))
+        self.assertEqual(prog.gated_next, "core-literature-review-special")
+        self.assertEqual(prog.gated_next_index, 1)
+
+    def test_project_delete_removes_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        self.assertFalse(ProjectProgress.objects.exists())
+
+    def test_rebuild_command(self):
+        ProjectProgress.objects.all().delete()
+        call_command("rebuild_progress", stdout=open("/dev/null", "w"))
+        prog = ProjectProgress.objects.get(project=self.project)
+        self.assertEqual(prog.total_tasks, 2)
+
+    def test_rebuild_missing_only_fills_gaps(self):
+        ProjectProgress.objects.all().delete()
+        kept = self.milestone.progress
+        call_command("rebuild_progress", "--missing", stdout=open("/dev/null", "w"))
+        self.assertEqual(ProjectProgress.objects.get(project=self.project).total_tasks, 2)
+        self.assertEqual(MilestoneProgress.objects.get(pk=self.milestone.pk).updated_at, kept.updated_at)
+
+    def test_advisor_dashboard_does_not_backfill(self):
+        ProjectProgress.objects.all().delete()
+        advisor = User.objects.create_user(username="adv", password="pass")
+        Profile.objects.update_or_create(user=advisor, defaults={"role": "advisor"})
+        self.client.login(username="adv", password="pass")
+        r = self.client.get(reverse("advisor_dashboard"))
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "Snapshot")
+        self.assertFalse(ProjectProgress.objects.exists())
+
+    def test_task_change_recounts_only_its_milestone(self):
+        other = Milestone.objects.create(project=self.project, name="Methods", order=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                Task.objects.create(project=self.project, milestone=other, title=f"M{i}", order=i)
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.t1.status = "done"
+                self.t1.save()
+        task_reads = [q["sql"] for q in ctx.captured_queries
+                      if q["sql"].startswith("SELECT") and 'FROM "tracker_task"' in q["sql"]]
+        self.assertTrue(task_reads)
+        # The task's own pre_save read plus the recount of its milestone; never the whole project
+        self.assertFalse([sql for sql in task_reads if '"tracker_task"."project_id" IN' in sql])
+        prog = ProjectProgress.objects.get(project=self.project)
+        self.assertEqual((prog.done_tasks, prog.total_tasks), (1, 7))
+        self.assertEqual(prog.gated_next, "LR General")
+        self.assertEqual(MilestoneProgress.objects.get(pk=other.pk).total_tasks, 5)
+
+    def test_moving_a_task_updates_both_milestones(self):
+        other = Milestone.objects.create(project=self.project, name="Methods", order=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.t1.status = "done"
+            self.t1.save()
+            self.t2.status = "done"
+            self.t2.save()
+        self.assertEqual(ProjectProgress.objects.get(project=self.project).gated_next_index, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.t2.milestone = other
+            self.t2.status = "todo"
+            self.t2.save()
+        self.assertEqual(MilestoneProgress.objects.get(pk=self.milestone.pk).total_tasks, 1)
+        self.assertEqual(MilestoneProgress.objects.get(pk=other.pk).total_tasks, 1)
+        prog = ProjectProgress.objects.get(project=self.project)
+        self.assertEqual((prog.done_tasks, prog.total_tasks), (1, 2))
+        self.assertEqual(prog.gated_next_index, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        prog.refresh_from_db()
+        self.assertEqual((prog.done_tasks, prog.total_tasks), (1, 1))
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from django.core.signals import request_finished, request_started
+from django.test import TestCase
+from django.urls import reverse
+
+from tracker.models import Project
+from tracker.tests.querybudget import Cohort, assert_constant_queries, constant_queries
+
+
+class StudentViewQueryBudgetTests(TestCase):
+    @constant_queries()
+    def test_dashboard(self, cohort: Cohort):
+        self.client.force_login(cohort.student)
+        return self.client.get(reverse('dashboard'))
+
+    @constant_queries()
+    def test_wordlogs(self, cohort: Cohort):
+        self.client.force_login(cohort.student)
+        return self.client.get(reverse('wordlogs'))
+
+    @constant_queries()
+    def test_my_export_zip(self, cohort: Cohort):
+        self.client.force_login(cohort.student)
+        return self.client.get(reverse('my_export_zip'))
+
+
+class AdvisorViewQueryBudgetTests(TestCase):
+    @constant_queries()
+    def test_advisor_dashboard(self, cohort: Cohort):
+        self.client.force_login(cohort.advisor)
+        return self.client.get(reverse('advisor_dashboard'))
+
+    @constant_queries()
+    def test_advisor_project(self, cohort: Cohort):
+        self.client.force_login(cohort.advisor)
+        return self.client.get(reverse('advisor_project', args=[cohort.project.pk]))
+
+    @constant_queries()
+    def test_advisor_exports(self, cohort: Cohort):
+        self.client.force_login(cohort.advisor)
+        return [self.client.get(reverse(name)) for name in ('advisor_export_json', 'advisor_export_csv')]
+
+    @constant_queries()
+    def test_advisor_project_exports(self, cohort: Cohort):
+        self.client.force_login(cohort.advisor)
+        names = ('advisor_project_export_json', 'advisor_project_export_csv', 'advisor_project_export_zip')
+        return [self.client.get(reverse(name, args=[cohort.project.pk])) for name in names]
+
+
+class QueryBudgetHarnessTests(TestCase):
+    def test_n_plus_one_is_reported_by_frame(self):
+        def body(cohort: Cohort) -> None:
+            request_started.send(sender=None)
+            try:
+                [p.student.username for p in Project.objects.all()]
+            finally:
+                request_finished.send(sender=None)
+
+        with self.assertRaises(AssertionError) as ctx:
+            assert_constant_queries(body, label='loop')
+        message = str(ctx.exception)
+        self.assertIn('loop: query count grows with the data (2 projects x 2 tasks: 3, 6 projects x 5 tasks: 7)', message)
+        self.assertIn('(outside tracker)', message)
+        self.assertIn('2 -> 6  SELECT "auth_user"', message)
+
+
+def test_wordlog_csv_exports(client, query_budget):  # type: ignore[no-untyped-def]
+    def body(cohort: Cohort) -> None:
+        client.force_login(cohort.advisor)
+        client.get(reverse('advisor_project_wordlogs_csv', args=[cohort.project.pk]))
+        client.force_login(cohort.student)
+        client.get(reverse('wordlogs_csv'))
+
+    assert query_budget(body, label='wordlog csv') > 0
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from tracker import scheduler
+from tracker.models import Milestone, Notification, Project, ScheduledJob, Task
+from tracker.scheduler import Schedule, run_due_jobs
+
+
+def _at(*args: int) -> datetime:
+    return timezone.make_aware(datetime(*args))
+
+
+class ScheduleParseTests(SimpleTestCase):
+    def test_slots(self):
+        now = _at(2026, 3, 4, 8, 30)  # a Wednesday
+        self.assertEqual(Schedule.parse('daily 09:00').latest_slot(now), _at(2026, 3, 3, 9, 0))
+        self.assertEqual(Schedule.parse('daily 08:00').latest_slot(now), _at(2026, 3, 4, 8, 0))
+        self.assertEqual(Schedule.parse('weekly mon 09:00').latest_slot(now), _at(2026, 3, 2, 9, 0))
+        self.assertEqual(Schedule.parse('weekly wed 09:00').latest_slot(now), _at(2026, 2, 25, 9, 0))
+        self.assertEqual(Schedule.parse('monthly 1 09:00').latest_slot(now), _at(2026, 3, 1, 9, 0))
+        self.assertEqual(Schedule.parse('monthly 31 09:00').latest_slot(now), _at(2026, 2, 28, 9, 0))
+        self.assertEqual(Schedule.parse('every 60').latest_slot(now + timedelta(seconds=59)), now)
+
+    def test_invalid_specs(self):
+        for spec in ('', 'hourly', 'daily 25:00', 'weekly xyz 09:00', 'monthly 0 09:00', 'every x'):
+            with self.assertRaises(ValueError):
+                Schedule.parse(spec)
+
+
+class RunDueJobsTests(TestCase):
+    def setUp(self) -> None:
+        self.calls: list[str] = []
+        self.fail = False
+        self.schedules = {'digest': Schedule.parse('daily 09:00')}
+        patcher = mock.patch.dict(scheduler.JOBS, {'digest': self._job})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _job(self, out: StringIO) -> None:
+        self.calls.append('digest')
+        if self.fail:
+            raise RuntimeError('smtp down')
+
+    def test_first_sight_records_slot_without_running(self):
+        self.assertEqual(run_due_jobs(_at(2026, 3, 4, 10, 0), self.schedules), [])
+        job = ScheduledJob.objects.get(name='digest')
+        self.assertEqual((job.last_slot, job.schedule), (_at(2026, 3, 4, 9, 0), 'daily 09:00'))
+
+    def test_due_slot_runs_once(self):
+        run_due_jobs(_at(2026, 3, 4, 10, 0), self.schedules)
+        self.assertEqual(run_due_jobs(_at(2026, 3, 5, 9, 0, 30), self.schedules), [('digest', True)])
+        self.assertEqual(run_due_jobs(_at(2026, 3, 5, 9, 1), self.schedules), [])
+        job = ScheduledJob.objects.get(name='digest')
+        self.assertEqual((job.last_status, job.run_count, job.last_slot), ('ok', 1, _at(2026, 3, 5, 9, 0)))
+        self.assertEqual(self.calls, ['digest'])
+
+    def test_restart_after_downtime_runs_latest_slot_once(self):
+        run_due_jobs(_at(2026, 3, 1, 10, 0), self.schedules)
+        # Down for several days: one catch-up run, not one per missed slot
+        self.assertEqual(run_due_jobs(_at(2026, 3, 5, 12, 0), self.schedules), [('digest', True)])
+        self.assertEqual(run_due_jobs(_at(2026, 3, 5, 12, 1), self.schedules), [])
+        self.assertEqual(len(self.calls), 1)
+
+    @override_settings(SCHEDULER_RETRY_SECONDS=300)
+    def test_failure_is_retried_after_delay(self):
+        run_due_jobs(_at(2026, 3, 4, 10, 0), self.schedules)
+        self.fail = True
+        with mock.patch('tracker.scheduler.timezone.now', return_value=_at(2026, 3, 5, 9, 0)):
+            self.assertEqual(run_due_jobs(_at(2026, 3, 5, 9, 0), self.schedules), [('digest', False)])
+        job = ScheduledJob.objects.get(name='digest')
+        self.assertEqual((job.last_status, job.last_error), ('failed', 'RuntimeError: smtp down'))
+        self.fail = False
+        self.assertEqual(run_due_jobs(_at(2026, 3, 5, 9, 2), self.schedules), [])
+        self.assertEqual(run_due_jobs(_at(2026, 3, 5, 9, 6), self.schedules), [('digest', True)])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_running_job_is_not_claimed_twice(self):
+        run_due_jobs(_at(2026, 3, 4, 10, 0), self.schedules)
+        ScheduledJob.objects.update(running_until=_at(2026, 3, 5, 9, 30))
+        self.assertEqual(run_due_jobs(_at(2026, 3, 5, 9, 10), self.schedules), [])
+        self.assertEqual(self.calls, [])
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NotifyJobsOptionTests(TestCase):
+    def setUp(self) -> None:
+        mail.outbox = []
+        student = User.objects.create_user(username='dana', password='pass', email='dana@example.com')
+        project = Project.objects.create(student=student, title='Jobs')
+        m = Milestone.objects.create(project=project, name='Intro', order=1)
+        Task.objects.create(project=project, milestone=m, title='Due', status='todo', order=1, due_date=date.today())
+
+    def test_jobs_selects_a_subset(self):
+        call_command('notify', '--jobs', 'due_soon', stdout=StringIO())
+        self.assertEqual(list(Notification.objects.values_list('kind', flat=True)), ['due_soon'])
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command('notify', '--jobs', 'due_soon,weekly', stdout=StringIO())
+
+    def test_scheduler_once_runs_due_notify_job(self):
+        ScheduledJob.objects.create(name='inactivity', last_slot=timezone.now() - timedelta(days=2))
+        with override_settings(NOTIFY_SCHEDULE={'due_soon': '', 'backup': '', 'digest': '', 'dispatch': ''}):
+            out = StringIO()
+            call_command('scheduler', '--once', stdout=out)
+        self.assertIn('Ran inactivity.', out.getvalue())
+        self.assertEqual(list(Notification.objects.values_list('kind', 'status')), [('inactivity', 'sent')])
@@ -3,10 +3,20 @@ from __future__ import annotations
 from datetime import date, timedelta
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from tracker.models import Project, Milestone, Task, WordLog
-from tracker.services import compute_streaks, task_combined_percent
+from tracker.models import MilestoneTemplate, TaskTemplate, Project, Milestone, Task, WordLog, WritingStreak
+from tracker.services import (
+    ProgressCalculator,
+    StageGateEvaluator,
+    apply_templates_to_projects,
+    compute_streaks,
+    default_word_target,
+    rebuild_writing_streak,
+    task_combined_percent,
+)
 
 
 class ServiceTests(TestCase):
@@ -26,6 +36,94 @@ class ServiceTests(TestCase):
         self.assertEqual(current, 2)
         self.assertGreaterEqual(longest, 2)
 
+    def test_writing_streak_updates_incrementally(self):
+        today = date.today()
+        WordLog.objects.create(project=self.project, date=today - timedelta(days=5), words=10)
+        WordLog.objects.create(project=self.project, date=today - timedelta(days=4), words=10)
+        # Extending the latest run touches only the streak row
+        with self.assertNumQueries(5):  # insert + savepoint pair + select + update
+            WordLog.objects.create(project=self.project, date=today - timedelta(days=3), words=10)
+        streak = WritingStreak.objects.get(project=self.project)
+        self.assertEqual((streak.run_length, streak.longest_streak), (3, 3))
+        # A gap restarts the run; back-filling the gap merges both runs
+        WordLog.objects.create(project=self.project, date=today - timedelta(days=1), words=10)
+        WordLog.objects.create(project=self.project, date=today, words=10)
+        self.assertEqual(compute_streaks(self.project), (2, 3))
+        WordLog.objects.create(project=self.project, date=today - timedelta(days=2), words=10)
+        self.assertEqual(compute_streaks(self.project), (6, 6))
+
+    def test_writing_streak_rebuilt_after_delete(self):
+        today = date.today()
+        WordLog.objects.create(project=self.project, date=today - timedelta(days=1), words=10)
+        log = WordLog.objects.create(project=self.project, date=today, words=10)
+        self.assertEqual(compute_streaks(self.project), (2, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            log.delete()
+        # Nothing logged today any more, so the current streak lapses
+        self.assertEqual(compute_streaks(self.project), (0, 1))
+
+    def _streak_history(self) -> dict[int, WordLog]:
+        # Runs ending 44..40 (longest, 5 days), 31..30, 22..20 and 2..0 days ago
+        today = date.today()
+        logs = {}
+        for ago in (44, 43, 42, 41, 40, 31, 30, 22, 21, 20, 2, 1, 0):
+            logs[ago] = WordLog.objects.create(project=self.project, date=today - timedelta(days=ago), words=10)
+        return logs
+
+    def _change_streak(self, change) -> list[str]:  # type: ignore[no-untyped-def]
+        """Run ``change`` and its on-commit work; return full-history WordLog date scans."""
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+        return [q["sql"] for q in ctx.captured_queries
+                if 'FROM "tracker_wordlog"' in q["sql"] and '"words" > 0' in q["sql"]
+                and "BETWEEN" not in q["sql"] and "MAX(" not in q["sql"]]
+
+    def _assert_streak_matches_rebuild(self) -> None:
+        streak = WritingStreak.objects.get(project=self.project)
+        stored = (streak.last_log_date, streak.run_length, streak.longest_streak)
+        rebuilt = rebuild_writing_streak(self.project.pk)
+        self.assertEqual(stored, (rebuilt.last_log_date, rebuilt.run_length, rebuilt.longest_streak))
+
+    def test_writing_streak_edit_reads_only_nearby_days(self):
+        logs = self._streak_history()
+        today = date.today()
+
+        def move():
+            logs[21].date = today - timedelta(days=25)
+            logs[21].save()
+        self.assertEqual(self._change_streak(move), [])
+        self._assert_streak_matches_rebuild()
+        # Zeroing the latest day moves the run back a day
+        logs[0].words = 0
+        self.assertEqual(self._change_streak(logs[0].save), [])
+        self.assertEqual(compute_streaks(self.project), (0, 5))
+        self._assert_streak_matches_rebuild()
+
+        def extend():
+            logs[31].date = today - timedelta(days=39)
+            logs[31].save()
+        # Moving a day onto the end of the longest run makes it longer
+        self.assertEqual(self._change_streak(extend), [])
+        self.assertEqual(WritingStreak.objects.get(project=self.project).longest_streak, 6)
+        self._assert_streak_matches_rebuild()
+
+    def test_writing_streak_delete_reads_only_nearby_days(self):
+        logs = self._streak_history()
+        self.assertEqual(self._change_streak(logs[21].delete), [])
+        self._assert_streak_matches_rebuild()
+        self.assertEqual(self._change_streak(logs[0].delete), [])
+        self._assert_streak_matches_rebuild()
+        for ago in (2, 1):
+            self._change_streak(logs[ago].delete)
+        # The latest run is gone; the previous logged day is found without a scan
+        streak = WritingStreak.objects.get(project=self.project)
+        self.assertEqual((streak.last_log_date, streak.run_length), (date.today() - timedelta(days=20), 1))
+        self._assert_streak_matches_rebuild()
+        # Breaking the longest run needs the full history to find the next longest
+        self.assertTrue(self._change_streak(logs[42].delete))
+        self.assertEqual(WritingStreak.objects.get(project=self.project).longest_streak, 2)
+
     def test_task_combined_percent(self):
         task = Task.objects.create(
             project=self.project,
@@ -40,3 +138,90 @@ class ServiceTests(TestCase):
         pct = task_combined_percent(task, {"status": 50, "effort": 50})
         self.assertEqual(pct, 50)
 
+    def test_progress_calculator_matches_per_task(self):
+        t1 = Task.objects.create(project=self.project, milestone=self.milestone, title="A", status="doing", word_target=200, order=1)
+        t2 = Task.objects.create(project=self.project, milestone=self.milestone, title="B", status="done", order=2)
+        WordLog.objects.create(project=self.project, task=t1, date=date.today(), words=150)
+        weights = {"status": 50, "effort": 50}
+        with self.assertNumQueries(2):
+            calc = ProgressCalculator.for_projects([self.project], weights)
+        with self.assertNumQueries(0):
+            pcts = [calc.task_percent(t1), calc.task_percent(t2)]
+            summary = calc.project_summary(self.project.pk)
+        self.assertEqual(pcts, [task_combined_percent(t1, weights), task_combined_percent(t2, weights)])
+        self.assertEqual(summary["total"], 2)
+        self.assertEqual(summary["done"], 1)
+        self.assertEqual(calc.milestone_summary(self.milestone.pk), summary)
+
+    def test_progress_weights_cached_until_settings_saved(self):
+        from tracker.models import AppSettings
+        from tracker.services import get_progress_weights
+        get_progress_weights()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_progress_weights(), {"status": 100, "effort": 0})
+        s = AppSettings.get()
+        s.effort_weight = 25
+        s.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_progress_weights(), {"status": 100, "effort": 25})
+
+    def test_progress_weights_see_saves_from_other_processes(self):
+        from django.utils import timezone
+        from tracker.models import AppSettings
+        from tracker.services import end_weights_request, get_progress_weights, start_weights_request
+        self.assertEqual(get_progress_weights(), {"status": 100, "effort": 0})
+        # Another worker's save: no signal reaches this process
+        AppSettings.objects.update(effort_weight=40, updated_at=timezone.now())
+        with self.assertNumQueries(0):
+            self.assertEqual(get_progress_weights(), {"status": 100, "effort": 0})
+        start_weights_request()
+        try:
+            with self.assertNumQueries(1):
+                self.assertEqual(get_progress_weights(), {"status": 100, "effort": 40})
+            with self.assertNumQueries(0):
+                self.assertEqual(get_progress_weights(), {"status": 100, "effort": 40})
+        finally:
+            end_weights_request()
+
+    def test_stage_gate_evaluator(self):
+        general = MilestoneTemplate.objects.create(key="core-literature-review-general", name="LR General", order=1)
+        special = MilestoneTemplate.objects.create(key="core-literature-review-special", name="LR Special", order=2)
+        m1 = Milestone.objects.create(project=self.project, template=general, name="LR General", order=2)
+        m2 = Milestone.objects.create(project=self.project, template=special, name="LR Special", order=3)
+        t1 = Task.objects.create(project=self.project, milestone=m1, title="Read", status="doing", order=1)
+        t2 = Task.objects.create(project=self.project, milestone=m2, title="Write", order=1)
+        intro = Task.objects.create(project=self.project, milestone=self.milestone, title="Intro", order=1)
+        with self.assertNumQueries(2):
+            gates = StageGateEvaluator.for_projects([self.project])
+        self.assertEqual(gates.next_gate(self.project.pk)["name"], "LR General")
+        self.assertEqual(gates.task_flags(t1), (False, ""))
+        self.assertEqual(gates.task_flags(t2), (True, "LR General"))
+        self.assertEqual(gates.task_flags(intro), (False, ""))
+        t1.status = "done"
+        t1.save()
+        gates = StageGateEvaluator.for_projects([self.project])
+        self.assertTrue(gates.done_by_key(self.project.pk)["core-literature-review-general"])
+        self.assertEqual(gates.task_flags(t2), (False, ""))
+        self.assertEqual(gates.next_gate(self.project.pk)["milestone_id"], m2.pk)
+
+    def test_default_word_target_rules(self):
+        self.assertEqual(default_word_target("core-literature-review-general", "Start general field writing"), 5500)
+        self.assertEqual(default_word_target("chapter2-special", "Goal: 4000 words"), 4500)
+        self.assertEqual(default_word_target("core-conclusion", "Draft conclusion"), 1500)
+        self.assertEqual(default_word_target("core-conclusion", "Draft methodology"), 0)
+
+    def test_apply_templates_to_projects_bulk(self):
+        meth = MilestoneTemplate.objects.create(key="core-methodology", name="Methodology", order=1)
+        TaskTemplate.objects.create(milestone=meth, key="draft", title="Draft methodology", order=1)
+        TaskTemplate.objects.create(milestone=meth, key="review", title="Review", order=2)
+        MilestoneTemplate.objects.create(key="extra", name="Extra", order=2)
+        other = Project.objects.create(student=self.user, title="Second")
+        # templates (2) + existing milestones (1) + milestone and task inserts (2), in a savepoint
+        with self.assertNumQueries(7):
+            created = apply_templates_to_projects([self.project, other])
+        self.assertEqual(created, 2)
+        self.assertEqual(apply_templates_to_projects([self.project, other]), 0)
+        tasks = list(other.tasks.order_by("order").values_list("title", "word_target", "order"))
+        self.assertEqual(tasks, [("Draft methodology", 2500, 1), ("Review", 0, 2)])
+        self.assertEqual(self.project.milestones.get(template=meth).order, 2)
+        self.assertFalse(other.milestones.filter(name="Extra").exists())
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tracker.models import Milestone, Project, Task
+from tracker.slow_queries import SlowQueryLogger, explain, install_slow_query_log, read_entries
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.log = str(Path(self.dir.name) / 'slow.log')
+        overrides = override_settings(SLOW_QUERY_MS=0.0001, SLOW_QUERY_LOG_FILE=self.log, SLOW_QUERY_LOG_MAX_BYTES=1_000_000,
+                                      SLOW_QUERY_LOG_BACKUPS=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # The test connection already exists, so install the wrapper as connection_created would
+        install_slow_query_log(sender=None, connection=connection)
+        self.addCleanup(self._uninstall)
+        self.student = User.objects.create_user(username='quinn', password='pass')
+        project = Project.objects.create(student=self.student, title='Slow')
+        m = Milestone.objects.create(project=project, name='Intro', order=1)
+        Task.objects.create(project=project, milestone=m, title='Draft', order=1)
+
+    def _uninstall(self) -> None:
+        connection.execute_wrappers[:] = [w for w in connection.execute_wrappers if not isinstance(w, SlowQueryLogger)]
+
+    def test_request_queries_are_logged_with_view_stack_and_plan(self):
+        self.client.force_login(self.student)
+        self.client.get(reverse('dashboard'))
+        entries = [e for e in read_entries(self.log) if e['view'] == 'dashboard']
+        self.assertTrue(entries)
+        select = next(e for e in entries if 'FROM "tracker_task"' in e['sql'])
+        self.assertEqual((select['vendor'], select['path']), ('sqlite', reverse('dashboard')))
+        self.assertTrue(any(frame.startswith('tracker/views.py:') for frame in select['stack']))
+        self.assertTrue(select['plan'])
+        self.assertIn('tracker_task', ' '.join(select['plan']))
+        self.assertNotIn('EXPLAIN', select['sql'])
+
+    def test_threshold_filters_fast_queries(self):
+        before = len(list(read_entries(self.log)))
+        with override_settings(SLOW_QUERY_MS=60_000):
+            list(Project.objects.all())
+        self.assertEqual(len(list(read_entries(self.log))), before)
+
+    def test_log_rotates(self):
+        log = str(Path(self.dir.name) / 'rotating.log')
+        with override_settings(SLOW_QUERY_LOG_FILE=log, SLOW_QUERY_LOG_MAX_BYTES=4000):
+            for _ in range(30):
+                list(Task.objects.filter(title__startswith='Draft'))
+            self.assertTrue(Path(f'{log}.1').exists())
+            self.assertFalse(Path(f'{log}.3').exists())
+            self.assertGreater(len(list(read_entries(log))), 2)
+
+    def test_explain_skips_writes(self):
+        self.assertEqual(explain(connection, 'UPDATE tracker_task SET title = %s', ['x']), [])
+        plan = explain(connection, 'SELECT * FROM tracker_task WHERE id = %s', [1])
+        self.assertTrue(plan and 'tracker_task' in plan[0])
+
+    def test_command_lists_entries(self):
+        list(Project.objects.filter(title='Slow'))
+        self._uninstall()
+        out = StringIO()
+        call_command('slow_queries', '--limit', '1', stdout=out)
+        text = out.getvalue()
+        self.assertIn('ms  sqlite', text)
+        self.assertIn('| ', text)
+        out = StringIO()
+        call_command('slow_queries', '--json', '--limit', '1', '--slowest', stdout=out)
+        self.assertIn('sql', json.loads(out.getvalue().splitlines()[0]))
+        out = StringIO()
+        call_command('slow_queries', '--view', 'nope', stdout=out)
+        self.assertIn('No slow queries', out.getvalue())
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase, override_settings
+
+from tracker.webhooks import post_grouped, post_text
+
+
+class _Hook(BaseHTTPRequestHandler):
+    def do_POST(self) -> None:  # noqa: N802
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:  # type: ignore[attr-defined]
+            server.requests.append((self.path, body))  # type: ignore[attr-defined]
+            fail = server.failures.get(self.path, 0)  # type: ignore[attr-defined]
+            if fail:
+                server.failures[self.path] = fail - 1  # type: ignore[attr-defined]
+        status = 200
+        if fail:
+            status = 503
+        elif server.barrier is not None:  # type: ignore[attr-defined]
+            # Both targets must be in flight at once to get past the barrier
+            try:
+                server.barrier.wait()  # type: ignore[attr-defined]
+            except threading.BrokenBarrierError:
+                status = 500
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args) -> None:  # type: ignore[no-untyped-def]
+        pass
+
+
+@override_settings(WEBHOOK_BACKOFF_SECONDS=0.01, WEBHOOK_RETRIES=2, WEBHOOK_TIMEOUT=5)
+class WebhookDispatchTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Hook)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.failures = {}
+        self.server.barrier = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        base = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.targets = {'slack': f'{base}/slack', 'teams': f'{base}/teams'}
+
+    def test_targets_are_posted_concurrently(self):
+        self.server.barrier = threading.Barrier(2, timeout=3)
+        results = post_grouped('Digest', [{'title': 'ann', 'lines': ['a', 'b']}], self.targets)
+        self.assertEqual(sorted((r.target, r.ok, r.attempts) for r in results), [('slack', True, 1), ('teams', True, 1)])
+        self.assertTrue(all(r.latency_ms > 0 for r in results))
+
+    @override_settings(WEBHOOK_MAX_LINES=3)
+    def test_large_digest_is_split_in_order(self):
+        groups = [{'title': 'ann', 'lines': [f'line {i}' for i in range(5)]}, {'title': 'bob', 'lines': ['x', 'y']}]
+        results = post_grouped('Digest', groups, {'slack': self.targets['slack']})
+        self.assertEqual([r.part for r in results], [1, 2, 3])
+        bodies = [b for _, b in self.server.requests]
+        self.assertEqual([b['blocks'][0]['text']['text'] for b in bodies], ['Digest (1/3)', 'Digest (2/3)', 'Digest (3/3)'])
+        sent = [ln for b in bodies for blk in b['blocks'][1:] for ln in blk['text']['text'].splitlines()[1:]]
+        self.assertEqual(sent, [f'• line {i}' for i in range(5)] + ['• x', '• y'])
+        self.assertEqual(bodies[1]['blocks'][1]['text']['text'].splitlines()[0], '*ann (cont.)*')
+
+    def test_retries_server_errors_then_gives_up(self):
+        self.server.failures = {'/slack': 1, '/teams': 10}
+        results = {r.target: r for r in post_text('Inactivity', 'Summary\n- ann — inactive 6d', self.targets)}
+        self.assertTrue(results['slack'].ok)
+        self.assertEqual(results['slack'].attempts, 2)
+        self.assertFalse(results['teams'].ok)
+        self.assertEqual((results['teams'].attempts, results['teams'].status), (3, 503))
+        teams = [b for path, b in self.server.requests if path == '/teams'][0]
+        self.assertEqual(teams['sections'], [{'activityTitle': 'Summary', 'text': '• ann — inactive 6d'}])
+
+    def test_unreachable_target_reports_error(self):
+        results = post_grouped('Digest', [{'title': 't', 'lines': ['a']}], {'slack': 'http://127.0.0.1:9/hook'})
+        self.assertFalse(results[0].ok)
+        self.assertIn('URLError', results[0].error)
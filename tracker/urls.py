@@ -15,6 +15,7 @@ urlpatterns = [
     path('resend-activation/', views.resend_activation, name='resend_activation'),
     path('activate/<uidb64>/<token>/', views.activate, name='activate'),
     path('healthz', views.healthz, name='healthz'),
+    path('metrics', views.metrics, name='metrics'),
     path('theme/toggle/', views.toggle_theme, name='toggle_theme'),
 
     path('', views.home, name='home'),
@@ -47,7 +48,11 @@ urlpatterns = [
     path('advisor/export.json', views.advisor_export_json, name='advisor_export_json'),
     path('advisor/export.csv', views.advisor_export_csv, name='advisor_export_csv'),
     path('advisor/export_import.csv', views.advisor_export_import_csv, name='advisor_export_import_csv'),
+    path('advisor/changes.ndjson', views.advisor_changes_ndjson, name='advisor_changes_ndjson'),
     path('advisor/import/', views.advisor_import, name='advisor_import'),
+    path('advisor/import/jobs/<int:pk>/', views.advisor_import_job, name='advisor_import_job'),
+    path('advisor/exports/', views.advisor_exports, name='advisor_exports'),
+    path('advisor/exports/<int:pk>/download.zip', views.advisor_export_download, name='advisor_export_download'),
     path('advisor/import/template.csv', views.advisor_import_template, name='advisor_import_template'),
     # ICS calendar feeds
     path('calendar.ics', views.calendar_ics, name='calendar_ics'),
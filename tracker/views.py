@@ -7,9 +7,11 @@ from django.contrib.auth.forms import UserCreationForm
 from django.core.mail import send_mail
 from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect, render
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Count, Max
+from django.http import Http404, HttpResponse, JsonResponse
+from django.db.models import Max
 from django.db import transaction
+from django.utils import timezone
+from dataclasses import asdict
 from datetime import date, timedelta
 
 from .forms import (
@@ -25,19 +27,39 @@ from .forms import (
     ResendActivationForm,
     AdvisorImportForm,
 )
-from .models import Profile, Project, Task, Document, ProjectNote
+from .models import Profile, Project, Task, Document, ProjectNote, ProjectProgress, ExportJob, ImportJob
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
+from django.utils.crypto import constant_time_compare
 from .services import (
     apply_templates_to_project,
     compute_streaks,
     task_effort,
-    task_combined_percent,
     compute_badges,
     get_progress_weights,
+    ProgressCalculator,
+    StageGateEvaluator,
 )
+from .exports import (
+    iter_project_summaries,
+    project_zip_response,
+    ranged_file_response,
+    stream_csv,
+    stream_json_array,
+)
+from .ics import (
+    COHORT_SCOPE,
+    EMPTY_CALENDAR,
+    feed_response,
+    render_advisor_feed,
+    render_student_feed,
+    schedule_feed_invalidation,
+    student_scope,
+)
+from .imports import ImportOptions, count_csv_rows, run_advisor_import, submit_import_job
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY, count_export_bytes
 from .motivation import QUOTES
 
 
@@ -203,31 +225,14 @@ def dashboard(request):
         from django.db.models import Q
         qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q))
     tasks = list(qs)
-    # Stage-gated milestones (must be done in order)
-    GATED_KEYS = [
-        'core-literature-review-general',
-        'core-literature-review-special',
-        'core-irb-application',
-        'core-preliminary-exam',
-        'core-final-defence',
-    ]
-    # Precompute which gated milestones are done (all tasks done)
-    done_by_key: dict[str, bool] = {}
-    for key in GATED_KEYS:
-        m = project.milestones.select_related('template').filter(template__key=key).first()
-        if not m:
-            done_by_key[key] = False
-        else:
-            ts = list(m.tasks.all())
-            done_by_key[key] = bool(ts) and all(t.status == 'done' for t in ts)
-    # Helper to get display name for a gated key
-    name_by_key: dict[str, str] = {}
-    for m in project.milestones.select_related('template').all():
-        if m.template and m.template.key in GATED_KEYS:
-            name_by_key[m.template.key] = m.name
+    # Use global weights from admin settings (not per-student)
+    weights = get_progress_weights()
+    calc = ProgressCalculator.for_projects([project], weights)
+    # Stage gates (must be done in order), evaluated from the same task list
+    gates = StageGateEvaluator.for_projects([project], tasks=calc.tasks)
     # Compute can-move flags per task (based on full milestone ordering)
     by_milestone = {}
-    for t in project.tasks.select_related('milestone').order_by('milestone__order', 'order', 'pk'):
+    for t in calc.tasks:
         by_milestone.setdefault(t.milestone_id, []).append(t.pk)
     pos = {}
     for mid, ids in by_milestone.items():
@@ -237,22 +242,14 @@ def dashboard(request):
         i, n = pos.get(t.pk, (0, 1))
         t.can_move_up = (i > 0)
         t.can_move_down = (i < n - 1)
-    completion = project.completion_percent()
-    # Use global weights from admin settings (not per-student)
-    weights = get_progress_weights()
+    summary = calc.project_summary(project.pk)
+    completion = int(round(100 * summary['done'] / summary['total'])) if summary['total'] else 0
     show_effort = (not getattr(settings, 'SIMPLE_PROGRESS_MODE', False)) and int(weights.get('effort', 0)) > 0
     # Per-milestone progress
-    milestones = project.milestones.prefetch_related('tasks').all()
+    milestones = gates.milestones.get(project.pk, [])
     milestone_progress = []
     for m in milestones:
-        ts = list(m.tasks.all())
-        total = len(ts)
-        done = sum(1 for t in ts if t.status == 'done')
-        if total:
-            avg = int(round(sum(task_combined_percent(t, weights) for t in ts) / total))
-        else:
-            avg = 0
-        milestone_progress.append({'m': m, 'percent': avg, 'total': total, 'done': done})
+        milestone_progress.append({'m': m, **calc.milestone_summary(m.pk)})
     radar_points = [{'label': mp['m'].name.split('–')[0].strip(), 'percent': mp['percent']} for mp in milestone_progress]
     # Radar controls with session persistence
     if 'update_radar' in request.GET:
@@ -269,34 +266,8 @@ def dashboard(request):
         radar_show_grid = request.session.get('radar_show_grid', True)
         radar_show_labels = request.session.get('radar_show_labels', True)
         radar_speed = request.session.get('radar_speed', 6)
-    for t in tasks:
-        try:
-            t.effort_pct = task_effort(t)[2]
-            t.combined_pct = task_combined_percent(t, weights)
-        except Exception:
-            t.effort_pct = 0
-            t.combined_pct = 0
-        # Stage-gating status for this task
-        try:
-            key = getattr(getattr(t.milestone, 'template', None), 'key', '')
-            if key in GATED_KEYS:
-                idx = GATED_KEYS.index(key)
-                blocked = False
-                wait_for = ''
-                if idx > 0:
-                    for prev in GATED_KEYS[:idx]:
-                        if not done_by_key.get(prev, False):
-                            blocked = True
-                            wait_for = name_by_key.get(prev, prev)
-                            break
-                t.gated_blocked = blocked
-                t.gated_wait = wait_for
-            else:
-                t.gated_blocked = False
-                t.gated_wait = ''
-        except Exception:
-            t.gated_blocked = False
-            t.gated_wait = ''
+    calc.annotate(tasks)
+    gates.annotate(tasks)
     badges = compute_badges(project)
     # Quote of the day (stable per user+date)
     try:
@@ -323,7 +294,7 @@ def dashboard(request):
         'due': due_days or '',
         'drafts': request.GET.get('drafts') == '1',
         'milestone_id': milestone_id or '',
-        'milestones': project.milestones.all(),
+        'milestones': milestones,
         'q': q,
         # tasks now carry task.effort_pct
     })
@@ -386,8 +357,7 @@ def task_status(request, pk: int):
             # Recompute effort/combined with global weights for HTMX response
             weights = get_progress_weights()
             try:
-                task.effort_pct = task_effort(task)[2]
-                task.combined_pct = task_combined_percent(task, weights)
+                ProgressCalculator([task], weights).annotate()
             except Exception:
                 task.effort_pct = 0
                 task.combined_pct = 0
@@ -419,8 +389,7 @@ def task_target(request, pk: int):
         # Recompute to update badges if HTMX
         weights = get_progress_weights()
         try:
-            task.effort_pct = task_effort(task)[2]
-            task.combined_pct = task_combined_percent(task, weights)
+            ProgressCalculator([task], weights).annotate()
         except Exception:
             task.effort_pct = 0
             task.combined_pct = 0
@@ -597,7 +566,7 @@ def task_move(request, pk: int, direction: str):
         )
         for idx, s in enumerate(siblings, start=1):
             if s.order != idx:
-                Task.objects.filter(pk=s.pk).update(order=idx)
+                Task.objects.filter(pk=s.pk).update(order=idx, updated_at=timezone.now())
                 s.order = idx
         # refresh index for target task
         ids = [s.pk for s in siblings]
@@ -611,17 +580,18 @@ def task_move(request, pk: int, direction: str):
             pass
         else:
             a, b = siblings[i], siblings[j]
-            Task.objects.filter(pk=a.pk).update(order=b.order)
-            Task.objects.filter(pk=b.pk).update(order=a.order)
+            Task.objects.filter(pk=a.pk).update(order=b.order, updated_at=timezone.now())
+            Task.objects.filter(pk=b.pk).update(order=a.order, updated_at=timezone.now())
             a.order, b.order = b.order, a.order
+        # Queryset updates skip post_save; event order in the calendar feed changes
+        schedule_feed_invalidation(task.project_id)
     # For HTMX partial replacement
     if request.headers.get('HX-Request'):
         # Recompute badges/effect for this row
         try:
             weights = get_progress_weights()
             task.refresh_from_db()
-            task.effort_pct = task_effort(task)[2]
-            task.combined_pct = task_combined_percent(task, weights)
+            ProgressCalculator([task], weights).annotate()
             # can_move flags after move
             siblings = list(
                 Task.objects.filter(project=task.project, milestone=task.milestone).order_by('order', 'pk').values_list('pk', flat=True)
@@ -696,17 +666,17 @@ def task_reorder(request):
             ids.append(task.pk)
         for idx, tpk in enumerate(ids, start=1):
             if tpk == task.pk and task.order != idx:
-                Task.objects.filter(pk=tpk).update(order=idx)
+                Task.objects.filter(pk=tpk).update(order=idx, updated_at=timezone.now())
                 task.order = idx
             elif tpk != task.pk:
-                Task.objects.filter(pk=tpk).update(order=idx)
+                Task.objects.filter(pk=tpk).update(order=idx, updated_at=timezone.now())
+        schedule_feed_invalidation(task.project_id)
     # Return updated row for HTMX partial replacement if requested
     if request.headers.get('HX-Request'):
         try:
             weights = get_progress_weights()
             task.refresh_from_db()
-            task.effort_pct = task_effort(task)[2]
-            task.combined_pct = task_combined_percent(task, weights)
+            ProgressCalculator([task], weights).annotate()
             # can_move flags after reorder
             siblings = list(
                 Task.objects.filter(project=task.project, milestone=task.milestone).order_by('order', 'pk').values_list('pk', flat=True)
@@ -729,36 +699,22 @@ def calendar_ics(request):
 
     Includes TODO/DOING tasks with a due_date, as all-day events.
     """
-    project = Project.objects.filter(student=request.user, status='active').first()
-    if not project:
-        return HttpResponse('BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//dissertation-lifecycle//EN\nEND:VCALENDAR', content_type='text/calendar')
-    tasks = project.tasks.select_related('milestone').filter(due_date__isnull=False, status__in=['todo', 'doing']).order_by('due_date', 'milestone__order', 'order')
-    lines = [
-        'BEGIN:VCALENDAR',
-        'VERSION:2.0',
-        'PRODID:-//dissertation-lifecycle//EN',
-        'CALSCALE:GREGORIAN',
-        'METHOD:PUBLISH',
-    ]
-    from datetime import datetime
-    for t in tasks:
-        dt = t.due_date.strftime('%Y%m%d')
-        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-        title = t.title.replace('\n', ' ').strip()
-        summary = f"{title}"
-        desc = f"Milestone: {t.milestone.name if t.milestone else ''}"
-        lines += [
-            'BEGIN:VEVENT',
-            f'UID:task-{t.pk}@dissertation-lifecycle',
-            f'DTSTAMP:{stamp}',
-            f'DTSTART;VALUE=DATE:{dt}',
-            f'DTEND;VALUE=DATE:{dt}',
-            f'SUMMARY:{summary}',
-            f'DESCRIPTION:{desc}',
-            'END:VEVENT',
-        ]
-    lines.append('END:VCALENDAR')
-    return HttpResponse('\n'.join(lines), content_type='text/calendar')
+    uid = request.user.pk
+    return feed_response(request, student_scope(uid), 'student', lambda: render_student_feed(uid))
+
+
+def _feed_days(request) -> int:
+    """The advisor feed window from ``?days=``, clamped to 1..ICS_FEED_MAX_DAYS.
+
+    The clamp happens before the feed starts streaming (an oversized window
+    would overflow the date range mid-body) and keeps the number of cached
+    variants bounded.
+    """
+    try:
+        days = int(request.GET.get('days', '60'))
+    except Exception:
+        days = 60
+    return min(max(1, days), int(getattr(settings, 'ICS_FEED_MAX_DAYS', 365)))
 
 
 @login_required
@@ -766,50 +722,13 @@ def advisor_calendar_ics(request):
     """ICS calendar feed for advisors/admins showing upcoming student task due dates.
 
     Query params:
-      - days: window forward in days (default 60)
+      - days: window forward in days (default 60, at most ICS_FEED_MAX_DAYS)
     """
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
         return redirect('dashboard')
-    try:
-        days = int(request.GET.get('days', '60'))
-    except Exception:
-        days = 60
-    today = date.today()
-    latest = today + timedelta(days=max(1, days))
-    qs = Task.objects.select_related('project__student', 'milestone').filter(
-        due_date__gte=today,
-        due_date__lte=latest,
-        status__in=['todo', 'doing'],
-        project__status='active',
-    ).order_by('due_date', 'project__student__username', 'milestone__order', 'order')
-    lines = [
-        'BEGIN:VCALENDAR',
-        'VERSION:2.0',
-        'PRODID:-//dissertation-lifecycle//EN',
-        'CALSCALE:GREGORIAN',
-        'METHOD:PUBLISH',
-    ]
-    from datetime import datetime
-    for t in qs:
-        dt = t.due_date.strftime('%Y%m%d')
-        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-        student = t.project.student.get_username() if t.project and t.project.student else 'student'
-        title = t.title.replace('\n', ' ').strip()
-        summary = f"{student}: {title}"
-        desc = f"Project: {t.project.title if t.project else ''}\\nMilestone: {t.milestone.name if t.milestone else ''}"
-        lines += [
-            'BEGIN:VEVENT',
-            f'UID:adv-task-{t.pk}@dissertation-lifecycle',
-            f'DTSTAMP:{stamp}',
-            f'DTSTART;VALUE=DATE:{dt}',
-            f'DTEND;VALUE=DATE:{dt}',
-            f'SUMMARY:{summary}',
-            f'DESCRIPTION:{desc}',
-            'END:VEVENT',
-        ]
-    lines.append('END:VCALENDAR')
-    return HttpResponse('\n'.join(lines), content_type='text/calendar')
+    days = _feed_days(request)
+    return feed_response(request, COHORT_SCOPE, f'days={days}', lambda: render_advisor_feed(days), stream=True)
 
 
 @login_required
@@ -883,86 +802,18 @@ def edit_document(request, pk: int):
 # Public ICS feeds using per-user tokens and a simple settings page to manage tokens
 def calendar_ics_token(request, token: str):
     """Public ICS via per-user token (student)."""
-    profile = Profile.objects.filter(student_calendar_token=token, role='student').select_related('user').first()
-    if not profile:
-        return HttpResponse('BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//dissertation-lifecycle//EN\nEND:VCALENDAR', content_type='text/calendar', status=404)
-    user = profile.user
-    project = Project.objects.filter(student=user, status='active').first()
-    if not project:
-        return HttpResponse('BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//dissertation-lifecycle//EN\nEND:VCALENDAR', content_type='text/calendar')
-    tasks = project.tasks.select_related('milestone').filter(due_date__isnull=False, status__in=['todo', 'doing']).order_by('due_date', 'milestone__order', 'order')
-    lines = [
-        'BEGIN:VCALENDAR',
-        'VERSION:2.0',
-        'PRODID:-//dissertation-lifecycle//EN',
-        'CALSCALE:GREGORIAN',
-        'METHOD:PUBLISH',
-    ]
-    from datetime import datetime
-    for t in tasks:
-        dt = t.due_date.strftime('%Y%m%d')
-        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-        title = t.title.replace('\n', ' ').strip()
-        summary = f"{title}"
-        desc = f"Milestone: {t.milestone.name if t.milestone else ''}"
-        lines += [
-            'BEGIN:VEVENT',
-            f'UID:task-{t.pk}@dissertation-lifecycle',
-            f'DTSTAMP:{stamp}',
-            f'DTSTART;VALUE=DATE:{dt}',
-            f'DTEND;VALUE=DATE:{dt}',
-            f'SUMMARY:{summary}',
-            f'DESCRIPTION:{desc}',
-            'END:VEVENT',
-        ]
-    lines.append('END:VCALENDAR')
-    return HttpResponse('\n'.join(lines), content_type='text/calendar')
+    uid = Profile.objects.filter(student_calendar_token=token, role='student').values_list('user_id', flat=True).first()
+    if not uid:
+        return HttpResponse(EMPTY_CALENDAR, content_type='text/calendar', status=404)
+    return feed_response(request, student_scope(uid), 'student', lambda: render_student_feed(uid))
 
 
 def advisor_calendar_ics_token(request, token: str):
     """Public ICS via per-user token (advisor/admin aggregate)."""
-    profile = Profile.objects.filter(advisor_calendar_token=token, role__in=['advisor', 'admin']).select_related('user').first()
-    if not profile:
-        return HttpResponse('BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//dissertation-lifecycle//EN\nEND:VCALENDAR', content_type='text/calendar', status=404)
-    try:
-        days = int(request.GET.get('days', '60'))
-    except Exception:
-        days = 60
-    today = date.today()
-    latest = today + timedelta(days=max(1, days))
-    qs = Task.objects.select_related('project__student', 'milestone').filter(
-        due_date__gte=today,
-        due_date__lte=latest,
-        status__in=['todo', 'doing'],
-        project__status='active',
-    ).order_by('due_date', 'project__student__username', 'milestone__order', 'order')
-    lines = [
-        'BEGIN:VCALENDAR',
-        'VERSION:2.0',
-        'PRODID:-//dissertation-lifecycle//EN',
-        'CALSCALE:GREGORIAN',
-        'METHOD:PUBLISH',
-    ]
-    from datetime import datetime
-    for t in qs:
-        dt = t.due_date.strftime('%Y%m%d')
-        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-        student = t.project.student.get_username() if t.project and t.project.student else 'student'
-        title = t.title.replace('\n', ' ').strip()
-        summary = f"{student}: {title}"
-        desc = f"Project: {t.project.title if t.project else ''}\\nMilestone: {t.milestone.name if t.milestone else ''}"
-        lines += [
-            'BEGIN:VEVENT',
-            f'UID:adv-task-{t.pk}@dissertation-lifecycle',
-            f'DTSTAMP:{stamp}',
-            f'DTSTART;VALUE=DATE:{dt}',
-            f'DTEND;VALUE=DATE:{dt}',
-            f'SUMMARY:{summary}',
-            f'DESCRIPTION:{desc}',
-            'END:VEVENT',
-        ]
-    lines.append('END:VCALENDAR')
-    return HttpResponse('\n'.join(lines), content_type='text/calendar')
+    if not Profile.objects.filter(advisor_calendar_token=token, role__in=['advisor', 'admin']).exists():
+        return HttpResponse(EMPTY_CALENDAR, content_type='text/calendar', status=404)
+    days = _feed_days(request)
+    return feed_response(request, COHORT_SCOPE, f'days={days}', lambda: render_advisor_feed(days), stream=True)
 
 
 @login_required
@@ -1006,77 +857,74 @@ def calendar_settings(request):
     })
 
 
+def _advisor_sort_ordering(sort: str, weights: dict) -> list:
+    """SQL sort keys for the advisor directory as (expression, descending) pairs.
+
+    Percent keys are computed in basis points with integer division so cursor
+    values compare exactly on both SQLite and Postgres.
+    """
+    from django.db.models import F, Value
+    from django.db.models.functions import Coalesce, Lower, NullIf
+    total = NullIf(F('progress__total_tasks'), 0)
+    status_bp = Coalesce(F('progress__done_tasks') * 10000 / total, Value(0))
+    if getattr(settings, 'SIMPLE_PROGRESS_MODE', False):
+        ws, we = 1, 0
+    else:
+        ws, we = int(weights.get('status', 0)), int(weights.get('effort', 0))
+    combined_bp = Coalesce(
+        (F('progress__status_points') * ws + F('progress__effort_points') * we) * 100 / (total * max(1, ws + we)),
+        Value(0),
+    )
+    title = Lower('title')
+    orderings = {
+        'student': [(F('student__username'), False), (title, False)],
+        'title': [(title, False), (F('student__username'), False)],
+        'combined': [
+            (combined_bp, True),
+            (Coalesce(F('progress__done_tasks'), Value(0)), True),
+            (Coalesce(F('progress__total_tasks'), Value(0)), True),
+        ],
+        'status': [(status_bp, True), (Coalesce(F('progress__total_tasks'), Value(0)), True)],
+        'tasks': [(Coalesce(F('progress__total_tasks'), Value(0)), True), (title, False)],
+        'gate': [(Coalesce(F('progress__gated_next_index'), Value(999)), False), (title, False)],
+    }
+    return orderings.get(sort, orderings['student'])
+
+
 @login_required
 def advisor_dashboard(request):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
         return redirect('dashboard')
-    from django.core.paginator import Paginator
+    from .pagination import keyset_paginate
     q = (request.GET.get('q') or '').strip()
     sort = (request.GET.get('sort') or 'student').strip()
     per = max(1, min(100, int(request.GET.get('per', '20'))))
-    qs = Project.objects.select_related('student').annotate(total_tasks=Count('tasks'))
+    qs = Project.objects.select_related('student', 'progress')
     if q:
         qs = qs.filter(title__icontains=q) | qs.filter(student__username__icontains=q)
-    projects = list(qs)
     weights = get_progress_weights()
-    GATED_KEYS = [
-        'core-literature-review-general',
-        'core-literature-review-special',
-        'core-irb-application',
-        'core-preliminary-exam',
-        'core-final-defence',
-    ]
-    for p in projects:
-        ts = list(p.tasks.select_related('milestone').all())
-        total = len(ts)
-        try:
-            p.combined_percent = int(round(sum(task_combined_percent(t, weights) for t in ts) / total)) if total else 0
-        except Exception:
-            p.combined_percent = 0
-        p.done_tasks = sum(1 for t in ts if t.status == 'done')
-        # Compute next gated stage (if any)
-        try:
-            done_by_key: dict[str, bool] = {}
-            name_by_key: dict[str, str] = {}
-            id_by_key: dict[str, int] = {}
-            for m in p.milestones.select_related('template').all():
-                if m.template and m.template.key in GATED_KEYS:
-                    mts = list(m.tasks.all())
-                    done_by_key[m.template.key] = bool(mts) and all(t.status == 'done' for t in mts)
-                    name_by_key[m.template.key] = m.name
-                    id_by_key[m.template.key] = m.id
-            p.gated_next = ''
-            p.gated_next_id = None
-            p.gated_next_index = 999
-            for key in GATED_KEYS:
-                if not done_by_key.get(key, False):
-                    p.gated_next = name_by_key.get(key, key)
-                    p.gated_next_id = id_by_key.get(key)
-                    p.gated_next_index = GATED_KEYS.index(key)
-                    break
-        except Exception:
-            p.gated_next = ''
-            p.gated_next_id = None
-            p.gated_next_index = 999
-    key_funcs = {
-        'student': lambda x: (getattr(x.student, 'username', ''), x.title.lower()),
-        'title': lambda x: (x.title.lower(), getattr(x.student, 'username', '')),
-        'combined': lambda x: (-int(x.combined_percent or 0), -x.done_tasks, -x.total_tasks),
-        'status': lambda x: (-x.completion_percent(), -x.total_tasks),
-        'tasks': lambda x: (-int(x.total_tasks or 0), x.title.lower()),
-        'gate': lambda x: (int(getattr(x, 'gated_next_index', 999)), x.title.lower()),
-    }
-    if sort in key_funcs:
-        projects.sort(key=key_funcs[sort])
-    paginator = Paginator(projects, per)
-    page_obj = Paginator(projects, per).get_page(request.GET.get('page'))
     show_effort = (not getattr(settings, 'SIMPLE_PROGRESS_MODE', False)) and int(weights.get('effort', 0)) > 0
     if not show_effort and sort == 'combined':
         sort = 'status'
+    # Sort and paginate in SQL (keyset cursors) so a page touches only `per` rows
+    page = keyset_paginate(
+        qs, _advisor_sort_ordering(sort, weights), per,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+    )
+    projects = page.object_list
+    for p in projects:
+        prog = getattr(p, 'progress', None) or ProjectProgress(project=p)
+        p.total_tasks = prog.total_tasks
+        p.done_tasks = prog.done_tasks
+        p.status_percent = prog.status_percent
+        p.combined_percent = prog.combined_percent(weights)
+        p.gated_next = prog.gated_next
+        p.gated_next_id = prog.gated_next_milestone_id
+        p.gated_next_index = prog.gated_next_index
     return render(request, 'tracker/advisor_dashboard.html', {
-        'projects': page_obj.object_list,
-        'page_obj': page_obj,
+        'projects': projects,
+        'page': page,
         'q': q,
         'sort': sort,
         'per': per,
@@ -1084,7 +932,6 @@ def advisor_dashboard(request):
     })
 
 
-
 @login_required
 def advisor_project(request, pk: int):
     profile = getattr(request.user, 'profile', None)
@@ -1143,42 +990,12 @@ def advisor_project(request, pk: int):
     per = max(1, min(100, int(request.GET.get('per', '25'))))
     page_obj = Paginator(qs, per).get_page(request.GET.get('page'))
     tasks = list(page_obj.object_list)
-    # Stage-gating for advisor view (informational locks)
-    GATED_KEYS = [
-        'core-literature-review-general',
-        'core-literature-review-special',
-        'core-irb-application',
-        'core-preliminary-exam',
-        'core-final-defence',
-    ]
-    done_by_key: dict[str, bool] = {}
-    name_by_key: dict[str, str] = {}
-    for m in project.milestones.select_related('template').all():
-        if m.template and m.template.key in GATED_KEYS:
-            ts = list(m.tasks.all())
-            done_by_key[m.template.key] = bool(ts) and all(t.status == 'done' for t in ts)
-            name_by_key[m.template.key] = m.name
-    for t in tasks:
-        try:
-            key = getattr(getattr(t.milestone, 'template', None), 'key', '')
-            if key in GATED_KEYS:
-                idx = GATED_KEYS.index(key)
-                blocked = False
-                wait_for = ''
-                if idx > 0:
-                    for prev in GATED_KEYS[:idx]:
-                        if not done_by_key.get(prev, False):
-                            blocked = True
-                            wait_for = name_by_key.get(prev, prev)
-                            break
-                t.gated_blocked = blocked
-                t.gated_wait = wait_for
-            else:
-                t.gated_blocked = False
-                t.gated_wait = ''
-        except Exception:
-            t.gated_blocked = False
-            t.gated_wait = ''
+    # Progress and stage-gating for advisor view (informational locks)
+    weights = get_progress_weights()
+    calc = ProgressCalculator.for_projects([project], weights)
+    gates = StageGateEvaluator.for_projects([project], tasks=calc.tasks)
+    calc.annotate(tasks)
+    gates.annotate(tasks)
     notes = project.notes.select_related('author').all()
     docs = project.documents.select_related('task').order_by('-uploaded_at')
     from .models import FeedbackRequest, FeedbackComment, Document
@@ -1234,19 +1051,11 @@ def advisor_project(request, pk: int):
                     )
                 return redirect('advisor_project', pk=pk)
     # Per-milestone progress summary
-    milestones = project.milestones.prefetch_related('tasks').all()
+    milestones = gates.milestones.get(project.pk, [])
     milestone_progress = []
-    weights = get_progress_weights()
     show_effort = (not getattr(settings, 'SIMPLE_PROGRESS_MODE', False)) and int(weights.get('effort', 0)) > 0
     for m in milestones:
-        ts = list(m.tasks.all())
-        total = len(ts)
-        done = sum(1 for t in ts if t.status == 'done')
-        if total:
-            avg = int(round(sum(task_combined_percent(t, weights) for t in ts) / total))
-        else:
-            avg = 0
-        milestone_progress.append({'m': m, 'percent': avg, 'total': total, 'done': done})
+        milestone_progress.append({'m': m, **calc.milestone_summary(m.pk)})
 
     feedback = project.feedback_requests.prefetch_related('comments__author').all()
     badges = compute_badges(project)
@@ -1276,6 +1085,7 @@ def advisor_project(request, pk: int):
 
 
 @login_required
+@count_export_bytes('project_json')
 def advisor_project_export_json(request, pk: int):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
@@ -1283,8 +1093,8 @@ def advisor_project_export_json(request, pk: int):
     import json
     from django.http import HttpResponse
     project = get_object_or_404(Project.objects.select_related('student'), pk=pk)
-    tasks = list(project.tasks.select_related('milestone').all())
-    weights = get_progress_weights()
+    calc = ProgressCalculator.for_projects([project])
+    tasks = calc.tasks
     data = {
         'project_id': project.id,
         'author': project.student.get_username(),
@@ -1299,7 +1109,7 @@ def advisor_project_export_json(request, pk: int):
                 'priority': t.priority,
                 'word_target': t.word_target,
                 'due_date': t.due_date.isoformat() if t.due_date else None,
-                'combined_percent': task_combined_percent(t, weights),
+                'combined_percent': calc.task_percent(t),
             }
             for t in tasks
         ],
@@ -1309,6 +1119,7 @@ def advisor_project_export_json(request, pk: int):
 
 
 @login_required
+@count_export_bytes('project_csv')
 def advisor_project_export_csv(request, pk: int):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
@@ -1320,8 +1131,8 @@ def advisor_project_export_csv(request, pk: int):
     resp['Content-Disposition'] = f'attachment; filename="project_{project.id}_tasks.csv"'
     writer = csv.writer(resp)
     writer.writerow(['task_id', 'milestone', 'title', 'status', 'priority', 'word_target', 'due_date', 'combined_percent'])
-    weights = get_progress_weights()
-    for t in project.tasks.select_related('milestone').all():
+    calc = ProgressCalculator.for_projects([project])
+    for t in calc.tasks:
         writer.writerow([
             t.id,
             t.milestone.name if t.milestone else '',
@@ -1330,59 +1141,83 @@ def advisor_project_export_csv(request, pk: int):
             t.priority,
             t.word_target,
             t.due_date.isoformat() if t.due_date else '',
-            task_combined_percent(t, weights),
+            calc.task_percent(t),
         ])
     return resp
 
 
 @login_required
+@count_export_bytes('cohort_json')
 def advisor_export_json(request):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
         return redirect('dashboard')
-    import json
-    from django.http import HttpResponse
-    weights = get_progress_weights()
-    data = []
-    for p in Project.objects.select_related('student').all():
-        tasks = list(p.tasks.select_related('milestone').all())
-        total = len(tasks)
-        combined = int(round(sum(task_combined_percent(t, weights) for t in tasks) / total)) if total else 0
-        done = sum(1 for t in tasks if t.status == 'done')
-        data.append({
+    from django.http import StreamingHttpResponse
+    projects = Project.objects.select_related('student').order_by('pk')
+    items = (
+        {
             'project_id': p.id,
             'author': p.student.get_username(),
             'email': p.student.email,
             'title': p.title,
-            'total_tasks': total,
-            'done_tasks': done,
-            'combined_percent': combined,
-        })
-    payload = json.dumps(data, indent=2)
-    return HttpResponse(payload, content_type='application/json')
+            'total_tasks': summary['total'],
+            'done_tasks': summary['done'],
+            'combined_percent': summary['percent'],
+        }
+        for p, summary in iter_project_summaries(projects)
+    )
+    return StreamingHttpResponse(stream_json_array(items), content_type='application/json')
 
 
 @login_required
+@count_export_bytes('cohort_csv')
 def advisor_export_csv(request):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
         return redirect('dashboard')
-    import csv
-    from django.http import HttpResponse
-    resp = HttpResponse(content_type='text/csv')
+    from django.http import StreamingHttpResponse
+    projects = Project.objects.select_related('student').order_by('pk')
+    rows = (
+        [p.id, p.student.get_username(), p.student.email, p.title, summary['total'], summary['done'], summary['percent']]
+        for p, summary in iter_project_summaries(projects)
+    )
+    resp = StreamingHttpResponse(
+        stream_csv(['project_id', 'author', 'email', 'title', 'total_tasks', 'done_tasks', 'combined_percent'], rows),
+        content_type='text/csv',
+    )
     resp['Content-Disposition'] = 'attachment; filename="advisor_export.csv"'
-    writer = csv.writer(resp)
-    writer.writerow(['project_id', 'author', 'email', 'title', 'total_tasks', 'done_tasks', 'combined_percent'])
-    weights = get_progress_weights()
-    for p in Project.objects.select_related('student').all():
-        tasks = list(p.tasks.select_related('milestone').all())
-        total = len(tasks)
-        combined = int(round(sum(task_combined_percent(t, weights) for t in tasks) / total)) if total else 0
-        done = sum(1 for t in tasks if t.status == 'done')
-        writer.writerow([p.id, p.student.get_username(), p.student.email, p.title, total, done, combined])
     return resp
 
 
+@login_required
+def advisor_changes_ndjson(request):
+    """Rows changed since ``cursor`` (or ISO ``since``) as NDJSON; the last line carries the next cursor."""
+    profile = getattr(request.user, 'profile', None)
+    if not profile or profile.role not in ('advisor', 'admin'):
+        return redirect('dashboard')
+    from django.http import StreamingHttpResponse
+    from django.utils.dateparse import parse_datetime
+    from .delta import DEFAULT_LIMIT, decode_watermark, iter_ndjson, watermark_since
+    try:
+        limit = max(1, min(50000, int(request.GET.get('limit') or DEFAULT_LIMIT)))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    since = (request.GET.get('since') or '').strip()
+    try:
+        if request.GET.get('cursor'):
+            state = decode_watermark(request.GET['cursor'])
+        elif since:
+            ts = parse_datetime(since)
+            if ts is None:
+                raise ValueError('Invalid since')
+            state = watermark_since(ts)
+        else:
+            state = {}
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return StreamingHttpResponse(iter_ndjson(state, limit=limit), content_type='application/x-ndjson')
+
+
 @login_required
 def wordlogs(request):
     project = Project.objects.filter(student=request.user, status='active').first()
@@ -1431,7 +1266,7 @@ def wordlogs(request):
         ws = start_this_week - timedelta(weeks=i)
         we = ws + timedelta(days=6)
         weeks.append((ws, we))
-    logs_by_date = {wl.date: wl.words for wl in project.word_logs.order_by('date')}
+    logs_by_date = {wl.date: wl.words for wl in logs if wl.date >= weeks[0][0]}
     weekly_totals = []
     for ws, we in weeks:
         total = 0
@@ -1457,6 +1292,7 @@ def wordlogs(request):
 
 
 @login_required
+@count_export_bytes('wordlogs_csv')
 def wordlogs_csv(request):
     project = Project.objects.filter(student=request.user, status='active').first()
     if not project:
@@ -1511,6 +1347,7 @@ def wordlogs_csv(request):
 
 
 @login_required
+@count_export_bytes('project_wordlogs_csv')
 def advisor_project_wordlogs_csv(request, pk: int):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
@@ -1622,101 +1459,68 @@ def healthz(request):
     return JsonResponse({"status": "ok"})
 
 
+def metrics(request):
+    """Prometheus text exposition of tracker.metrics.
+
+    Scrapers send ``Authorization: Bearer <METRICS_TOKEN>``; without a
+    configured token only staff users can read it.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    auth = request.headers.get('Authorization', '')
+    if token:
+        if not constant_time_compare(auth, f'Bearer {token}'):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(METRICS_REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 @login_required
+@count_export_bytes('project_zip')
 def advisor_project_export_zip(request, pk: int):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
         return redirect('dashboard')
-    import io, zipfile, csv, json, os
     project = get_object_or_404(Project.objects.select_related('student'), pk=pk)
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-        tasks = list(project.tasks.select_related('milestone').all())
-        tasks_json = [
-            {
-                'id': t.id,
-                'milestone': t.milestone.name if t.milestone else None,
-                'title': t.title,
-                'status': t.status,
-                'priority': t.priority,
-                'word_target': t.word_target,
-                'due_date': t.due_date.isoformat() if t.due_date else None,
-            }
-            for t in tasks
-        ]
-        zf.writestr('tasks.json', json.dumps(tasks_json, indent=2))
-        csv_buf = io.StringIO(); w = csv.writer(csv_buf)
-        w.writerow(['task_id','milestone','title','status','priority','word_target','due_date'])
-        for t in tasks:
-            w.writerow([t.id, t.milestone.name if t.milestone else '', t.title, t.status, t.priority, t.word_target, t.due_date.isoformat() if t.due_date else ''])
-        zf.writestr('tasks.csv', csv_buf.getvalue())
-        logs = list(project.word_logs.order_by('date').all())
-        logs_json = [{'date': wl.date.isoformat(), 'words': wl.words, 'note': wl.note} for wl in logs]
-        zf.writestr('logs.json', json.dumps(logs_json, indent=2))
-        csv_buf = io.StringIO(); w = csv.writer(csv_buf)
-        w.writerow(['date','words','note'])
-        for wl in logs:
-            w.writerow([wl.date.isoformat(), wl.words, wl.note])
-        zf.writestr('logs.csv', csv_buf.getvalue())
-        for d in project.documents.all():
-            try:
-                if d.file:
-                    with d.file.open('rb') as fp:
-                        safe_name = f"{d.id}_{os.path.basename(d.filename)}"
-                        zf.writestr(f"attachments/{safe_name}", fp.read())
-            except Exception:
-                continue
-    resp = HttpResponse(buf.getvalue(), content_type='application/zip')
-    resp['Content-Disposition'] = f'attachment; filename="project_{project.id}_export.zip"'
-    return resp
+    return project_zip_response(project, f"project_{project.id}_export.zip")
 
 
 @login_required
+@count_export_bytes('my_zip')
 def my_export_zip(request):
     project = Project.objects.filter(student=request.user, status='active').first()
     if not project:
         return redirect('project_new')
-    import io, zipfile, csv, json, os
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-        tasks = list(project.tasks.select_related('milestone').all())
-        tasks_json = [
-            {
-                'id': t.id,
-                'milestone': t.milestone.name if t.milestone else None,
-                'title': t.title,
-                'status': t.status,
-                'priority': t.priority,
-                'word_target': t.word_target,
-                'due_date': t.due_date.isoformat() if t.due_date else None,
-            }
-            for t in tasks
-        ]
-        zf.writestr('tasks.json', json.dumps(tasks_json, indent=2))
-        csv_buf = io.StringIO(); w = csv.writer(csv_buf)
-        w.writerow(['task_id','milestone','title','status','priority','word_target','due_date'])
-        for t in tasks:
-            w.writerow([t.id, t.milestone.name if t.milestone else '', t.title, t.status, t.priority, t.word_target, t.due_date.isoformat() if t.due_date else ''])
-        zf.writestr('tasks.csv', csv_buf.getvalue())
-        logs = list(project.word_logs.order_by('date').all())
-        logs_json = [{'date': wl.date.isoformat(), 'words': wl.words, 'note': wl.note} for wl in logs]
-        zf.writestr('logs.json', json.dumps(logs_json, indent=2))
-        csv_buf = io.StringIO(); w = csv.writer(csv_buf)
-        w.writerow(['date','words','note'])
-        for wl in logs:
-            w.writerow([wl.date.isoformat(), wl.words, wl.note])
-        zf.writestr('logs.csv', csv_buf.getvalue())
-        for d in project.documents.all():
-            try:
-                if d.file:
-                    with d.file.open('rb') as fp:
-                        safe_name = f"{d.id}_{os.path.basename(d.filename)}"
-                        zf.writestr(f"attachments/{safe_name}", fp.read())
-            except Exception:
-                continue
-    resp = HttpResponse(buf.getvalue(), content_type='application/zip')
-    resp['Content-Disposition'] = f'attachment; filename="my_project_export.zip"'
-    return resp
+    return project_zip_response(project, "my_project_export.zip")
+
+
+@login_required
+def advisor_exports(request):
+    profile = getattr(request.user, 'profile', None)
+    if not profile or profile.role not in ('advisor', 'admin'):
+        return redirect('dashboard')
+    if request.method == 'POST':
+        ExportJob.objects.create(requested_by=request.user)
+        messages.success(request, 'Cohort export queued. It will be ready to download here once built.')
+        return redirect('advisor_exports')
+    jobs = list(ExportJob.objects.filter(requested_by=request.user)[:20])
+    ctx = {'jobs': jobs, 'active': any(j.status in ('pending', 'running') for j in jobs)}
+    if request.headers.get('HX-Request'):
+        return render(request, 'tracker/partials/export_jobs.html', ctx)
+    return render(request, 'tracker/advisor_exports.html', ctx)
+
+
+@login_required
+def advisor_export_download(request, pk: int):
+    profile = getattr(request.user, 'profile', None)
+    if not profile or profile.role not in ('advisor', 'admin'):
+        return redirect('dashboard')
+    job = get_object_or_404(ExportJob, pk=pk, requested_by=request.user, status='done')
+    if not job.file:
+        raise Http404('Export file missing')
+    stamp = int(job.finished_at.timestamp()) if job.finished_at else 0
+    etag = f'"export-{job.pk}-{job.size}-{stamp}"'
+    return ranged_file_response(request, job.file, job.size, job.filename, etag)
 
 
 @login_required
@@ -1743,98 +1547,48 @@ def advisor_import(request):
     if request.method == 'POST':
         form = AdvisorImportForm(request.POST, request.FILES)
         if form.is_valid():
-            import csv, io
-            f = form.cleaned_data['file']
-            try:
-                data = f.read().decode('utf-8')
-            except Exception:
-                data = f.read().decode('latin-1', errors='ignore')
-            reader = csv.DictReader(io.StringIO(data))
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            created_users = updated_users = created_projects = updated_projects = 0
-            from .models import Profile, Project
-            for row in reader:
-                uname = (row.get('username') or '').strip()
-                email = (row.get('email') or '').strip()
-                title = (row.get('title') or '').strip() or 'Untitled Project'
-                display_name = (row.get('display_name') or '').strip()
-                new_title = (row.get('new_title') or '').strip()
-                apply_templates = (row.get('apply_templates') or '0').strip().lower() in ('1', 'true', 'yes', 'y')
-                status = (row.get('status') or 'active').strip() or 'active'
-                pwd = (row.get('password') or '').strip()
-                if not uname:
-                    results.append(('error', 'Missing username'))
-                    continue
-                # Fetch or create user
-                user = User.objects.filter(username=uname).first()
-                u_created = False
-                update_only = bool(form.cleaned_data.get('update_only'))
-                dry_run = bool(form.cleaned_data.get('dry_run'))
-                allow_user_create = bool(form.cleaned_data.get('create_missing_users'))
-                allow_project_create = bool(form.cleaned_data.get('create_missing_projects'))
-                if not user:
-                    if update_only and not allow_user_create:
-                        results.append(('error', f"User missing (update-only): {uname}"))
-                        continue
-                    user = User(username=uname, email=email)
-                    if not dry_run:
-                        if pwd:
-                            user.set_password(pwd)
-                        else:
-                            user.set_unusable_password()
-                        user.save()
-                    u_created = True
-                    created_users += 1
-                else:
-                    if email and user.email != email:
-                        if not dry_run:
-                            user.email = email
-                            user.save(update_fields=['email'])
-                        updated_users += 1
-                # Ensure / update Profile and display name
-                prof = Profile.objects.filter(user=user).first()
-                if not prof:
-                    if not update_only and not dry_run:
-                        Profile.objects.create(user=user, role='student')
-                elif display_name and prof.display_name != display_name and not dry_run:
-                    prof.display_name = display_name
-                    prof.save(update_fields=['display_name'])
-                # Fetch or create project
-                proj = Project.objects.filter(student=user, title=title).first()
-                p_created = False
-                if not proj:
-                    if update_only and not allow_project_create:
-                        results.append(('error', f"Project missing (update-only): {uname} / {title}"))
-                        continue
-                    proj = Project(student=user, title=title, status=status)
-                    if not dry_run:
-                        proj.save()
-                    p_created = True
-                    created_projects += 1
-                if not p_created:
-                    changed = False
-                    if status and proj.status != status:
-                        proj.status = status; changed = True
-                    if new_title and new_title != proj.title:
-                        proj.title = new_title; changed = True
-                    if changed and not dry_run:
-                        proj.save(update_fields=['status', 'title'])
-                        updated_projects += 1
-                else:
-                    if apply_templates and not dry_run:
-                        try:
-                            apply_templates_to_project(proj)
-                        except Exception:
-                            pass
-                results.append(('ok', f"{uname} / {title} ({'new' if p_created else 'updated'})"))
-            messages.success(request, f"Import complete. Users: +{created_users}/{updated_users} updated. Projects: +{created_projects}/{updated_projects} updated.")
+            options = ImportOptions(
+                update_only=bool(form.cleaned_data.get('update_only')),
+                dry_run=bool(form.cleaned_data.get('dry_run')),
+                create_missing_users=bool(form.cleaned_data.get('create_missing_users')),
+                create_missing_projects=bool(form.cleaned_data.get('create_missing_projects')),
+            )
+            upload = form.cleaned_data['file']
+            rows = count_csv_rows(upload)
+            if rows > int(getattr(settings, 'IMPORT_INLINE_MAX_ROWS', 200)):
+                # Too big to finish inside the request: hand it to a background job
+                job = ImportJob.objects.create(
+                    requested_by=request.user,
+                    file=upload,
+                    filename=upload.name[:255],
+                    options=asdict(options),
+                    total_rows=rows,
+                )
+                submit_import_job(job)
+                messages.info(request, f"Import of {rows} rows queued; progress is shown below.")
+                return redirect('advisor_import_job', pk=job.pk)
+            report = run_advisor_import(upload, options)
+            results = report.results
+            messages.success(request, report.message)
     else:
         form = AdvisorImportForm()
-    return render(request, 'tracker/advisor_import.html', {'form': form, 'results': results})
+    jobs = ImportJob.objects.filter(requested_by=request.user)[:5]
+    return render(request, 'tracker/advisor_import.html', {'form': form, 'results': results, 'jobs': jobs})
+
+
+@login_required
+def advisor_import_job(request, pk: int):
+    profile = getattr(request.user, 'profile', None)
+    if not profile or profile.role not in ('advisor', 'admin'):
+        return redirect('dashboard')
+    job = get_object_or_404(ImportJob, pk=pk, requested_by=request.user)
+    if request.headers.get('HX-Request'):
+        return render(request, 'tracker/partials/import_job.html', {'job': job})
+    return render(request, 'tracker/advisor_import_job.html', {'job': job})
 
 
 @login_required
+@count_export_bytes('roster_csv')
 def advisor_export_import_csv(request):
     profile = getattr(request.user, 'profile', None)
     if not profile or profile.role not in ('advisor', 'admin'):
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+from urllib import error, request
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Slack rejects section text over 3000 characters
+SLACK_TEXT_LIMIT = 3000
+RETRY_AFTER_CAP = 30.0
+
+
+@dataclass
+class WebhookResult:
+    target: str
+    part: int
+    ok: bool
+    status: int | None
+    attempts: int
+    latency_ms: float
+    error: str = ''
+
+
+def _pages(groups: list[dict], max_lines: int, max_chars: int = SLACK_TEXT_LIMIT) -> list[list[dict]]:
+    """Split ``groups`` into pages of at most ``max_lines`` bullet lines.
+
+    A group that does not fit (in lines, or ``max_chars`` of text) continues
+    on the next page under the same title.
+    """
+    pages: list[list[dict]] = [[]]
+    room = max_lines
+    for g in groups:
+        title = g.get('title', '')
+        lines = list(g.get('lines', []))
+        first = True
+        while first or lines:
+            if room <= 0:
+                pages.append([])
+                room = max_lines
+            chunk_title = title if first else f"{title} (cont.)"
+            chars = len(chunk_title) + 3
+            take = 0
+            while take < min(room, len(lines)) and (take == 0 or chars + len(lines[take]) + 3 <= max_chars):
+                chars += len(lines[take]) + 3
+                take += 1
+            pages[-1].append({'title': chunk_title, 'lines': lines[:take]})
+            lines = lines[take:]
+            room = room - take if not lines else 0
+            first = False
+    return pages
+
+
+def _part_title(title: str, part: int, parts: int) -> str:
+    return title if parts == 1 else f"{title} ({part}/{parts})"
+
+
+def slack_payload(title: str, page: list[dict]) -> dict:
+    blocks = [{"type": "header", "text": {"type": "plain_text", "text": title[:150]}}]
+    for g in page:
+        text = f"*{g['title']}*\n" + "\n".join(f"• {ln}" for ln in g['lines'])
+        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": text[:SLACK_TEXT_LIMIT]}})
+    return {"blocks": blocks}
+
+
+def teams_payload(title: str, page: list[dict]) -> dict:
+    return {
+        "@type": "MessageCard",
+        "@context": "https://schema.org/extensions",
+        "summary": title,
+        "themeColor": "0076D7",
+        "title": title,
+        "sections": [
+            {"activityTitle": g['title'], "text": "\n".join(f"• {ln}" for ln in g['lines'])} for g in page
+        ],
+    }
+
+
+# target name -> (settings attribute holding the URL, payload builder)
+TARGETS: dict[str, tuple[str, Callable[[str, list[dict]], dict]]] = {
+    'slack': ('SLACK_WEBHOOK_URL', slack_payload),
+    'teams': ('TEAMS_WEBHOOK_URL', teams_payload),
+}
+
+
+def configured_targets() -> dict[str, str]:
+    targets = {}
+    for name, (attr, _) in TARGETS.items():
+        url = getattr(settings, attr, '')
+        if url:
+            targets[name] = url
+    return targets
+
+
+def _retry_delay(attempt: int, retry_after: str | None = None) -> float:
+    if retry_after:
+        try:
+            return min(RETRY_AFTER_CAP, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    base = float(getattr(settings, 'WEBHOOK_BACKOFF_SECONDS', 0.5))
+    return base * (2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def post_json(target: str, url: str, payload: dict, part: int = 1) -> WebhookResult:
+    """POST ``payload`` to ``url``, retrying timeouts, 429s and 5xx with jittered backoff."""
+    timeout = float(getattr(settings, 'WEBHOOK_TIMEOUT', 5))
+    retries = max(0, int(getattr(settings, 'WEBHOOK_RETRIES', 3)))
+    body = json.dumps(payload).encode('utf-8')
+    started = time.perf_counter()
+    status, err, attempt = None, '', 0
+    for attempt in range(1, retries + 2):
+        retry_after = None
+        try:
+            req = request.Request(url, data=body, headers={"Content-Type": "application/json"}, method='POST')
+            with request.urlopen(req, timeout=timeout) as resp:  # nosec - outbound webhook by config
+                status = resp.status
+            return WebhookResult(target, part, True, status, attempt, (time.perf_counter() - started) * 1000)
+        except error.HTTPError as exc:
+            status, err = exc.code, f'HTTP {exc.code}'
+            retry_after = exc.headers.get('Retry-After') if exc.headers else None
+            if exc.code != 429 and exc.code < 500:
+                break
+        except Exception as exc:
+            status, err = None, f'{type(exc).__name__}: {exc}'
+        if attempt <= retries:
+            time.sleep(_retry_delay(attempt, retry_after))
+    return WebhookResult(target, part, False, status, attempt, (time.perf_counter() - started) * 1000, err)
+
+
+def _deliver_target(target: str, url: str, payloads: list[dict]) -> list[WebhookResult]:
+    # Parts of one digest go out in order, so they are sent one after another
+    results = [post_json(target, url, p, part) for part, p in enumerate(payloads, start=1)]
+    for r in results:
+        if r.ok:
+            logger.info('Webhook %s part %s delivered in %.0f ms (%s attempt(s))', target, r.part, r.latency_ms, r.attempts)
+        else:
+            logger.warning('Webhook %s part %s failed after %s attempt(s): %s', target, r.part, r.attempts, r.error)
+    return results
+
+
+def post_grouped(title: str, groups: list[dict], targets: dict[str, str] | None = None) -> list[WebhookResult]:
+    """Post grouped lines to every configured webhook concurrently.
+
+    groups: [{'title': str, 'lines': [str, ...]}]. Digests longer than
+    ``WEBHOOK_MAX_LINES`` lines are split into several numbered messages.
+    Never raises; the per-message results carry status and latency.
+    """
+    targets = configured_targets() if targets is None else targets
+    if not targets or not groups:
+        return []
+    max_lines = max(1, int(getattr(settings, 'WEBHOOK_MAX_LINES', 80)))
+    pages = _pages(groups, max_lines)
+    jobs = []
+    for name, url in targets.items():
+        build = TARGETS[name][1]
+        jobs.append((name, url, [build(_part_title(title, i, len(pages)), page) for i, page in enumerate(pages, start=1)]))
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [pool.submit(_deliver_target, *job) for job in jobs]
+        return [r for f in futures for r in f.result()]
+
+
+def post_text(title: str, text: str, targets: dict[str, str] | None = None) -> list[WebhookResult]:
+    """Post a text digest whose first line is its heading (see post_grouped)."""
+    lines = [ln.rstrip() for ln in text.splitlines() if ln.strip()]
+    heading = lines[0] if lines else title
+    body = [ln.lstrip('- ').lstrip('• ').strip() for ln in lines[1:]]
+    return post_grouped(title, [{'title': heading, 'lines': body}], targets)